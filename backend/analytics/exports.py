@@ -0,0 +1,261 @@
+"""
+Streaming export engine for analytics reports and data exports.
+
+Rows are read from the database with server-side iteration, serialized one
+at a time by a generator and spooled to a temporary file before being handed
+to storage, so memory use stays flat regardless of export size.
+"""
+import csv
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_CHUNK_SIZE = 2000
+COLUMNAR_ROW_GROUP_SIZE = 100000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer in generators"""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield row dicts for `fields` using a server-side cursor"""
+    return queryset.values(*fields).iterator(chunk_size=chunk_size)
+
+
+def iter_csv(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row.get(field) for field in fields])
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_json(rows, header=None, key='rows'):
+    """Yield a JSON document with the rows as an array, without materializing it"""
+    header = dict(header or {})
+    prefix = json.dumps(header, cls=DjangoJSONEncoder)[:-1]
+    yield (prefix + ', ' if header else '{') + json.dumps(key) + ': ['
+    first = True
+    for row in rows:
+        yield ('' if first else ', ') + json.dumps(row, cls=DjangoJSONEncoder)
+        first = False
+    yield ']}'
+
+
+def iter_format(format_type, rows, fields, header=None, key='rows'):
+    """Serialized chunks for rows in the given format"""
+    if format_type == 'csv':
+        return iter_csv(rows, fields)
+    if format_type == 'ndjson':
+        return iter_ndjson(rows)
+    if format_type == 'json':
+        return iter_json(rows, header, key)
+    raise ValueError(f"Unsupported format: {format_type}")
+
+
+class CountingIterator:
+    """Wraps a row iterator and counts how many rows were consumed"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._rows)
+        self.count += 1
+        return row
+
+
+def anonymize_rows(rows, user_fields, drop_fields=()):
+    """Replace user identifiers with stable pseudonyms and drop PII columns"""
+    for row in rows:
+        for field in user_fields:
+            if row.get(field) is not None:
+                row[field] = pseudonymize(row[field])
+        for field in drop_fields:
+            row.pop(field, None)
+        yield row
+
+
+def pseudonymize(value):
+    digest = hashlib.sha256(f'{settings.SECRET_KEY}:{value}'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def write_stream(path, chunks):
+    """
+    Write text chunks to storage via a temporary file.
+    Returns (stored_path, size_in_bytes).
+    """
+    with tempfile.TemporaryFile() as tmp:
+        for chunk in chunks:
+            tmp.write(chunk.encode('utf-8'))
+        size = tmp.tell()
+        tmp.seek(0)
+        stored_path = default_storage.save(path, File(tmp, name=os.path.basename(path)))
+    return stored_path, size
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ValueError("Columnar exports require the 'pyarrow' package")
+    return pyarrow
+
+
+def columnar_schema(model, fields, string_fields=(), dictionary_fields=()):
+    """
+    Arrow schema and per-column converters for model `fields`.
+
+    Choice fields and `dictionary_fields` are dictionary-encoded; fields in
+    `string_fields` (e.g. pseudonymized ids) are written as plain strings.
+    """
+    pa = _import_pyarrow()
+    columns, converters = [], []
+
+    for name in fields:
+        field = model._meta.get_field(name)
+        internal_type = field.get_internal_type()
+        converter = None
+
+        if name in string_fields:
+            arrow_type = pa.string()
+        elif getattr(field, 'choices', None) or name in dictionary_fields:
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        elif field.is_relation:
+            arrow_type = pa.int64()
+        elif internal_type in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+                               'PositiveIntegerField', 'PositiveBigIntegerField',
+                               'PositiveSmallIntegerField', 'SmallIntegerField'):
+            arrow_type = pa.int64()
+        elif internal_type == 'BooleanField':
+            arrow_type = pa.bool_()
+        elif internal_type == 'DecimalField':
+            arrow_type = pa.decimal128(field.max_digits, field.decimal_places)
+        elif internal_type == 'DateTimeField':
+            arrow_type = pa.timestamp('us', tz='UTC')
+        elif internal_type == 'DateField':
+            arrow_type = pa.date32()
+        elif internal_type == 'DurationField':
+            arrow_type = pa.duration('us')
+        elif internal_type == 'JSONField':
+            arrow_type = pa.string()
+            converter = lambda value: None if value is None else json.dumps(value, cls=DjangoJSONEncoder)
+        else:
+            arrow_type = pa.string()
+            if internal_type == 'UUIDField':
+                converter = lambda value: None if value is None else str(value)
+
+        columns.append(pa.field(name, arrow_type))
+        converters.append(converter)
+
+    return pa.schema(columns), converters
+
+
+def _record_batches(rows, schema, converters, row_group_size):
+    """
+    Group value tuples into Arrow record batches of `row_group_size` rows.
+
+    Dictionary columns share one vocabulary across batches: each batch's
+    dictionary extends the previous one, so IPC files get dictionary deltas
+    instead of (unsupported) replacements.
+    """
+    pa = _import_pyarrow()
+    vocabularies = {}
+
+    def encode(index, column):
+        vocabulary = vocabularies.setdefault(index, {})
+        indices = [
+            None if value is None else vocabulary.setdefault(value, len(vocabulary))
+            for value in column
+        ]
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32()),
+            pa.array(list(vocabulary), type=pa.string()),
+        )
+
+    def to_batch(batch_rows):
+        arrays = []
+        for index, column in enumerate(zip(*batch_rows)):
+            field = schema.field(index)
+            if converters[index]:
+                column = [converters[index](value) for value in column]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(encode(index, column))
+            else:
+                arrays.append(pa.array(column, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    batch_rows = []
+    for row in rows:
+        batch_rows.append(row)
+        if len(batch_rows) >= row_group_size:
+            yield to_batch(batch_rows)
+            batch_rows = []
+    if batch_rows:
+        yield to_batch(batch_rows)
+
+
+def write_columnar(path, format_type, rows, schema, converters, row_group_size=COLUMNAR_ROW_GROUP_SIZE):
+    """
+    Write value tuples to storage as Parquet or Arrow IPC, one row group
+    per batch. Returns (stored_path, size_in_bytes).
+    """
+    pa = _import_pyarrow()
+
+    with tempfile.TemporaryFile() as tmp:
+        sink = pa.PythonFile(tmp, mode='w')
+        if format_type == 'parquet':
+            writer = pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+            write = writer.write_batch
+        elif format_type == 'arrow':
+            writer = pa.ipc.new_file(
+                sink, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            )
+            write = writer.write_batch
+        else:
+            raise ValueError(f"Unsupported format: {format_type}")
+
+        with writer:
+            for batch in _record_batches(rows, schema, converters, row_group_size):
+                write(batch)
+
+        size = tmp.tell()
+        tmp.seek(0)
+        stored_path = default_storage.save(path, File(tmp, name=os.path.basename(path)))
+    return stored_path, size
+
+
+def content_type_for(path):
+    extension = os.path.splitext(path)[1].lstrip('.')
+    return CONTENT_TYPES.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import partitions
+from core.constants import AnalyticsConstants
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly analytics event partitions and apply the retention policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=AnalyticsConstants.EVENT_PARTITION_MONTHS_AHEAD,
+            help='Months of future partitions to keep ready'
+        )
+        parser.add_argument(
+            '--retain-months', type=int, default=AnalyticsConstants.EVENT_RETENTION_MONTHS,
+            help='Months of event history to keep (0 disables retention)'
+        )
+        parser.add_argument(
+            '--archive', action='store_true',
+            help='Write expired partitions to Parquet in storage before dropping them'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be created or dropped without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.is_supported():
+            raise CommandError('Event partitioning requires PostgreSQL')
+        if not partitions.is_partitioned():
+            raise CommandError('analytics_analyticsevent is not partitioned; run migrations first')
+
+        if options['dry_run']:
+            existing = {name for name, _, _ in partitions.list_partitions()}
+            self.stdout.write(f'{len(existing)} monthly partitions exist')
+        else:
+            for name in partitions.ensure_partitions(options['months_ahead']):
+                self.stdout.write(f'Created {name}')
+
+        if options['retain_months'] <= 0:
+            return
+
+        for name, start, end in partitions.expired_partitions(options['retain_months']):
+            if options['dry_run']:
+                self.stdout.write(f'Would drop {name}')
+                continue
+            if options['archive']:
+                path = self._archive(start, end)
+                self.stdout.write(f'Archived {name} to {path}')
+            partitions.drop_partition(name)
+            self.stdout.write(self.style.SUCCESS(f'Dropped {name}'))
+
+    def _archive(self, start, end):
+        from analytics import exports
+        from analytics.models import AnalyticsEvent
+
+        fields = [
+            'id', 'event_id', 'event_type', 'user_id', 'session_id', 'ip_address', 'user_agent',
+            'related_objects', 'event_data', 'timestamp', 'duration', 'source', 'version', 'created_at'
+        ]
+        schema, converters = exports.columnar_schema(AnalyticsEvent, fields, dictionary_fields=['source'])
+        rows = AnalyticsEvent.objects.filter(
+            timestamp__gte=start, timestamp__lt=end
+        ).order_by().values_list(*fields).iterator(chunk_size=exports.EXPORT_CHUNK_SIZE)
+
+        path = f'analytics/archive/events_{start:%Y_%m}.parquet'
+        stored_path, _ = exports.write_columnar(path, 'parquet', rows, schema, converters)
+        return stored_path
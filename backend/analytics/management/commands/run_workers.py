@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+
+from core.constants import AnalyticsConstants
+
+
+# Pool children are spawned (not forked) so they never share the parent's
+# DB connection; they set Django up themselves and import models lazily.
+
+def _init_worker():
+    django.setup()
+
+
+def _run_job(job_id):
+    from django.db import close_old_connections
+    from analytics.services import JobQueueService
+
+    close_old_connections()
+    return JobQueueService.run(job_id)
+
+
+class Command(BaseCommand):
+    help = 'Run background workers for queued report generation and data exports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 2,
+            help='Worker processes in the pool (0 runs jobs in this process)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=AnalyticsConstants.JOB_POLL_INTERVAL_SECONDS,
+            help='Seconds to sleep when the queue is empty'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process the jobs currently due and exit'
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Starting worker {worker_id} with {processes or "inline"} processes')
+
+        if processes == 0:
+            self._loop(worker_id, 1, options, submit=self._run_inline)
+            return
+
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+        with pool:
+            self._loop(worker_id, processes, options, submit=lambda job_id: pool.submit(_run_job, job_id))
+
+    @staticmethod
+    def _run_inline(job_id):
+        from analytics.services import JobQueueService
+
+        future = Future()
+        future.set_result(JobQueueService.run(job_id))
+        return future
+
+    def _loop(self, worker_id, capacity, options, submit):
+        """Keep up to `capacity` jobs running, claiming more as each one finishes"""
+        from analytics.services import JobQueueService
+
+        processed = 0
+        pending = set()
+        try:
+            while True:
+                JobQueueService.requeue_stale()
+                JobQueueService.schedule_due_reports()
+                free = capacity - len(pending)
+                if free:
+                    pending.update(submit(job_id) for job_id in JobQueueService.claim(worker_id, limit=free))
+
+                if not pending:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, pending = wait(pending, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                if done:
+                    failed = sum(1 for future in done if not future.result())
+                    processed += len(done)
+                    self.stdout.write(f'Ran {len(done)} jobs ({failed} failed)')
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_id} stopped after {processed} jobs'))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.5 on 2026-10-16 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric_type', models.CharField(choices=[('active_users', 'Active Users'), ('new_users', 'New Users'), ('returning_users', 'Returning Users'), ('user_engagement', 'User Engagement Score'), ('course_enrollments', 'Course Enrollments'), ('course_completions', 'Course Completions'), ('course_completion_rate', 'Course Completion Rate'), ('average_course_duration', 'Average Course Duration'), ('lesson_completions', 'Lesson Completions'), ('quiz_attempts', 'Quiz Attempts'), ('quiz_pass_rate', 'Quiz Pass Rate'), ('assignment_submissions', 'Assignment Submissions'), ('total_revenue', 'Total Revenue'), ('average_transaction', 'Average Transaction Value'), ('subscription_revenue', 'Subscription Revenue'), ('course_revenue', 'Course Revenue'), ('time_spent_learning', 'Time Spent Learning'), ('daily_active_users', 'Daily Active Users'), ('session_duration', 'Average Session Duration'), ('feature_usage', 'Feature Usage')], max_length=50, unique=True)),
+                ('processed_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='analyticsmetric',
+            name='sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-16 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_metric_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analyticsreport',
+            name='file_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dataexport',
+            name='file_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('json', 'JSON'), ('ndjson', 'NDJSON'), ('xlsx', 'Excel')], default='csv', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='dataexport',
+            name='file_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-16 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataexport',
+            name='file_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('json', 'JSON'), ('ndjson', 'NDJSON'), ('parquet', 'Parquet'), ('arrow', 'Arrow IPC'), ('xlsx', 'Excel')], default='csv', max_length=10),
+        ),
+    ]
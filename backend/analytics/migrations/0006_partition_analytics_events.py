@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from analytics import partitions
+
+
+INDEX_SQL = [
+    'CREATE INDEX "analytics_a_event_t_64745b_idx" ON "analytics_analyticsevent" ("event_type", "timestamp")',
+    'CREATE INDEX "analytics_a_user_id_5c8c13_idx" ON "analytics_analyticsevent" ("user_id", "timestamp")',
+    'CREATE INDEX "analytics_analyticsevent_timestamp_brin" ON "analytics_analyticsevent" USING brin ("timestamp")',
+]
+
+
+def partition_event_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    partitions.convert_to_partitioned(schema_editor, INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_columnar_export_formats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='analyticsevent',
+            name='analytics_a_timesta_aef2a5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='analyticsevent',
+            name='analytics_a_event_t_dd7f57_idx',
+        ),
+        # Converting back to a plain table is a manual operation
+        migrations.RunPython(partition_event_table, migrations.RunPython.noop),
+    ]
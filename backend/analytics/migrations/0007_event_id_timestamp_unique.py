@@ -0,0 +1,47 @@
+import uuid
+
+from django.db import migrations, models
+
+
+CONSTRAINT = models.UniqueConstraint(
+    fields=['event_id', 'timestamp'], name='analytics_analyticsevent_event_id_timestamp_uniq'
+)
+
+
+def relax_event_id_unique(apps, schema_editor):
+    # On PostgreSQL 0006 already replaced the event_id constraint with this one
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    AnalyticsEvent = apps.get_model('analytics', 'AnalyticsEvent')
+    old_field = AnalyticsEvent._meta.get_field('event_id')
+    new_field = models.UUIDField(default=uuid.uuid4, editable=False)
+    new_field.set_attributes_from_name('event_id')
+    new_field.model = AnalyticsEvent
+    schema_editor.alter_field(AnalyticsEvent, old_field, new_field)
+    schema_editor.execute(CONSTRAINT.create_sql(AnalyticsEvent, schema_editor))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_partition_analytics_events'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='analyticsevent',
+                    name='event_id',
+                    field=models.UUIDField(default=uuid.uuid4, editable=False),
+                ),
+                migrations.AddConstraint(
+                    model_name='analyticsevent',
+                    constraint=CONSTRAINT,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(relax_event_id_unique, migrations.RunPython.noop),
+            ],
+        ),
+    ]
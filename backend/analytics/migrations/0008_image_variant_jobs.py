@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-16 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_event_id_timestamp_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='job_type',
+            field=models.CharField(choices=[('generate_report', 'Generate Report'), ('generate_export', 'Generate Data Export'), ('build_image_variants', 'Build Image Variants')], max_length=50),
+        ),
+    ]
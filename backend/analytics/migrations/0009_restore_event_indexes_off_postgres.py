@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+# 0006 dropped these because the partitioned PostgreSQL table gets a BRIN
+# index on timestamp instead; every other backend still needs them.
+INDEXES = [
+    models.Index(fields=['timestamp'], name='analytics_a_timesta_aef2a5_idx'),
+    models.Index(fields=['event_type', 'user'], name='analytics_a_event_t_dd7f57_idx'),
+]
+
+
+def restore_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    AnalyticsEvent = apps.get_model('analytics', 'AnalyticsEvent')
+    for index in INDEXES:
+        schema_editor.add_index(AnalyticsEvent, index)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    AnalyticsEvent = apps.get_model('analytics', 'AnalyticsEvent')
+    for index in INDEXES:
+        schema_editor.remove_index(AnalyticsEvent, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0008_image_variant_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_indexes, drop_indexes),
+    ]
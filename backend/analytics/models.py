@@ -5,14 +5,15 @@ from django.utils import timezone
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 import uuid
-import json
-import csv
-from io import StringIO, BytesIO
+from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
 from datetime import timedelta
 
+from analytics import exports
+from core.timeseries import add_months
+
 
 class AnalyticsEvent(models.Model):
     """
@@ -61,7 +62,7 @@ class AnalyticsEvent(models.Model):
         ('api_call', 'API Call'),
     ]
 
-    event_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    event_id = models.UUIDField(default=uuid.uuid4, editable=False)
     event_type = models.CharField(max_length=50, choices=EVENT_TYPES)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='analytics_events')
 
@@ -88,11 +89,19 @@ class AnalyticsEvent(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        # On PostgreSQL the table is range-partitioned by month on timestamp
+        # (see analytics/partitions.py); a BRIN index covers timestamp ranges.
+        # Other backends keep plain (timestamp) and (event_type, user)
+        # indexes, created outside the model state by migration 0009.
         indexes = [
             models.Index(fields=['event_type', 'timestamp']),
             models.Index(fields=['user', 'timestamp']),
-            models.Index(fields=['timestamp']),
-            models.Index(fields=['event_type', 'user']),
+        ]
+        # Unique constraints on a partitioned table must include the partition key
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event_id', 'timestamp'], name='analytics_analyticsevent_event_id_timestamp_uniq'
+            ),
         ]
 
     def __str__(self):
@@ -176,6 +185,7 @@ class AnalyticsMetric(models.Model):
     # Metadata
     calculated_at = models.DateTimeField(default=timezone.now)
     data_points = models.PositiveIntegerField(default=0)  # Number of events aggregated
+    sketch = models.BinaryField(null=True, blank=True, editable=False)  # Distinct-count sketch for rollups
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -212,6 +222,19 @@ class AnalyticsMetric(models.Model):
             return f"{int(self.value)}"
 
 
+class MetricRollupWatermark(models.Model):
+    """
+    Tracks how far raw data has been rolled up into AnalyticsMetric rows
+    """
+    metric_type = models.CharField(max_length=50, choices=AnalyticsMetric.METRIC_TYPES, unique=True)
+    processed_until = models.DateTimeField()
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.metric_type} rolled up to {self.processed_until}"
+
+
 class AnalyticsReport(models.Model):
     """
     Saved reports with customizable parameters
@@ -229,9 +252,12 @@ class AnalyticsReport(models.Model):
         ('csv', 'CSV'),
         ('pdf', 'PDF'),
         ('json', 'JSON'),
-        ('xlsx', 'Excel'),
+        ('ndjson', 'NDJSON'),
     ]
 
+    # Columns written by the streaming formats
+    EXPORT_FIELDS = ['metric_type', 'aggregation_period', 'period_start', 'period_end', 'value', 'value_type']
+
     report_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -256,7 +282,7 @@ class AnalyticsReport(models.Model):
 
     # File storage
     file_path = models.CharField(max_length=500, blank=True)
-    file_size = models.PositiveIntegerField(default=0)
+    file_size = models.PositiveBigIntegerField(default=0)
 
     # Metadata
     last_generated = models.DateTimeField(null=True, blank=True)
@@ -285,57 +311,54 @@ class AnalyticsReport(models.Model):
 
     def generate_report(self, format_type='csv'):
         """Generate and save the report"""
-        if format_type == 'csv':
-            content = self._generate_csv()
-            filename = f"report_{self.report_id}.csv"
-        elif format_type == 'pdf':
+        filename = f"report_{self.report_id}.{format_type}"
+        file_path = f"analytics/reports/{filename}"
+
+        if format_type == 'pdf':
             content = self._generate_pdf()
-            filename = f"report_{self.report_id}.pdf"
-        elif format_type == 'json':
-            content = self._generate_json()
-            filename = f"report_{self.report_id}.json"
+            self.file_path = default_storage.save(file_path, ContentFile(content))
+            self.file_size = len(content)
+        elif format_type in exports.CONTENT_TYPES:
+            # Streamed row by row so large reports run in constant memory
+            header = {'report_title': self.title, 'generated_at': timezone.now()}
+            rows = exports.iter_rows(self._metrics_queryset(), self.EXPORT_FIELDS)
+            chunks = exports.iter_format(format_type, rows, self.EXPORT_FIELDS, header, key='metrics')
+            self.file_path, self.file_size = exports.write_stream(file_path, chunks)
         else:
             raise ValueError(f"Unsupported format: {format_type}")
 
-        # Save file
-        file_path = f"analytics/reports/{filename}"
-        if isinstance(content, str):
-            content = content.encode('utf-8')
-
-        file_obj = ContentFile(content)
-        self.file_path = default_storage.save(file_path, file_obj)
-        self.file_size = len(content)
         self.last_generated = timezone.now()
-        # Use F() for atomic counter update - prevents race conditions
         AnalyticsReport.objects.filter(pk=self.pk).update(
+            file_path=self.file_path,
+            file_size=self.file_size,
+            last_generated=self.last_generated,
+            # Use F() for atomic counter update - prevents race conditions
             generation_count=F('generation_count') + 1
         )
         self.refresh_from_db()
 
         return self.file_path
 
-    def _generate_csv(self):
-        """Generate CSV report"""
-        output = StringIO()
-        writer = csv.writer(output)
-
-        # Write header
-        writer.writerow(['Metric', 'Period', 'Value', 'Type'])
+    def schedule_next_run(self, from_time=None):
+        """Advance next_run by one schedule_frequency period"""
+        from_time = from_time or timezone.now()
+        if self.schedule_frequency == 'monthly':
+            self.next_run = add_months(from_time, 1)
+        elif self.schedule_frequency == 'weekly':
+            self.next_run = from_time + timedelta(weeks=1)
+        else:
+            self.next_run = from_time + timedelta(days=1)
+        AnalyticsReport.objects.filter(pk=self.pk).update(next_run=self.next_run)
 
-        # Write data (simplified example)
+    def _metrics_queryset(self):
+        """Metrics covered by the report (last `days` days, optionally limited to `metric_types`)"""
+        days = self.config.get('days', 30)
         metrics = AnalyticsMetric.objects.filter(
-            period_start__gte=timezone.now() - timedelta(days=30)
-        ).order_by('period_start')[:100]
-
-        for metric in metrics:
-            writer.writerow([
-                metric.metric_type,
-                metric.period_start.date(),
-                metric.value,
-                metric.value_type
-            ])
-
-        return output.getvalue()
+            period_start__gte=timezone.now() - timedelta(days=days)
+        )
+        if self.config.get('metric_types'):
+            metrics = metrics.filter(metric_type__in=self.config['metric_types'])
+        return metrics.order_by('period_start', 'pk')
 
     def _generate_pdf(self):
         """Generate PDF report"""
@@ -365,23 +388,6 @@ class AnalyticsReport(models.Model):
         buffer.seek(0)
         return buffer.getvalue()
 
-    def _generate_json(self):
-        """Generate JSON report"""
-        data = {
-            'report_title': self.title,
-            'generated_at': timezone.now().isoformat(),
-            'metrics': []
-        }
-
-        metrics = AnalyticsMetric.objects.filter(
-            period_start__gte=timezone.now() - timedelta(days=30)
-        ).values(
-            'metric_type', 'period_start', 'value', 'value_type'
-        ).order_by('period_start')[:50]
-
-        data['metrics'] = list(metrics)
-        return json.dumps(data, indent=2, default=str)
-
 
 class AnalyticsDashboard(models.Model):
     """
@@ -612,9 +618,11 @@ class DataExport(models.Model):
     file_format = models.CharField(max_length=10, choices=[
         ('csv', 'CSV'),
         ('json', 'JSON'),
-        ('xlsx', 'Excel'),
+        ('ndjson', 'NDJSON'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow IPC'),
     ], default='csv')
-    file_size = models.PositiveIntegerField(default=0)
+    file_size = models.PositiveBigIntegerField(default=0)
     record_count = models.PositiveIntegerField(default=0)
 
     # Privacy and compliance
@@ -645,6 +653,9 @@ class DataExport(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Low-cardinality columns without choices, dictionary-encoded in columnar exports
+    COLUMNAR_DICTIONARY_FIELDS = ['source']
+
     class Meta:
         ordering = ['-requested_at']
 
@@ -664,3 +675,162 @@ class DataExport(models.Model):
         self.status = 'completed'
         self.completed_at = timezone.now()
         self.save()
+
+    def generate(self):
+        """Stream the export to storage and mark it completed"""
+        self.status = 'processing'
+        self.save(update_fields=['status', 'updated_at'])
+
+        try:
+            if self.file_format in exports.COLUMNAR_FORMATS:
+                return self._generate_columnar()
+
+            queryset, fields, user_fields, pii_fields = self._export_source()
+            rows = exports.CountingIterator(exports.iter_rows(queryset, fields))
+            output_rows = rows
+            output_fields = fields
+            if self.is_anonymized:
+                output_rows = exports.anonymize_rows(rows, user_fields, pii_fields)
+                output_fields = [f for f in fields if f not in pii_fields]
+
+            header = {'export_title': self.title, 'export_type': self.export_type, 'generated_at': timezone.now()}
+            file_path = f"analytics/exports/export_{self.export_id}.{self.file_format}"
+            chunks = exports.iter_format(self.file_format, output_rows, output_fields, header)
+            self.file_path, self.file_size = exports.write_stream(file_path, chunks)
+        except Exception:
+            self.status = 'failed'
+            self.save(update_fields=['status', 'updated_at'])
+            raise
+
+        self.record_count = rows.count
+        self.complete()
+        return self.file_path
+
+    def _generate_columnar(self):
+        """Write Parquet/Arrow in row-group batches straight from values_list"""
+        queryset, fields, user_fields, pii_fields = self._export_source()
+        string_fields = []
+        if self.is_anonymized:
+            fields = [f for f in fields if f not in pii_fields]
+            string_fields = [f for f in user_fields if f in fields]
+
+        schema, converters = exports.columnar_schema(
+            queryset.model, fields, string_fields=string_fields,
+            dictionary_fields=self.COLUMNAR_DICTIONARY_FIELDS
+        )
+        for index, name in enumerate(fields):
+            if name in string_fields:
+                converters[index] = lambda value: None if value is None else exports.pseudonymize(value)
+
+        rows = exports.CountingIterator(
+            queryset.values_list(*fields).iterator(chunk_size=exports.EXPORT_CHUNK_SIZE)
+        )
+        file_path = f"analytics/exports/export_{self.export_id}.{self.file_format}"
+        self.file_path, self.file_size = exports.write_columnar(
+            file_path, self.file_format, rows, schema, converters
+        )
+
+        self.record_count = rows.count
+        self.complete()
+        return self.file_path
+
+    def _export_source(self):
+        """Queryset, fields, user id fields and PII fields for this export type"""
+        from progress.models import LessonProgress
+
+        sources = {
+            'user_data': (
+                User.objects.all(), 'date_joined',
+                ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'last_login'],
+                ['id'], ['username', 'email', 'first_name', 'last_name'],
+            ),
+            'analytics_data': (
+                AnalyticsEvent.objects.all(), 'timestamp',
+                ['event_id', 'event_type', 'user_id', 'session_id', 'timestamp', 'duration',
+                 'source', 'related_objects', 'event_data'],
+                ['user_id'], ['session_id'],
+            ),
+            'compliance_report': (
+                DataExport.objects.all(), 'requested_at',
+                ['export_id', 'export_type', 'status', 'requested_by_id', 'approved_by_id',
+                 'requested_at', 'approved_at', 'completed_at', 'record_count'],
+                ['requested_by_id', 'approved_by_id'], [],
+            ),
+            'research_data': (
+                LessonProgress.objects.all(), 'first_accessed',
+                ['student_id', 'lesson_id', 'status', 'progress_percentage', 'score',
+                 'time_spent_seconds', 'completed_at'],
+                ['student_id'], [],
+            ),
+        }
+        queryset, date_field, fields, user_fields, pii_fields = sources[self.export_type]
+
+        if self.filters.get('start_date'):
+            queryset = queryset.filter(**{f'{date_field}__gte': self.filters['start_date']})
+        if self.filters.get('end_date'):
+            queryset = queryset.filter(**{f'{date_field}__lte': self.filters['end_date']})
+        if self.fields:
+            fields = [field for field in fields if field in self.fields]
+
+        return queryset.order_by('pk'), fields, user_fields, pii_fields
+
+
+class BackgroundJob(models.Model):
+    """
+    DB-backed queue entry for work run outside the request cycle
+    (report rendering, data exports, image variants). Processed by
+    `manage.py run_workers`.
+    """
+    JOB_TYPES = [
+        ('generate_report', 'Generate Report'),
+        ('generate_export', 'Generate Data Export'),
+        ('build_image_variants', 'Build Image Variants'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    job_type = models.CharField(max_length=50, choices=JOB_TYPES)
+    payload = models.JSONField(default=dict)
+
+    # Execution state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0)  # 0-100
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+
+    # Scheduling and locking
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'locked_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job_type} ({self.status})"
+
+    def can_access(self, user):
+        """Check if user can view this job"""
+        return self.created_by_id == user.id or user.profile.is_admin
+
+    def set_progress(self, progress):
+        """Persist progress without touching other fields"""
+        self.progress = max(0, min(100, int(progress)))
+        BackgroundJob.objects.filter(pk=self.pk).update(progress=self.progress)
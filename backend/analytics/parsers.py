@@ -0,0 +1,31 @@
+import json
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON (one object per line) into a list.
+    Used by the batch event endpoint alongside the regular JSONParser.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        items = []
+        line_number = 0
+        try:
+            decoded_stream = codecs.getreader(encoding)(stream)
+            for line_number, line in enumerate(decoded_stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                items.append(json.loads(line))
+        except ValueError as exc:
+            raise ParseError(f'NDJSON parse error on line {line_number} - {exc}')
+        return items
@@ -0,0 +1,173 @@
+"""
+Monthly range partitioning for the analytics event table (PostgreSQL only).
+
+The event table is partitioned on `timestamp`, one partition per calendar
+month plus a DEFAULT partition that catches anything outside the managed
+range. Partitions are created ahead of time by `manage.py
+manage_event_partitions`, which also enforces retention by archiving and
+dropping whole partitions rather than running DELETEs.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from core.timeseries import add_months
+
+PARENT_TABLE = 'analytics_analyticsevent'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_PATTERN = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    """True once the event table has been converted to a partitioned table"""
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [PARENT_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def month_start(value):
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(start):
+    return f'{PARENT_TABLE}_p{start.year:04d}_{start.month:02d}'
+
+
+def list_partitions():
+    """Monthly partitions as [(name, start, end)], oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s",
+            [PARENT_TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((name, start, add_months(start, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(start):
+    """
+    Create the partition for the month starting at `start` if it is missing.
+
+    PostgreSQL refuses to add a partition while the DEFAULT partition holds
+    rows for its range, so the default is detached, its matching rows are
+    moved into the new partition and it is attached again.
+    """
+    start = month_start(start)
+    end = add_months(start, 1)
+    name = partition_name(start)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s), to_regclass(%s)", [f'"{name}"', f'"{DEFAULT_PARTITION}"'])
+        exists, has_default = cursor.fetchone()
+        if exists:
+            return name
+
+        if has_default:
+            cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"')
+        cursor.execute(
+            f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        if has_default:
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved',
+                [start, end]
+            )
+            cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT')
+    return name
+
+
+def ensure_partitions(months_ahead, now=None):
+    """Create partitions from the current month through `months_ahead` months ahead"""
+    current = month_start(now or datetime.now(dt_timezone.utc))
+    existing = {name for name, _, _ in list_partitions()}
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current, offset)
+        if partition_name(start) not in existing:
+            created.append(create_partition(start))
+    return created
+
+
+def expired_partitions(retain_months, now=None):
+    """Partitions that end on or before the start of the retention window"""
+    cutoff = add_months(month_start(now or datetime.now(dt_timezone.utc)), -retain_months)
+    return [partition for partition in list_partitions() if partition[2] <= cutoff]
+
+
+def drop_partition(name):
+    """Detach and drop a monthly partition in one transaction"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
+
+
+def convert_to_partitioned(schema_editor, index_sql):
+    """
+    Rebuild the event table as a partitioned table and copy existing rows.
+
+    The primary key and event_id uniqueness must include the partition key,
+    so they become (id, timestamp) and (event_id, timestamp).
+    """
+    legacy = f'{PARENT_TABLE}_unpartitioned'
+    sequence = f'{PARENT_TABLE}_id_partitioned_seq'
+    execute = schema_editor.execute
+
+    execute(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{legacy}"')
+    execute(f'CREATE TABLE "{PARENT_TABLE}" (LIKE "{legacy}") PARTITION BY RANGE ("timestamp")')
+
+    # Partitioned tables cannot carry identity columns before PG 17
+    execute(f'CREATE SEQUENCE "{sequence}" OWNED BY "{PARENT_TABLE}"."id"')
+    execute(f'ALTER TABLE "{PARENT_TABLE}" ALTER COLUMN "id" SET DEFAULT nextval(\'"{sequence}"\')')
+    execute(f'ALTER TABLE "{PARENT_TABLE}" ADD PRIMARY KEY ("id", "timestamp")')
+    execute(
+        f'ALTER TABLE "{PARENT_TABLE}" ADD CONSTRAINT "{PARENT_TABLE}_event_id_timestamp_uniq" '
+        f'UNIQUE ("event_id", "timestamp")'
+    )
+
+    # Monthly partitions covering existing data, plus the catch-all default
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN("timestamp") FROM "{legacy}"')
+        oldest = cursor.fetchone()[0]
+    start = month_start(oldest or datetime.now(dt_timezone.utc))
+    end = add_months(month_start(datetime.now(dt_timezone.utc)), 3)
+    while start <= end:
+        create_partition(start)
+        start = add_months(start, 1)
+    execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{PARENT_TABLE}" DEFAULT')
+
+    execute(f'INSERT INTO "{PARENT_TABLE}" SELECT * FROM "{legacy}"')
+    execute(f'SELECT setval(\'"{sequence}"\', COALESCE((SELECT MAX("id") FROM "{PARENT_TABLE}"), 0) + 1, false)')
+    execute(f'DROP TABLE "{legacy}"')
+
+    for statement in index_sql:
+        execute(statement)
+
+    # Added last: a deferred foreign key queues a trigger event per copied
+    # row, and PostgreSQL refuses CREATE INDEX while those are pending
+    execute(
+        f'ALTER TABLE "{PARENT_TABLE}" ADD CONSTRAINT "{PARENT_TABLE}_user_id_fk" '
+        f'FOREIGN KEY ("user_id") REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED'
+    )
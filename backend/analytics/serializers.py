@@ -3,8 +3,10 @@ from django.utils import timezone
 from django.contrib.auth.models import User
 from .models import (
     AnalyticsEvent, AnalyticsMetric, AnalyticsReport, AnalyticsDashboard,
-    LearningRecommendation, PredictiveInsight, DataExport
+    LearningRecommendation, PredictiveInsight, DataExport, BackgroundJob
 )
+from core.constants import AnalyticsConstants
+from .services import MetricRollupService
 
 
 class AnalyticsEventSerializer(serializers.ModelSerializer):
@@ -40,6 +42,26 @@ class AnalyticsMetricSerializer(serializers.ModelSerializer):
         read_only_fields = ['metric_id', 'calculated_at', 'created_at', 'updated_at']
 
 
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    """Serializer for background job status polling"""
+    job_type_display = serializers.CharField(source='get_job_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    status_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'job_id', 'job_type', 'job_type_display', 'status', 'status_display',
+            'progress', 'result', 'error', 'attempts', 'status_url',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        from django.urls import reverse
+        return reverse('job-status', kwargs={'job_id': obj.job_id})
+
+
 class AnalyticsReportSerializer(serializers.ModelSerializer):
     """Serializer for analytics reports"""
     report_type_display = serializers.CharField(source='get_report_type_display', read_only=True)
@@ -178,6 +200,34 @@ class DataExportSerializer(serializers.ModelSerializer):
 
 # Specialized serializers for specific use cases
 
+class TrackEventBatchSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of events in one pass.
+    Invalid items are reported per index instead of failing the whole batch.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of events']})
+        if not data:
+            raise serializers.ValidationError({'non_field_errors': ['Batch must contain at least one event']})
+        if len(data) > AnalyticsConstants.MAX_EVENTS_PER_BATCH:
+            raise serializers.ValidationError({
+                'non_field_errors': [f'Batch exceeds {AnalyticsConstants.MAX_EVENTS_PER_BATCH} events']
+            })
+
+        self.item_errors = []
+        validated = []
+        for item in data:
+            try:
+                validated.append(self.child.run_validation(item))
+                self.item_errors.append(None)
+            except serializers.ValidationError as exc:
+                validated.append(None)
+                self.item_errors.append(exc.detail)
+        return validated
+
+
 class TrackEventSerializer(serializers.Serializer):
     """Serializer for tracking events"""
     event_type = serializers.ChoiceField(choices=AnalyticsEvent.EVENT_TYPES)
@@ -188,6 +238,9 @@ class TrackEventSerializer(serializers.Serializer):
     source = serializers.CharField(max_length=100, required=False, default='web')
     version = serializers.CharField(max_length=50, required=False)
 
+    class Meta:
+        list_serializer_class = TrackEventBatchSerializer
+
 
 class MetricsQuerySerializer(serializers.Serializer):
     """Serializer for metrics queries"""
@@ -321,7 +374,13 @@ class BulkMetricsCalculationSerializer(serializers.Serializer):
     filters = serializers.JSONField(default=dict)
 
     def validate(self, data):
-        """Validate date range"""
+        """Validate the date range spans exactly one aggregation period"""
         if data['start_date'] >= data['end_date']:
             raise serializers.ValidationError("Start date must be before end date")
+        expected_end = MetricRollupService.period_end(data['start_date'], data['aggregation_period'])
+        if data['end_date'] != expected_end:
+            raise serializers.ValidationError(
+                f"A {data['aggregation_period']} period starting at {data['start_date'].isoformat()} "
+                f"must end at {expected_end.isoformat()}"
+            )
         return data
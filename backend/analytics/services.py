@@ -0,0 +1,1028 @@
+"""
+Service layer for analytics app.
+Separates event ingestion and aggregation logic from views.
+"""
+import calendar
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import DataError, IntegrityError, connection, transaction
+from django.db.models import Q, F, Avg, Case, Count, FloatField, Min, Sum, Value, When
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from analytics.models import (
+    AnalyticsEvent, AnalyticsMetric, AnalyticsReport, BackgroundJob, DataExport, MetricRollupWatermark
+)
+from analytics.sketches import DistinctCountSketch
+from core import images, jobs
+from core.buffers import BufferFull, WriteBehindBuffer, flush_at_exit
+
+# Import centralized constants
+from core.constants import AnalyticsConstants
+
+logger = logging.getLogger(__name__)
+
+
+class EventBufferFull(BufferFull):
+    """Raised when the ingestion buffer cannot accept more events."""
+
+
+class EventIngestionBuffer(WriteBehindBuffer):
+    """
+    In-process ring buffer for analytics events.
+
+    Events are queued as unsaved AnalyticsEvent instances and written with
+    bulk_create once the batch size or flush interval is reached, instead of
+    one INSERT per tracked event. A full buffer raises EventBufferFull once
+    flushing in the caller's thread does not free space.
+
+    Rows the database rejects are bisected out of the batch and logged
+    instead of being requeued; batches that hit transient errors are
+    retried up to EVENT_FLUSH_MAX_RETRIES times before being dropped.
+    """
+
+    full_error = EventBufferFull
+    thread_name = 'analytics-event-flush'
+
+    def __init__(self, max_size=None, batch_size=None, flush_interval=None):
+        super().__init__(
+            batch_size=batch_size or AnalyticsConstants.EVENT_FLUSH_BATCH_SIZE,
+            flush_interval=flush_interval or AnalyticsConstants.EVENT_FLUSH_INTERVAL_SECONDS,
+        )
+        self.max_size = max_size or AnalyticsConstants.EVENT_BUFFER_MAX_SIZE
+
+        self._events = deque()
+        self._oldest_enqueued_at = None
+        self._retries = 0
+
+        # Counters exposed through stats()
+        self.total_enqueued = 0
+        self.total_flushed = 0
+        self.total_rejected = 0
+        self.failed_flushes = 0
+        self.total_dead_lettered = 0
+        self.last_flush_at = None
+        self.last_flush_size = 0
+        self.last_flush_latency_ms = None
+        self.max_flush_latency_ms = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+    def enqueue(self, event_type, user=None, **kwargs):
+        """
+        Queue an event for the next bulk insert.
+        Returns the unsaved event (its event_id is already assigned).
+        """
+        return self.enqueue_many([dict(kwargs, event_type=event_type, user=user)])[0]
+
+    def enqueue_many(self, events):
+        """
+        Queue several events (dicts of enqueue kwargs) as one unit: either all
+        of them are accepted or EventBufferFull is raised.
+        Returns the unsaved events in order.
+        """
+        batch = []
+        for event in events:
+            event = dict(event)
+            batch.append(AnalyticsEvent(
+                event_type=event.pop('event_type'),
+                user=event.pop('user', None),
+                event_data=event.pop('event_data', {}),
+                related_objects=event.pop('related_objects', {}),
+                **event
+            ))
+        try:
+            self.put(batch)
+        except EventBufferFull:
+            with self._lock:
+                self.total_rejected += len(batch)
+            raise
+        return batch
+
+    def stats(self):
+        """Current queue depth and flush metrics."""
+        with self._lock:
+            oldest_age = (
+                time.monotonic() - self._oldest_enqueued_at
+                if self._oldest_enqueued_at is not None else 0
+            )
+            return {
+                'queue_depth': len(self._events),
+                'max_size': self.max_size,
+                'batch_size': self.batch_size,
+                'flush_interval_seconds': self.flush_interval,
+                'oldest_event_age_seconds': round(oldest_age, 3),
+                'total_enqueued': self.total_enqueued,
+                'total_flushed': self.total_flushed,
+                'total_rejected': self.total_rejected,
+                'failed_flushes': self.failed_flushes,
+                'total_dead_lettered': self.total_dead_lettered,
+                'last_flush_at': self.last_flush_at,
+                'last_flush_size': self.last_flush_size,
+                'last_flush_latency_ms': self.last_flush_latency_ms,
+                'max_flush_latency_ms': self.max_flush_latency_ms,
+            }
+
+    def _offer(self, events):
+        with self._lock:
+            if len(self._events) + len(events) > self.max_size:
+                return False
+            if not self._events:
+                self._oldest_enqueued_at = time.monotonic()
+            self._events.extend(events)
+            self.total_enqueued += len(events)
+            return True
+
+    def _take(self):
+        with self._lock:
+            batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+            self._oldest_enqueued_at = time.monotonic() if self._events else None
+            return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        inserted, rejected = self._insert(batch)
+        if rejected:
+            self._dead_letter(rejected)
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._retries = 0
+            self.total_flushed += inserted
+            self.last_flush_at = time.time()
+            self.last_flush_size = inserted
+            self.last_flush_latency_ms = round(latency_ms, 3)
+            if self.max_flush_latency_ms is None or latency_ms > self.max_flush_latency_ms:
+                self.max_flush_latency_ms = round(latency_ms, 3)
+        return inserted
+
+    def _write_failed(self, batch):
+        with self._lock:
+            self.failed_flushes += 1
+            self._retries += 1
+            give_up = self._retries > AnalyticsConstants.EVENT_FLUSH_MAX_RETRIES
+        if give_up:
+            self._dead_letter(batch)
+            with self._lock:
+                self._retries = 0
+        else:
+            self._requeue(batch)
+        logger.exception("Failed to flush %d analytics events", len(batch))
+
+    def _insert(self, batch):
+        """
+        Bulk insert `batch`, bisecting around rows the database rejects
+        (e.g. a user deleted since the event was queued).
+        Returns (rows_written, rejected_events); transient errors propagate.
+        """
+        try:
+            with transaction.atomic():
+                AnalyticsEvent.objects.bulk_create(batch, batch_size=self.batch_size)
+        except (IntegrityError, DataError):
+            if len(batch) == 1:
+                return 0, batch
+            middle = len(batch) // 2
+            head_written, head_rejected = self._insert(batch[:middle])
+            tail_written, tail_rejected = self._insert(batch[middle:])
+            return head_written + tail_written, head_rejected + tail_rejected
+        return len(batch), []
+
+    def _dead_letter(self, events):
+        """Drop events that cannot be written, keeping a record in the log."""
+        with self._lock:
+            self.total_dead_lettered += len(events)
+        for event in events:
+            logger.error(
+                "Dropping analytics event %s (%s, user=%s)",
+                event.event_id, event.event_type, event.user_id
+            )
+
+    def _requeue(self, batch):
+        """Put a failed batch back at the head, dropping what no longer fits."""
+        with self._lock:
+            room = self.max_size - len(self._events)
+            keep = batch[:max(room, 0)]
+            self.total_rejected += len(batch) - len(keep)
+            self._events.extendleft(reversed(keep))
+            if self._events and self._oldest_enqueued_at is None:
+                self._oldest_enqueued_at = time.monotonic()
+
+    def _should_flush(self):
+        with self._lock:
+            if len(self._events) >= self.batch_size:
+                return True
+            return (
+                self._oldest_enqueued_at is not None and
+                time.monotonic() - self._oldest_enqueued_at >= self.flush_interval
+            )
+
+
+# Process-wide buffer used by the track_event endpoint
+event_buffer = flush_at_exit(EventIngestionBuffer())
+
+
+# =============================================================================
+# DASHBOARD STATS
+# =============================================================================
+
+class DashboardStatsService:
+    """
+    Cached snapshot of platform-wide dashboard stats.
+
+    The snapshot is served from cache; once it is older than the TTL the
+    stale copy is still returned while a single background thread
+    recomputes it (stale-while-revalidate). Only a missing or hard-expired
+    snapshot is computed inline.
+    """
+
+    CACHE_KEY = 'analytics:dashboard_stats'
+    LOCK_KEY = 'analytics:dashboard_stats:refreshing'
+
+    @staticmethod
+    def get_stats():
+        """Return the current snapshot, refreshing it as needed"""
+        entry = cache.get(DashboardStatsService.CACHE_KEY)
+        if entry is None:
+            return DashboardStatsService.refresh()
+
+        age = time.time() - entry['computed_at']
+        if age > AnalyticsConstants.DASHBOARD_STATS_TTL_SECONDS:
+            DashboardStatsService._refresh_in_background()
+        return entry['data']
+
+    @staticmethod
+    def refresh():
+        """Recompute the snapshot and store it in cache"""
+        data = DashboardStatsService.compute()
+        cache.set(
+            DashboardStatsService.CACHE_KEY,
+            {'data': data, 'computed_at': time.time()},
+            timeout=AnalyticsConstants.DASHBOARD_STATS_MAX_STALE_SECONDS
+        )
+        return data
+
+    @staticmethod
+    def compute():
+        """Compute platform stats with one query per table"""
+        from django.contrib.auth.models import User
+        from courses.models import Course, Enrollment
+        from payments.models import PaymentTransaction
+
+        total_users = User.objects.count()
+        # A timestamp range (not __date) lets the index and partition pruning apply
+        today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        active_users_today = AnalyticsEvent.objects.filter(
+            timestamp__gte=today_start,
+            timestamp__lt=today_start + timedelta(days=1),
+            event_type__in=['user_login', 'course_view', 'lesson_start']
+        ).values('user').distinct().count()
+        total_courses = Course.objects.count()
+
+        # Total and completed enrollments in one pass
+        enrollment_stats = Enrollment.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='completed'))
+        )
+        total_enrollments = enrollment_stats['total']
+        completed_enrollments = enrollment_stats['completed']
+        course_completion_rate = (completed_enrollments / total_enrollments * 100) if total_enrollments > 0 else 0
+
+        total_revenue = PaymentTransaction.objects.filter(
+            status='completed'
+        ).aggregate(total=Sum('amount'))['total'] or 0
+
+        avg_session = AnalyticsEvent.objects.filter(
+            event_type='user_login',
+            duration__isnull=False
+        ).aggregate(avg=Avg('duration'))['avg']
+
+        top_courses = Enrollment.objects.values('course__title').annotate(
+            enrollments=Count('id')
+        ).order_by('-enrollments')[:5]
+
+        recent_activity = AnalyticsEvent.objects.select_related('user').order_by('-timestamp')[:10]
+        recent_activity_data = [
+            {
+                'event_type': event.get_event_type_display(),
+                'user': event.user.get_full_name() if event.user else 'Anonymous',
+                'timestamp': event.timestamp,
+                'details': event.event_data.get('description', '')
+            }
+            for event in recent_activity
+        ]
+
+        return {
+            'total_users': total_users,
+            'active_users_today': active_users_today,
+            'total_courses': total_courses,
+            'total_enrollments': total_enrollments,
+            'course_completion_rate': round(course_completion_rate, 2),
+            'total_revenue': float(total_revenue),
+            'average_session_duration': avg_session or timedelta(seconds=0),
+            'top_courses': list(top_courses),
+            'recent_activity': recent_activity_data
+        }
+
+    @staticmethod
+    def _refresh_in_background():
+        # cache.add is atomic, so only one worker refreshes at a time
+        if not cache.add(
+            DashboardStatsService.LOCK_KEY, True,
+            timeout=AnalyticsConstants.DASHBOARD_STATS_REFRESH_LOCK_SECONDS
+        ):
+            return
+        threading.Thread(
+            target=DashboardStatsService._run_refresh, name='analytics-dashboard-refresh', daemon=True
+        ).start()
+
+    @staticmethod
+    def _run_refresh():
+        try:
+            DashboardStatsService.refresh()
+        except Exception:
+            logger.exception('Dashboard stats refresh failed')
+        finally:
+            cache.delete(DashboardStatsService.LOCK_KEY)
+            connection.close()
+
+
+# =============================================================================
+# METRIC ROLLUPS
+# =============================================================================
+
+def _floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt):
+    floored = _floor_hour(dt)
+    return floored if floored == dt else floored + timedelta(hours=1)
+
+
+def _floor_period(dt, period):
+    dt = _floor_hour(dt)
+    if period == 'hourly':
+        return dt
+    dt = dt.replace(hour=0)
+    if period == 'daily':
+        return dt
+    if period == 'weekly':
+        return dt - timedelta(days=dt.weekday())
+    return dt.replace(day=1)
+
+
+def _next_period(dt, period):
+    if period == 'hourly':
+        return dt + timedelta(hours=1)
+    if period == 'daily':
+        return dt + timedelta(days=1)
+    if period == 'weekly':
+        return dt + timedelta(weeks=1)
+    return _add_months(dt, {'monthly': 1, 'quarterly': 3, 'yearly': 12}[period])
+
+
+def _add_months(dt, months):
+    """Same day and time `months` later, clamped to the end of shorter months"""
+    month_index = dt.month - 1 + months
+    year, month = dt.year + month_index // 12, month_index % 12 + 1
+    return dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))
+
+
+def _to_seconds(value):
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value or 0)
+
+
+class MetricPoint:
+    """One rollup value: the metric value, how many raw rows fed it, and an optional sketch"""
+
+    def __init__(self, value=0, data_points=0, sketch=None):
+        self.value = float(value)
+        self.data_points = int(data_points)
+        self.sketch = sketch
+
+
+def _first_at(queryset, field):
+    """Attach a MIN() lookup to a source so backfills find where data starts without bucketing it all"""
+    def decorate(source):
+        source.first_at = lambda until: queryset.filter(**{f'{field}__lt': until}).aggregate(
+            first=Min(field)
+        )['first']
+        return source
+    return decorate
+
+
+def _bucket(queryset, field, start, end):
+    return queryset.filter(**{
+        f'{field}__gte': start, f'{field}__lt': end
+    }).annotate(bucket=TruncHour(field)).values('bucket')
+
+
+def _count_by_hour(queryset, field):
+    @_first_at(queryset, field)
+    def source(start, end):
+        rows = _bucket(queryset, field, start, end).annotate(n=Count('id'))
+        return {row['bucket']: MetricPoint(row['n'], row['n']) for row in rows}
+    return source
+
+
+def _sum_by_hour(queryset, field, value_expression):
+    @_first_at(queryset, field)
+    def source(start, end):
+        rows = _bucket(queryset, field, start, end).annotate(total=Sum(value_expression), n=Count('id'))
+        return {row['bucket']: MetricPoint(_to_seconds(row['total']), row['n']) for row in rows}
+    return source
+
+
+def _avg_by_hour(queryset, field, value_expression):
+    @_first_at(queryset, field)
+    def source(start, end):
+        rows = _bucket(queryset, field, start, end).annotate(avg=Avg(value_expression), n=Count('id'))
+        return {row['bucket']: MetricPoint(_to_seconds(row['avg']), row['n']) for row in rows}
+    return source
+
+
+def _distinct_users_by_hour(queryset, field, user_field='user_id'):
+    @_first_at(queryset, field)
+    def source(start, end):
+        points = {}
+        rows = _bucket(queryset, field, start, end).values_list('bucket', user_field).distinct()
+        for bucket, user_id in rows.iterator(chunk_size=2000):
+            point = points.setdefault(bucket, MetricPoint(sketch=DistinctCountSketch()))
+            point.sketch.add(user_id)
+            point.data_points += 1
+        for point in points.values():
+            point.value = point.sketch.estimate()
+        return points
+    return source
+
+
+def _rollup_sources():
+    """Hourly raw-data sources for every base (non-derived) metric type"""
+    from django.contrib.auth.models import User
+    from courses.models import Enrollment
+    from payments.models import PaymentTransaction
+    from progress.models import LessonProgress, QuizSubmission, AssignmentSubmission
+
+    activity_events = AnalyticsEvent.objects.filter(
+        event_type__in=['user_login', 'course_view', 'lesson_start'], user__isnull=False
+    )
+    completed_payments = PaymentTransaction.objects.filter(status='completed')
+    completed_enrollments = Enrollment.objects.filter(completed_at__isnull=False)
+    graded_quizzes = QuizSubmission.objects.filter(passed__isnull=False)
+
+    return {
+        'active_users': _distinct_users_by_hour(activity_events, 'timestamp'),
+        'new_users': _count_by_hour(User.objects.all(), 'date_joined'),
+        'returning_users': _distinct_users_by_hour(
+            AnalyticsEvent.objects.filter(
+                event_type='user_login',
+                user__date_joined__lte=F('timestamp') - timedelta(days=1)
+            ), 'timestamp'
+        ),
+        'course_enrollments': _count_by_hour(Enrollment.objects.all(), 'enrolled_at'),
+        'course_completions': _count_by_hour(completed_enrollments, 'completed_at'),
+        'average_course_duration': _avg_by_hour(
+            completed_enrollments, 'completed_at', F('completed_at') - F('enrolled_at')
+        ),
+        'lesson_completions': _count_by_hour(
+            LessonProgress.objects.filter(status='completed'), 'completed_at'
+        ),
+        'quiz_attempts': _count_by_hour(QuizSubmission.objects.all(), 'submitted_at'),
+        'quiz_pass_rate': _avg_by_hour(
+            graded_quizzes, 'submitted_at',
+            Case(When(passed=True, then=Value(100.0)), default=Value(0.0), output_field=FloatField())
+        ),
+        'assignment_submissions': _count_by_hour(
+            AssignmentSubmission.objects.filter(submitted_at__isnull=False), 'submitted_at'
+        ),
+        'total_revenue': _sum_by_hour(completed_payments, 'created_at', 'amount'),
+        'average_transaction': _avg_by_hour(completed_payments, 'created_at', 'amount'),
+        'subscription_revenue': _sum_by_hour(
+            completed_payments.filter(payment_type='subscription'), 'created_at', 'amount'
+        ),
+        'course_revenue': _sum_by_hour(
+            completed_payments.filter(payment_type='course_purchase'), 'created_at', 'amount'
+        ),
+        'time_spent_learning': _sum_by_hour(
+            AnalyticsEvent.objects.filter(duration__isnull=False), 'timestamp', 'duration'
+        ),
+        'session_duration': _avg_by_hour(
+            AnalyticsEvent.objects.filter(event_type='user_login', duration__isnull=False),
+            'timestamp', 'duration'
+        ),
+        'feature_usage': _count_by_hour(AnalyticsEvent.objects.all(), 'timestamp'),
+    }
+
+
+class MetricRollupService:
+    """
+    Incremental rollup engine for AnalyticsMetric.
+
+    Hourly rows are computed from raw tables, starting at each metric's
+    stored watermark. Daily rows are derived from hourly rows, and weekly
+    and monthly rows from daily rows, so raw tables are only scanned for the
+    hours that changed. Rollup rows are stored with empty filters.
+    """
+
+    # How finer rows combine into coarser ones
+    SUM, MEAN, DISTINCT, DERIVED, DAILY_MEAN = 'sum', 'mean', 'distinct', 'derived', 'daily_mean'
+
+    METRICS = {
+        'active_users': (DISTINCT, 'count'),
+        'new_users': (SUM, 'count'),
+        'returning_users': (DISTINCT, 'count'),
+        'course_enrollments': (SUM, 'count'),
+        'course_completions': (SUM, 'count'),
+        'average_course_duration': (MEAN, 'duration'),
+        'lesson_completions': (SUM, 'count'),
+        'quiz_attempts': (SUM, 'count'),
+        'quiz_pass_rate': (MEAN, 'percentage'),
+        'assignment_submissions': (SUM, 'count'),
+        'total_revenue': (SUM, 'currency'),
+        'average_transaction': (MEAN, 'currency'),
+        'subscription_revenue': (SUM, 'currency'),
+        'course_revenue': (SUM, 'currency'),
+        'time_spent_learning': (SUM, 'duration'),
+        'session_duration': (MEAN, 'duration'),
+        'feature_usage': (SUM, 'count'),
+        # Computed from other rollups of the same period
+        'course_completion_rate': (DERIVED, 'percentage'),
+        'user_engagement': (DERIVED, 'count'),
+        'daily_active_users': (DAILY_MEAN, 'count'),
+    }
+
+    # Derived metric -> (numerator, denominator, scale)
+    DERIVED_INPUTS = {
+        'course_completion_rate': ('course_completions', 'course_enrollments', 100),
+        'user_engagement': ('feature_usage', 'active_users', 1),
+    }
+
+    # Coarser period -> finer period it is built from
+    PERIOD_SOURCES = [('daily', 'hourly'), ('weekly', 'daily'), ('monthly', 'daily')]
+
+    # Marks AnalyticsMetric rows computed on demand, keeping them apart from rollup rows
+    AD_HOC_FILTER = 'ad_hoc'
+
+    @staticmethod
+    def run(metric_types=None, until=None, rebuild_from=None):
+        """
+        Roll up everything since each metric's watermark (or rebuild_from).
+        Returns {metric_type: number of rows written}.
+        """
+        until = until or timezone.now()
+        metric_types = MetricRollupService._ordered(metric_types)
+        sources = _rollup_sources()
+        watermarks = {
+            w.metric_type: w.processed_until
+            for w in MetricRollupWatermark.objects.filter(metric_type__in=metric_types)
+        }
+
+        written = {}
+        late_window = timedelta(hours=AnalyticsConstants.ROLLUP_LATE_WINDOW_HOURS)
+        for metric_type in metric_types:
+            start = rebuild_from or watermarks.get(metric_type)
+            if start is None:
+                start = MetricRollupService._first_data_at(metric_type, sources, until)
+            elif not rebuild_from:
+                # Re-roll recent closed hours: rows can land after their hour was
+                # processed (buffered events, clock skew, late writes)
+                start = min(start, until - late_window)
+            if start is None:
+                written[metric_type] = 0
+                continue
+            start = _floor_hour(start)
+            end = _ceil_hour(until)
+
+            with transaction.atomic():
+                written[metric_type] = MetricRollupService._rollup_metric(
+                    metric_type, sources, start, end, until
+                )
+                # Re-process the current (partial) hour on the next run
+                MetricRollupWatermark.objects.update_or_create(
+                    metric_type=metric_type, defaults={'processed_until': _floor_hour(until)}
+                )
+        return written
+
+    @staticmethod
+    def period_end(start, period):
+        """Where an aggregation period beginning at `start` ends"""
+        return _next_period(start, period)
+
+    @staticmethod
+    def value_for_range(metric_type, start, end):
+        """
+        Metric value for an arbitrary range, read from the coarsest rollup
+        rows that tile it (months, then days, then hours at the edges).
+        """
+        kind = MetricRollupService.METRICS[metric_type][0]
+        if kind == MetricRollupService.DERIVED:
+            numerator, denominator, scale = MetricRollupService.DERIVED_INPUTS[metric_type]
+            num = MetricRollupService.value_for_range(numerator, start, end)
+            den = MetricRollupService.value_for_range(denominator, start, end)
+            return round(num / den * scale, 4) if den else 0
+
+        segments = []
+        cursor, end = _floor_hour(start), _ceil_hour(end)
+        while cursor < end:
+            for period in ('monthly', 'daily', 'hourly'):
+                if _floor_period(cursor, period) == cursor and _next_period(cursor, period) <= end:
+                    segments.append((period, cursor))
+                    cursor = _next_period(cursor, period)
+                    break
+
+        lookup = Q()
+        for period in ('monthly', 'daily', 'hourly'):
+            starts = [s for p, s in segments if p == period]
+            if starts:
+                lookup |= Q(aggregation_period=period, period_start__in=starts)
+        if not segments:
+            return 0
+
+        rows = AnalyticsMetric.objects.filter(lookup, metric_type=metric_type, filters={}).only(
+            'value', 'data_points', 'sketch', 'period_start', 'period_end'
+        )
+        points = [MetricRollupService._point(row) for row in rows]
+        if kind == MetricRollupService.DAILY_MEAN:
+            days = max((end - _floor_hour(start)).total_seconds() / 86400, 1)
+            return round(sum(p.value * p.data_points for p in points) / days, 4)
+        return round(MetricRollupService._combine(kind, points).value, 4)
+
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _ordered(metric_types):
+        """Base metrics first so derived metrics see fresh inputs"""
+        requested = set(metric_types or MetricRollupService.METRICS)
+        for metric_type in list(requested):
+            inputs = MetricRollupService.DERIVED_INPUTS.get(metric_type)
+            if inputs:
+                requested.update(inputs[:2])
+            if metric_type == 'daily_active_users':
+                requested.add('active_users')
+        return [m for m in MetricRollupService.METRICS if m in requested]
+
+    @staticmethod
+    def _first_data_at(metric_type, sources, until):
+        """Earliest timestamp to roll up when a metric has no watermark yet"""
+        if metric_type in sources:
+            return sources[metric_type].first_at(until)
+        inputs = MetricRollupService.DERIVED_INPUTS.get(metric_type, ('active_users',))
+        first = AnalyticsMetric.objects.filter(
+            metric_type__in=inputs[:2], aggregation_period='hourly', filters={}
+        ).order_by('period_start').values_list('period_start', flat=True).first()
+        return first
+
+    @staticmethod
+    def _rollup_metric(metric_type, sources, start, end, until):
+        kind, value_type = MetricRollupService.METRICS[metric_type]
+        written = 0
+
+        if metric_type in sources:
+            hourly = sources[metric_type](start, end)
+            written += MetricRollupService._save(metric_type, value_type, 'hourly', hourly)
+        elif kind == MetricRollupService.DERIVED:
+            hourly = MetricRollupService._derive(metric_type, 'hourly', start, end)
+            written += MetricRollupService._save(metric_type, value_type, 'hourly', hourly)
+
+        for period, finer in MetricRollupService.PERIOD_SOURCES:
+            period_start = _floor_period(start, period)
+            if kind == MetricRollupService.DERIVED:
+                points = MetricRollupService._derive(metric_type, period, period_start, end)
+            elif kind == MetricRollupService.DAILY_MEAN:
+                points = MetricRollupService._daily_mean(period, period_start, end, until)
+            else:
+                points = MetricRollupService._aggregate(metric_type, kind, period, finer, period_start, end)
+            written += MetricRollupService._save(metric_type, value_type, period, points)
+        return written
+
+    @staticmethod
+    def _aggregate(metric_type, kind, period, finer, start, end):
+        """Build coarser rows by combining the finer rollup rows they contain"""
+        grouped = {}
+        rows = AnalyticsMetric.objects.filter(
+            metric_type=metric_type, aggregation_period=finer, filters={},
+            period_start__gte=start, period_start__lt=end
+        ).only('value', 'data_points', 'sketch', 'period_start')
+        for row in rows.iterator(chunk_size=2000):
+            grouped.setdefault(_floor_period(row.period_start, period), []).append(
+                MetricRollupService._point(row)
+            )
+        return {
+            bucket: MetricRollupService._combine(kind, points)
+            for bucket, points in grouped.items()
+        }
+
+    @staticmethod
+    def _derive(metric_type, period, start, end):
+        numerator, denominator, scale = MetricRollupService.DERIVED_INPUTS[metric_type]
+        values = {numerator: {}, denominator: {}}
+        rows = AnalyticsMetric.objects.filter(
+            metric_type__in=[numerator, denominator], aggregation_period=period, filters={},
+            period_start__gte=start, period_start__lt=end
+        ).values_list('metric_type', 'period_start', 'value')
+        for row_type, period_start, value in rows:
+            values[row_type][period_start] = float(value)
+
+        points = {}
+        for bucket, den in values[denominator].items():
+            if den:
+                num = values[numerator].get(bucket, 0)
+                points[bucket] = MetricPoint(num / den * scale, int(den))
+        return points
+
+    @staticmethod
+    def _daily_mean(period, start, end, until):
+        """Daily active users: daily = distinct users that day, coarser = mean per day"""
+        if period == 'daily':
+            rows = AnalyticsMetric.objects.filter(
+                metric_type='active_users', aggregation_period='daily', filters={},
+                period_start__gte=start, period_start__lt=end
+            ).values_list('period_start', 'value')
+            return {bucket: MetricPoint(value, 1) for bucket, value in rows}
+
+        totals = {}
+        rows = AnalyticsMetric.objects.filter(
+            metric_type='daily_active_users', aggregation_period='daily', filters={},
+            period_start__gte=start, period_start__lt=end
+        ).values_list('period_start', 'value')
+        for day, value in rows:
+            bucket = _floor_period(day, period)
+            totals[bucket] = totals.get(bucket, 0) + float(value)
+
+        points = {}
+        for bucket, total in totals.items():
+            period_end = min(_next_period(bucket, period), _ceil_hour(until))
+            days = max(math.ceil((period_end - bucket).total_seconds() / 86400), 1)
+            points[bucket] = MetricPoint(total / days, days)
+        return points
+
+    @staticmethod
+    def _combine(kind, points):
+        if not points:
+            return MetricPoint()
+        data_points = sum(p.data_points for p in points)
+        if kind == MetricRollupService.DISTINCT:
+            sketch = DistinctCountSketch()
+            for point in points:
+                if point.sketch is not None:
+                    sketch.merge(point.sketch)
+            return MetricPoint(sketch.estimate(), data_points, sketch)
+        if kind == MetricRollupService.MEAN:
+            weighted = sum(p.value * p.data_points for p in points)
+            return MetricPoint(weighted / data_points if data_points else 0, data_points)
+        return MetricPoint(sum(p.value for p in points), data_points)
+
+    @staticmethod
+    def _point(row):
+        sketch = DistinctCountSketch.from_bytes(row.sketch) if row.sketch else None
+        return MetricPoint(row.value, row.data_points, sketch)
+
+    @staticmethod
+    def _save(metric_type, value_type, period, points):
+        """Upsert rollup rows for one metric and period"""
+        if not points:
+            return 0
+
+        now = timezone.now()
+        existing = {
+            row.period_start: row
+            for row in AnalyticsMetric.objects.filter(
+                metric_type=metric_type, aggregation_period=period, filters={},
+                period_start__gte=min(points), period_start__lte=max(points)
+            )
+        }
+
+        to_create, to_update = [], []
+        for bucket, point in points.items():
+            row = existing.get(bucket) or AnalyticsMetric(
+                metric_type=metric_type, aggregation_period=period,
+                period_start=bucket, filters={}
+            )
+            row.period_end = _next_period(bucket, period)
+            row.value = Decimal(str(round(point.value, 4)))
+            row.value_type = value_type
+            row.data_points = point.data_points
+            row.sketch = point.sketch.to_bytes() if point.sketch is not None else None
+            row.calculated_at = now
+            (to_update if row.pk else to_create).append(row)
+
+        AnalyticsMetric.objects.bulk_create(to_create, batch_size=500)
+        AnalyticsMetric.objects.bulk_update(
+            to_update,
+            ['period_end', 'value', 'value_type', 'data_points', 'sketch', 'calculated_at'],
+            batch_size=500
+        )
+        return len(points)
+
+
+# =============================================================================
+# COURSE ANALYTICS
+# =============================================================================
+
+class CourseAnalyticsService:
+    """Per-course analytics queries"""
+
+    @staticmethod
+    def drop_off_funnel(course, total_enrollments):
+        """
+        Per-lesson drop-off for every lesson of a course in course order.
+
+        One grouped query counts, per lesson, the enrolled students who
+        completed it; drop-off is the share of enrollments that did not.
+        """
+        from courses.models import Lesson
+
+        lessons = Lesson.objects.filter(module__course=course).annotate(
+            completions=Count(
+                'progress_records__student',
+                filter=Q(
+                    progress_records__status='completed',
+                    progress_records__student__enrollments__course=course
+                ),
+                distinct=True
+            )
+        ).order_by('module__order', 'order').values('id', 'title', 'completions')
+
+        funnel = []
+        for lesson_number, lesson in enumerate(lessons, start=1):
+            drop_off_rate = (
+                (total_enrollments - lesson['completions']) / total_enrollments * 100
+            ) if total_enrollments > 0 else 0
+            funnel.append({
+                'lesson_number': lesson_number,
+                'lesson_id': lesson['id'],
+                'lesson_title': lesson['title'],
+                'completions': lesson['completions'],
+                'drop_off_rate': round(drop_off_rate, 2)
+            })
+        return funnel
+
+
+# =============================================================================
+# BACKGROUND JOBS
+# =============================================================================
+
+def _run_report_job(job):
+    report = AnalyticsReport.objects.get(report_id=job.payload['report_id'])
+    job.set_progress(10)
+    file_path = report.generate_report(job.payload.get('format_type', 'csv'))
+    return {'file_path': file_path, 'file_size': report.file_size}
+
+
+def _run_export_job(job):
+    export = DataExport.objects.get(export_id=job.payload['export_id'])
+    job.set_progress(10)
+    file_path = export.generate()
+    return {'file_path': file_path, 'file_size': export.file_size, 'record_count': export.record_count}
+
+
+class JobQueueService:
+    """
+    DB-backed job queue.
+
+    Views enqueue BackgroundJob rows; `run_workers` claims them with
+    SELECT ... FOR UPDATE SKIP LOCKED and executes them in a process pool.
+    Running jobs refresh locked_at every JOB_HEARTBEAT_INTERVAL_SECONDS, so
+    only jobs whose worker died are requeued. Failed jobs are retried with
+    linear backoff up to max_attempts.
+    """
+
+    HANDLERS = {
+        'generate_report': _run_report_job,
+        'generate_export': _run_export_job,
+        'build_image_variants': images.run_variants_job,
+    }
+
+    @staticmethod
+    def enqueue(job_type, payload, user=None, run_after=None):
+        """Queue a job and return it"""
+        return jobs.enqueue(job_type, payload, user=user, run_after=run_after)
+
+    @staticmethod
+    def claim(worker_id, limit=1):
+        """Lock up to `limit` due jobs for this worker and return their ids"""
+        now = timezone.now()
+        with transaction.atomic():
+            job_ids = list(
+                BackgroundJob.objects.select_for_update(skip_locked=True).filter(
+                    status='queued', run_after__lte=now
+                ).order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+            )
+            if job_ids:
+                BackgroundJob.objects.filter(id__in=job_ids).update(
+                    status='running', locked_by=worker_id, locked_at=now,
+                    started_at=now, attempts=F('attempts') + 1
+                )
+        return job_ids
+
+    @staticmethod
+    def run(job_id):
+        """Execute a claimed job and record the outcome"""
+        job = BackgroundJob.objects.get(id=job_id)
+        try:
+            with JobQueueService._heartbeat(job):
+                result = JobQueueService.HANDLERS[job.job_type](job)
+        except Exception as e:
+            logger.exception('Background job %s failed', job.job_id)
+            JobQueueService._fail(job, e)
+            return False
+
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status='completed', progress=100, result=result or {}, error='',
+            locked_by='', locked_at=None, finished_at=timezone.now()
+        )
+        return True
+
+    @staticmethod
+    def heartbeat(job):
+        """Refresh the lock on a running job so it is not treated as stale"""
+        return BackgroundJob.objects.filter(
+            pk=job.pk, status='running', locked_by=job.locked_by
+        ).update(locked_at=timezone.now())
+
+    @staticmethod
+    def requeue_stale():
+        """
+        Put back jobs whose worker died mid-run; jobs that have used up
+        max_attempts are marked failed instead.
+        """
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=AnalyticsConstants.JOB_LOCK_TIMEOUT_SECONDS)
+        stale = BackgroundJob.objects.filter(status='running', locked_at__lt=cutoff)
+
+        stale.filter(attempts__gte=F('max_attempts')).update(
+            status='failed', error='Worker stopped responding', locked_by='', locked_at=None,
+            finished_at=now
+        )
+        return stale.filter(attempts__lt=F('max_attempts')).update(
+            status='queued', locked_by='', locked_at=None
+        )
+
+    @staticmethod
+    def schedule_due_reports():
+        """Enqueue scheduled reports whose next_run has passed"""
+        now = timezone.now()
+        queued = 0
+        with transaction.atomic():
+            # Row locks keep concurrent workers from queueing the same report twice
+            due_reports = AnalyticsReport.objects.select_for_update(skip_locked=True).filter(
+                is_scheduled=True
+            ).filter(Q(next_run__lte=now) | Q(next_run__isnull=True))
+
+            for report in due_reports:
+                JobQueueService.enqueue('generate_report', {
+                    'report_id': str(report.report_id),
+                    'format_type': report.config.get('format_type', 'csv'),
+                }, user=report.created_by)
+                report.schedule_next_run(now)
+                queued += 1
+        return queued
+
+    @staticmethod
+    @contextmanager
+    def _heartbeat(job):
+        """Call heartbeat() from a side thread while the job runs"""
+        stopped = threading.Event()
+
+        def beat():
+            try:
+                while not stopped.wait(AnalyticsConstants.JOB_HEARTBEAT_INTERVAL_SECONDS):
+                    JobQueueService.heartbeat(job)
+            except Exception:
+                logger.exception('Heartbeat for background job %s failed', job.job_id)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, name=f'job-heartbeat-{job.pk}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    @staticmethod
+    def _fail(job, exc):
+        job.refresh_from_db(fields=['attempts', 'max_attempts'])
+        fields = {'error': str(exc), 'locked_by': '', 'locked_at': None}
+        if job.attempts < job.max_attempts:
+            fields.update(
+                status='queued',
+                run_after=timezone.now() + timedelta(
+                    seconds=AnalyticsConstants.JOB_RETRY_BACKOFF_SECONDS * job.attempts
+                )
+            )
+        else:
+            fields.update(status='failed', finished_at=timezone.now())
+        BackgroundJob.objects.filter(pk=job.pk).update(**fields)
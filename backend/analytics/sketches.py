@@ -0,0 +1,54 @@
+"""
+Mergeable distinct-count sketch used by metric rollups.
+
+Distinct-user metrics (active users, returning users) cannot be summed
+across hours without double counting, so each rollup row stores a small
+HyperLogLog sketch of the users it saw. Coarser rollups merge the sketches
+of their finer rows instead of rescanning raw events.
+"""
+import hashlib
+import math
+import zlib
+
+PRECISION = 11
+REGISTER_COUNT = 1 << PRECISION
+HASH_BITS = 64
+
+
+class DistinctCountSketch:
+    """HyperLogLog with 2048 registers (~2.3% standard error)"""
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers else bytearray(REGISTER_COUNT)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        x = int.from_bytes(digest, 'big')
+        index = x >> (HASH_BITS - PRECISION)
+        remainder = x & ((1 << (HASH_BITS - PRECISION)) - 1)
+        rank = (HASH_BITS - PRECISION) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        m = REGISTER_COUNT
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data:
+            return cls()
+        return cls(zlib.decompress(bytes(data)))
@@ -1,3 +1,717 @@
-from django.test import TestCase
+import importlib.util
+import json
+import re
+import tempfile
+import uuid
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.core.files.storage import default_storage
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.management import call_command, CommandError
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from .models import (
+    AnalyticsEvent, AnalyticsMetric, AnalyticsReport, BackgroundJob, DataExport, MetricRollupWatermark
+)
+from .services import (
+    EventIngestionBuffer, EventBufferFull, MetricRollupService, DashboardStatsService,
+    JobQueueService
+)
+from . import partitions
+from core import jobs
+from core.constants import AnalyticsConstants
+
+User = get_user_model()
+
+
+class EventIngestionBufferTest(TestCase):
+    """Test buffered analytics event ingestion"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+
+    def test_events_written_in_one_batch(self):
+        """Test events are held until the batch size is reached"""
+        buffer = EventIngestionBuffer(max_size=10, batch_size=3, flush_interval=60)
+
+        buffer.enqueue('course_view', user=self.user)
+        buffer.enqueue('lesson_start', user=self.user)
+        self.assertEqual(AnalyticsEvent.objects.count(), 0)
+        self.assertEqual(buffer.stats()['queue_depth'], 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            buffer.enqueue('lesson_complete', user=self.user)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(AnalyticsEvent.objects.count(), 3)
+        stats = buffer.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['total_flushed'], 3)
+        self.assertIsNotNone(stats['last_flush_latency_ms'])
+
+    def test_backpressure_when_buffer_full(self):
+        """Test a full buffer flushes in the caller and rejects when it cannot drain"""
+        buffer = EventIngestionBuffer(max_size=2, batch_size=100, flush_interval=60)
+        buffer.enqueue('course_view', user=self.user)
+        buffer.enqueue('course_view', user=self.user)
+
+        # Full buffer is drained synchronously before accepting the new event
+        buffer.enqueue('course_view', user=self.user)
+        self.assertEqual(AnalyticsEvent.objects.count(), 2)
+        self.assertEqual(buffer.stats()['queue_depth'], 1)
+
+        # A failing flush leaves the buffer full and the event is rejected
+        buffer.enqueue('course_view', user=self.user)
+        with patch.object(AnalyticsEvent.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('analytics.services', level='ERROR'):
+            with self.assertRaises(EventBufferFull):
+                buffer.enqueue('course_view', user=self.user)
+        self.assertEqual(buffer.stats()['queue_depth'], 2)
+        self.assertEqual(buffer.stats()['total_rejected'], 1)
+
+    def test_rejected_rows_do_not_block_the_batch(self):
+        """Test a row the database rejects is dropped and the rest of the batch is written"""
+        buffer = EventIngestionBuffer(max_size=10, batch_size=10, flush_interval=60)
+        duplicate = AnalyticsEvent.objects.create(event_type='course_view', user=self.user)
+        buffer.enqueue('course_view', user=self.user)
+        buffer.enqueue(
+            'course_view', user=self.user, event_id=duplicate.event_id, timestamp=duplicate.timestamp
+        )
+        buffer.enqueue('lesson_start', user=self.user)
+
+        with self.assertLogs('analytics.services', level='ERROR'):
+            written = buffer.flush()
+
+        self.assertEqual(written, 2)
+        self.assertEqual(AnalyticsEvent.objects.count(), 3)
+        stats = buffer.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['total_dead_lettered'], 1)
+
+    def test_transient_failures_are_retried_up_to_a_limit(self):
+        """Test a batch is requeued on transient errors and dropped once retries run out"""
+        buffer = EventIngestionBuffer(max_size=10, batch_size=10, flush_interval=60)
+        buffer.enqueue('course_view', user=self.user)
+
+        with patch.object(AnalyticsEvent.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('analytics.services', level='ERROR'):
+            for _ in range(AnalyticsConstants.EVENT_FLUSH_MAX_RETRIES):
+                buffer.flush()
+            self.assertEqual(buffer.stats()['queue_depth'], 1)
+            buffer.flush()
+
+        stats = buffer.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['total_dead_lettered'], 1)
+
+
+class TrackEventsBatchAPITest(APITestCase):
+    """Test the batch event tracking endpoint"""
+
+    def setUp(self):
+        self.url = reverse('track-events-batch')
+
+        # A private buffer without the timer thread, flushed explicitly by each test
+        self.buffer = EventIngestionBuffer(max_size=10, batch_size=100, flush_interval=60)
+        for patcher in (patch('analytics.views.event_buffer', self.buffer),
+                        patch.object(self.buffer, '_ensure_timer')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_batch_reports_per_item_status(self):
+        """Test valid events are queued and invalid ones rejected by index"""
+        payload = [
+            {'event_type': 'course_view', 'related_objects': {'course_id': 1}},
+            {'event_type': 'not_a_real_event'},
+            {'event_type': 'lesson_start'},
+        ]
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertEqual(response.data['rejected'], 1)
+        statuses = [item['status'] for item in response.data['results']]
+        self.assertEqual(statuses, ['accepted', 'rejected', 'accepted'])
+        self.assertIn('event_type', response.data['results'][1]['errors'])
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertTrue(AnalyticsEvent.objects.filter(
+            event_id=response.data['results'][0]['event_id'], event_type='course_view'
+        ).exists())
+
+    def test_ndjson_body(self):
+        """Test newline-delimited JSON bodies are accepted"""
+        body = '{"event_type": "course_view"}\n\n{"event_type": "lesson_start"}\n'
+
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['accepted'], 2)
+        self.buffer.flush()
+        self.assertEqual(AnalyticsEvent.objects.count(), 2)
+
+    def test_nothing_accepted_is_a_bad_request(self):
+        """Test a batch with no valid events answers 400 with per-item errors"""
+        response = self.client.post(self.url, [{'event_type': 'nope'}, {}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['accepted'], 0)
+        self.assertEqual([item['status'] for item in response.data['results']], ['rejected', 'rejected'])
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_full_buffer_asks_client_to_retry(self):
+        """Test a batch that does not fit is refused as a whole with Retry-After"""
+        self.buffer.max_size = 2
+        payload = [{'event_type': 'course_view'}, {'event_type': 'bogus'}, {'event_type': 'lesson_start'}]
+        with patch.object(AnalyticsEvent.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('analytics.services', level='ERROR'):
+            self.client.post(self.url, [{'event_type': 'course_view'}], format='json')
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(response.data['accepted'], 0)
+        self.assertEqual([item['status'] for item in response.data['results']], ['retry', 'rejected', 'retry'])
+        self.assertEqual(len(self.buffer), 1)
+
+    def test_non_list_body_rejected(self):
+        """Test a single object is not accepted as a batch"""
+        response = self.client.post(self.url, {'event_type': 'course_view'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MetricRollupServiceTest(TestCase):
+    """Test incremental metric rollups"""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='password123')
+            for i in range(3)
+        ]
+        # Fixed midday start so hour, day and month buckets never straddle a boundary
+        self.start = datetime(2026, 3, 10, 12, tzinfo=dt_timezone.utc)
+
+    def _event(self, user, hours):
+        event = AnalyticsEvent.objects.create(event_type='course_view', user=user)
+        AnalyticsEvent.objects.filter(pk=event.pk).update(timestamp=self.start + timedelta(hours=hours))
+
+    def test_coarser_rollups_derived_from_finer(self):
+        """Test daily rows combine hourly rows and distinct users are not double counted"""
+        self._event(self.users[0], 1)
+        self._event(self.users[0], 2)
+        self._event(self.users[1], 2)
+
+        MetricRollupService.run(['active_users', 'feature_usage'], until=self.start + timedelta(hours=6))
+
+        hourly = AnalyticsMetric.objects.filter(metric_type='feature_usage', aggregation_period='hourly')
+        self.assertEqual(sorted(int(m.value) for m in hourly), [1, 2])
+        day_start = self.start.replace(hour=0)
+        daily_users = AnalyticsMetric.objects.get(
+            metric_type='active_users', aggregation_period='daily', period_start=day_start
+        )
+        self.assertEqual(int(daily_users.value), 2)
+        self.assertEqual(
+            MetricRollupService.value_for_range('feature_usage', day_start, day_start + timedelta(days=7)), 3
+        )
+
+    def test_incremental_run_uses_watermark(self):
+        """Test a second run only picks up events after the watermark"""
+        self._event(self.users[0], 1)
+        MetricRollupService.run(['feature_usage'], until=self.start + timedelta(hours=2))
+        watermark = MetricRollupWatermark.objects.get(metric_type='feature_usage')
+        self.assertEqual(watermark.processed_until, self.start + timedelta(hours=2))
+
+        self._event(self.users[2], 10)
+        MetricRollupService.run(['feature_usage'], until=self.start + timedelta(hours=12))
+
+        total = MetricRollupService.value_for_range('feature_usage', self.start, self.start + timedelta(hours=12))
+        self.assertEqual(total, 2)
+
+    def test_late_rows_in_closed_hours_are_counted(self):
+        """Test rows written after their hour was rolled up are picked up by the trailing window"""
+        self._event(self.users[0], 1)
+        MetricRollupService.run(['feature_usage'], until=self.start + timedelta(hours=3))
+
+        # Arrives after hour 1 was closed, e.g. flushed late from the ingestion buffer
+        self._event(self.users[1], 1)
+        MetricRollupService.run(['feature_usage'], until=self.start + timedelta(hours=4))
+
+        hour = AnalyticsMetric.objects.get(
+            metric_type='feature_usage', aggregation_period='hourly', period_start=self.start + timedelta(hours=1)
+        )
+        self.assertEqual(int(hour.value), 2)
+
+
+class CalculateMetricsAPITest(APITestCase):
+    """Test on-demand metric calculation"""
+
+    def setUp(self):
+        self.url = reverse('calculate-metrics')
+        self.admin = User.objects.create_user(username='admin', email='admin@test.com', password='password123')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.day = datetime(2026, 3, 10, tzinfo=dt_timezone.utc)
+
+    def payload(self, end):
+        return {
+            'metric_types': ['feature_usage'], 'aggregation_period': 'daily',
+            'start_date': self.day.isoformat(), 'end_date': end.isoformat(),
+        }
+
+    def test_requires_admin(self):
+        """Test non-admins cannot persist metrics"""
+        student = User.objects.create_user(username='student', email='student@test.com', password='password123')
+        self.client.force_authenticate(user=student)
+        response = self.client.post(self.url, self.payload(self.day + timedelta(days=1)), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_period_must_match_range_and_rollups_are_untouched(self):
+        """Test a mismatched range is rejected and results never overwrite rollup rows"""
+        event = AnalyticsEvent.objects.create(event_type='course_view', user=self.admin)
+        AnalyticsEvent.objects.filter(pk=event.pk).update(timestamp=self.day + timedelta(hours=5))
+        MetricRollupService.run(['feature_usage'], until=self.day + timedelta(days=1))
+        rollup = AnalyticsMetric.objects.get(
+            metric_type='feature_usage', aggregation_period='daily', period_start=self.day, filters={}
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(self.url, self.payload(self.day + timedelta(days=30)), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, self.payload(self.day + timedelta(days=1)), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['metrics'][0]['filters'], {MetricRollupService.AD_HOC_FILTER: True})
+        rollup_after = AnalyticsMetric.objects.get(pk=rollup.pk)
+        self.assertEqual(rollup_after.value, rollup.value)
+        self.assertEqual(rollup_after.calculated_at, rollup.calculated_at)
+
+
+class DashboardStatsServiceTest(TestCase):
+    """Test the cached dashboard stats snapshot"""
+
+    def setUp(self):
+        cache.delete(DashboardStatsService.CACHE_KEY)
+        cache.delete(DashboardStatsService.LOCK_KEY)
+        User.objects.create_user(username='student', email='student@test.com', password='password123')
+
+    def test_warm_cache_runs_no_queries(self):
+        """Test a fresh snapshot is served without touching the database"""
+        DashboardStatsService.get_stats()
+        with self.assertNumQueries(0):
+            stats = DashboardStatsService.get_stats()
+        self.assertEqual(stats['total_users'], 1)
+
+    def test_stale_snapshot_served_while_revalidating(self):
+        """Test a stale snapshot is returned and a single refresh is scheduled"""
+        DashboardStatsService.get_stats()
+        entry = cache.get(DashboardStatsService.CACHE_KEY)
+        entry['computed_at'] -= AnalyticsConstants.DASHBOARD_STATS_TTL_SECONDS + 1
+        cache.set(DashboardStatsService.CACHE_KEY, entry)
+        User.objects.create_user(username='other', email='other@test.com', password='password123')
+
+        with patch('analytics.services.threading.Thread') as thread:
+            self.assertEqual(DashboardStatsService.get_stats()['total_users'], 1)
+            DashboardStatsService.get_stats()
+        thread.assert_called_once()
+
+        DashboardStatsService._run_refresh()
+        self.assertEqual(DashboardStatsService.get_stats()['total_users'], 2)
+
+
+class CoursePerformanceAPITest(APITestCase):
+    """Test the course performance drop-off funnel"""
+
+    def setUp(self):
+        from courses.models import Course, Module, Lesson, Enrollment
+        from progress.models import LessonProgress
+
+        self.instructor = User.objects.create_user(
+            username='instructor', email='instructor@test.com', password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Funnel Course', description='Course', instructor=self.instructor
+        )
+        module = Module.objects.create(course=self.course, title='Module', order=1)
+        self.lessons = [
+            Lesson.objects.create(module=module, title=f'Lesson {i}', order=i)
+            for i in range(1, 13)
+        ]
+        students = [
+            User.objects.create_user(username=f'student{i}', email=f's{i}@test.com', password='password123')
+            for i in range(4)
+        ]
+        for depth, student in enumerate(students):
+            Enrollment.objects.create(student=student, course=self.course)
+            # Student n completes the first n * 4 lessons
+            for lesson in self.lessons[:depth * 4]:
+                LessonProgress.objects.create(student=student, lesson=lesson, status='completed')
+
+        self.client.force_authenticate(self.instructor)
+        self.url = reverse('course-performance', args=[self.course.id])
+
+    def test_drop_off_covers_every_lesson(self):
+        """Test drop-off is reported for all lessons, not just the first nine"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        drop_off = response.data['drop_off_points']
+        self.assertEqual(len(drop_off), 12)
+        self.assertEqual(drop_off[0]['completions'], 3)
+        self.assertEqual(drop_off[0]['drop_off_rate'], 25.0)
+        self.assertEqual(drop_off[11]['completions'], 1)
+        self.assertEqual(drop_off[11]['drop_off_rate'], 75.0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class StreamingExportTest(TestCase):
+    """Test streamed report and data exports"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='exporter', email='exporter@test.com', password='password123'
+        )
+
+    def test_report_csv_is_not_truncated(self):
+        """Test every matching metric row is written, not just the first 100"""
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        AnalyticsMetric.objects.bulk_create([
+            AnalyticsMetric(
+                metric_type='feature_usage', aggregation_period='hourly',
+                period_start=now - timedelta(hours=i), period_end=now - timedelta(hours=i - 1),
+                value=i
+            )
+            for i in range(150)
+        ])
+        report = AnalyticsReport.objects.create(
+            title='Usage', report_type='custom', created_by=self.user
+        )
+
+        report.generate_report('csv')
+
+        with default_storage.open(report.file_path) as handle:
+            lines = handle.read().decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 151)
+        self.assertEqual(report.file_size, default_storage.size(report.file_path))
+
+    def test_data_export_ndjson_anonymized(self):
+        """Test exports stream rows as NDJSON with user ids pseudonymized"""
+        AnalyticsEvent.objects.create(event_type='course_view', user=self.user, session_id='abc')
+        AnalyticsEvent.objects.create(event_type='lesson_start', user=self.user)
+        export = DataExport.objects.create(
+            export_type='analytics_data', title='Events', file_format='ndjson',
+            requested_by=self.user
+        )
+
+        export.generate()
+
+        self.assertEqual(export.status, 'completed')
+        self.assertEqual(export.record_count, 2)
+        with default_storage.open(export.file_path) as handle:
+            rows = [json.loads(line) for line in handle.read().decode('utf-8').splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertNotIn('session_id', rows[0])
+        self.assertNotEqual(rows[0]['user_id'], self.user.id)
+
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow not installed')
+    def test_data_export_parquet(self):
+        """Test columnar exports are written with dictionary-encoded categories"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for event_type in ['course_view', 'lesson_start', 'course_view']:
+            AnalyticsEvent.objects.create(event_type=event_type, user=self.user, duration=timedelta(seconds=5))
+        export = DataExport.objects.create(
+            export_type='analytics_data', title='Events', file_format='parquet',
+            requested_by=self.user
+        )
+
+        export.generate()
+
+        self.assertEqual(export.record_count, 3)
+        with default_storage.open(export.file_path) as handle:
+            table = pq.read_table(handle)
+        self.assertEqual(table.num_rows, 3)
+        self.assertTrue(pa.types.is_dictionary(table.schema.field('event_type').type))
+        self.assertTrue(pa.types.is_dictionary(table.schema.field('source').type))
+        self.assertNotIn('session_id', table.column_names)
+        self.assertNotIn(self.user.id, table.column('user_id').to_pylist())
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow not installed')
+    def test_arrow_export_spans_several_batches(self):
+        """Test dictionary columns stay readable when an IPC file has several batches"""
+        import pyarrow as pa
+
+        from .exports import columnar_schema, write_columnar
+
+        rows = [
+            ('course_view', 'web'), ('lesson_start', 'web'),
+            ('course_view', 'mobile'), ('quiz_submit', None),
+            ('lesson_start', 'api'),
+        ]
+        schema, converters = columnar_schema(
+            AnalyticsEvent, ['event_type', 'source'], dictionary_fields=['source']
+        )
+
+        path, _ = write_columnar('exports/batches.arrow', 'arrow', iter(rows), schema, converters, row_group_size=2)
+
+        with default_storage.open(path) as handle:
+            reader = pa.ipc.open_file(handle)
+            self.assertEqual(reader.num_record_batches, 3)
+            table = reader.read_all()
+        self.assertEqual(list(zip(*table.to_pydict().values())), rows)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BackgroundJobTest(APITestCase):
+    """Test queued report generation"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reporter', email='reporter@test.com', password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.report = AnalyticsReport.objects.create(
+            title='Weekly', report_type='custom', created_by=self.user
+        )
+
+    def test_generate_enqueues_and_worker_runs(self):
+        """Test generation returns 202 with a pollable job that a worker completes"""
+        response = self.client.post(
+            reverse('analyticsreport-generate', args=[self.report.pk]), {'format_type': 'json'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+
+        call_command('run_workers', processes=0, once=True, stdout=StringIO())
+
+        poll = self.client.get(response.data['status_url'])
+        self.assertEqual(poll.data['status'], 'completed')
+        self.assertEqual(poll.data['progress'], 100)
+        self.report.refresh_from_db()
+        self.assertTrue(self.report.file_path.endswith('.json'))
+
+    def test_excel_is_not_offered(self):
+        """Test reports and data exports refuse the unimplemented xlsx format up front"""
+        response = self.client.post(
+            reverse('analyticsreport-generate', args=[self.report.pk]), {'format_type': 'xlsx'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse('dataexport-list'), {
+            'export_type': 'analytics_data', 'title': 'Events', 'file_format': 'xlsx', 'requested_by': self.user.pk
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file_format', response.data)
+        self.assertFalse(DataExport.objects.exists())
+
+    def test_unknown_job_type_is_refused(self):
+        """Test only job types the queue can run are accepted"""
+        with self.assertRaises(ValueError):
+            jobs.enqueue('reticulate_splines', {})
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_failed_job_is_retried_then_failed(self):
+        """Test a failing job is requeued with backoff until max_attempts"""
+        job = JobQueueService.enqueue('generate_report', {'report_id': str(uuid.uuid4())})
+        job.max_attempts = 1
+        job.save()
+
+        with self.assertLogs('analytics.services', level='ERROR'):
+            JobQueueService.run(JobQueueService.claim('test')[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 1)
+
+    def test_stale_jobs_are_requeued_until_attempts_run_out(self):
+        """Test a job whose worker died is requeued, or failed once max_attempts is used"""
+        retry = JobQueueService.enqueue('generate_report', {'report_id': str(uuid.uuid4())})
+        exhausted = JobQueueService.enqueue('generate_report', {'report_id': str(uuid.uuid4())})
+        BackgroundJob.objects.filter(pk=exhausted.pk).update(max_attempts=1)
+        JobQueueService.claim('dead-worker', limit=2)
+        stale_at = timezone.now() - timedelta(seconds=AnalyticsConstants.JOB_LOCK_TIMEOUT_SECONDS + 1)
+        BackgroundJob.objects.update(locked_at=stale_at)
+
+        self.assertEqual(JobQueueService.requeue_stale(), 1)
+
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual(retry.status, 'queued')
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertIsNotNone(exhausted.finished_at)
+
+    def test_heartbeat_keeps_long_jobs_claimed(self):
+        """Test a running job that heartbeats is not requeued as stale"""
+        job = JobQueueService.enqueue('generate_report', {'report_id': str(uuid.uuid4())})
+        JobQueueService.claim('worker')
+        stale_at = timezone.now() - timedelta(seconds=AnalyticsConstants.JOB_LOCK_TIMEOUT_SECONDS + 1)
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=stale_at)
+        job.refresh_from_db()
+
+        self.assertEqual(JobQueueService.heartbeat(job), 1)
+        self.assertEqual(JobQueueService.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+
+    def test_due_scheduled_reports_are_queued(self):
+        """Test scheduled reports are enqueued and their next_run advanced"""
+        AnalyticsReport.objects.filter(pk=self.report.pk).update(
+            is_scheduled=True, schedule_frequency='weekly', next_run=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.assertEqual(JobQueueService.schedule_due_reports(), 1)
+        self.assertEqual(JobQueueService.schedule_due_reports(), 0)
+        self.report.refresh_from_db()
+        self.assertGreater(self.report.next_run, timezone.now() + timedelta(days=6))
+
+
+class EventPartitionTest(TestCase):
+    """Test monthly partition bookkeeping for the event table"""
+
+    def test_expired_partitions_respect_retention_window(self):
+        """Test only partitions that end before the retention cutoff expire"""
+        names = [
+            'analytics_analyticsevent_p2023_11',
+            'analytics_analyticsevent_p2023_12',
+            'analytics_analyticsevent_p2024_01',
+            'analytics_analyticsevent_default',
+        ]
+        now = datetime(2024, 3, 10, tzinfo=dt_timezone.utc)
+
+        with patch('analytics.partitions.connection') as mock_connection:
+            mock_connection.cursor.return_value.__enter__.return_value.fetchall.return_value = [
+                (name,) for name in names
+            ]
+            expired = partitions.expired_partitions(retain_months=2, now=now)
+
+        self.assertEqual([name for name, _, _ in expired], names[:2])
+
+    def test_command_requires_postgresql(self):
+        """Test the maintenance command refuses to run on other databases"""
+        if partitions.is_supported():
+            self.skipTest('Running on PostgreSQL')
+        with self.assertRaises(CommandError):
+            call_command('manage_event_partitions', stdout=StringIO())
+
+    def test_partition_absorbs_rows_from_default(self):
+        """Test a new month partition takes over rows already sitting in the default partition"""
+        if not partitions.is_partitioned():
+            self.skipTest('Event table is not partitioned')
+        start = datetime(2031, 5, 1, tzinfo=dt_timezone.utc)
+        inside = AnalyticsEvent.objects.create(event_type='course_view', timestamp=start + timedelta(days=3))
+        AnalyticsEvent.objects.create(event_type='course_view', timestamp=start + timedelta(days=40))
+
+        name = partitions.create_partition(start)
+
+        self.assertEqual(partitions.create_partition(start), name)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT "event_id" FROM "{name}"')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [inside.event_id])
+            cursor.execute(f'SELECT COUNT(*) FROM "{partitions.DEFAULT_PARTITION}"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(AnalyticsEvent.objects.filter(timestamp__gte=start).count(), 2)
+
+    def test_unpartitioned_table_keeps_timestamp_indexes(self):
+        """Test backends without the BRIN index still index timestamp and (event_type, user)"""
+        if partitions.is_supported():
+            self.skipTest('Running on PostgreSQL')
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, AnalyticsEvent._meta.db_table)
+        indexed = [tuple(info['columns']) for info in constraints.values() if info['index']]
+        self.assertIn(('timestamp',), indexed)
+        self.assertIn(('event_type', 'user_id'), indexed)
+
+
+class EventPartitionMigrationTest(TestCase):
+    """Test the PostgreSQL conversion done by migrations 0006 and 0007"""
+
+    def setUp(self):
+        if not partitions.is_supported():
+            self.skipTest('Partitioning requires PostgreSQL')
+
+    def constraints(self, table):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(cursor, table)
+
+    def test_migrated_table_is_partitioned(self):
+        """Test the migrated event table is partitioned with keys that include timestamp"""
+        self.assertTrue(partitions.is_partitioned())
+        constraints = self.constraints(partitions.PARENT_TABLE)
+
+        primary_key = [info['columns'] for info in constraints.values() if info['primary_key']]
+        self.assertEqual(primary_key, [['id', 'timestamp']])
+        self.assertEqual(
+            constraints['analytics_analyticsevent_event_id_timestamp_uniq']['columns'], ['event_id', 'timestamp']
+        )
+        self.assertEqual(constraints['analytics_analyticsevent_timestamp_brin']['type'], 'brin')
+        self.assertTrue(any(info['foreign_key'] == ('auth_user', 'id') for info in constraints.values()))
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [f'"{partitions.DEFAULT_PARTITION}"'])
+            self.assertIsNotNone(cursor.fetchone()[0])
+        self.assertTrue(partitions.list_partitions())
+
+    def test_convert_to_partitioned_copies_rows(self):
+        """Test converting a plain table keeps its rows, spreads them over partitions and resumes ids"""
+        table = 'analytics_scratchevent'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE "{table}" (LIKE "{partitions.PARENT_TABLE}" INCLUDING DEFAULTS)'
+            )
+        old = AnalyticsEvent(event_type='course_view', timestamp=datetime(2024, 1, 15, tzinfo=dt_timezone.utc))
+        new = AnalyticsEvent(event_type='lesson_start', timestamp=timezone.now())
+        with connection.cursor() as cursor:
+            for pk, event in enumerate((old, new), start=41):
+                cursor.execute(
+                    f'INSERT INTO "{table}" ("id", "event_id", "event_type", "session_id", "user_agent", '
+                    f'"related_objects", "event_data", "timestamp", "source", "version", "created_at") '
+                    f"VALUES (%s, %s, %s, '', '', '{{}}', '{{}}', %s, 'web', '', now())",
+                    [pk, event.event_id, event.event_type, event.timestamp]
+                )
+
+        with patch.multiple(partitions, PARENT_TABLE=table, DEFAULT_PARTITION=f'{table}_default',
+                            PARTITION_PATTERN=re.compile(rf'^{table}_p(\d{{4}})_(\d{{2}})$')):
+            with connection.schema_editor() as editor:
+                partitions.convert_to_partitioned(
+                    editor, [f'CREATE INDEX "{table}_timestamp_brin" ON "{table}" USING brin ("timestamp")']
+                )
+            self.assertTrue(partitions.is_partitioned())
+            names = [name for name, _, _ in partitions.list_partitions()]
+            current = partitions.partition_name(partitions.month_start(timezone.now()))
+
+        self.assertEqual(names[0], f'{table}_p2024_01')
+        self.assertIn(current, names)
+        constraints = self.constraints(table)
+        self.assertEqual(constraints[f'{table}_event_id_timestamp_uniq']['columns'], ['event_id', 'timestamp'])
+        self.assertEqual(constraints[f'{table}_timestamp_brin']['type'], 'brin')
+        self.assertEqual(constraints[f'{table}_user_id_fk']['foreign_key'], ('auth_user', 'id'))
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [f'"{table}_unpartitioned"'])
+            self.assertIsNone(cursor.fetchone()[0])
+            cursor.execute(f'SELECT "event_id" FROM "{table}_p2024_01"')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [old.event_id])
+            cursor.execute(
+                f'INSERT INTO "{table}" ("event_id", "event_type", "session_id", "user_agent", '
+                f'"related_objects", "event_data", "timestamp", "source", "version", "created_at") '
+                f"VALUES (%s, 'course_view', '', '', '{{}}', '{{}}', now(), 'web', '', now()) RETURNING \"id\"",
+                [uuid.uuid4()]
+            )
+            self.assertEqual(cursor.fetchone()[0], 43)
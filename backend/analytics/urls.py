@@ -4,10 +4,10 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     AnalyticsEventViewSet, AnalyticsMetricViewSet, AnalyticsReportViewSet,
     AnalyticsDashboardViewSet, LearningRecommendationViewSet,
-    PredictiveInsightViewSet, DataExportViewSet, track_event,
-    dashboard_stats, user_engagement, course_performance, revenue_analytics,
+    PredictiveInsightViewSet, DataExportViewSet, track_event, track_events_batch,
+    ingestion_stats, dashboard_stats, user_engagement, course_performance, revenue_analytics,
     learning_recommendations, calculate_metrics, generate_report,
-    predictive_analytics
+    predictive_analytics, job_status
 )
 
 router = DefaultRouter()
@@ -25,6 +25,8 @@ urlpatterns = [
 
     # Analytics endpoints
     path('track-event/', track_event, name='track-event'),
+    path('track-events/batch/', track_events_batch, name='track-events-batch'),
+    path('ingestion-stats/', ingestion_stats, name='ingestion-stats'),
     path('dashboard-stats/', dashboard_stats, name='dashboard-stats'),
     path('user-engagement/<int:user_id>/', user_engagement, name='user-engagement'),
     path('user-engagement/', user_engagement, name='user-engagement-current'),
@@ -36,6 +38,7 @@ urlpatterns = [
     path('calculate-metrics/', calculate_metrics, name='calculate-metrics'),
     path('generate-report/', generate_report, name='generate-report'),
     path('predictive-analytics/', predictive_analytics, name='predictive-analytics'),
+    path('jobs/<uuid:job_id>/', job_status, name='job-status'),
 
     # Download endpoints
     path('reports/<uuid:report_id>/download/', AnalyticsReportViewSet.as_view({'get': 'download'}), name='download-report'),
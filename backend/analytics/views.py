@@ -2,20 +2,22 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q, Count, Sum, Avg, F, Value
 from django.db.models.functions import TruncDate, TruncHour, TruncDay, TruncWeek, TruncMonth
 from django.utils import timezone
-from django.http import HttpResponse, Http404
+from django.http import Http404, FileResponse
 from django.core.files.storage import default_storage
 from django.contrib.auth.models import User
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import JSONParser
 from datetime import timedelta
 import json
+import os
 
 from .models import (
     AnalyticsEvent, AnalyticsMetric, AnalyticsReport, AnalyticsDashboard,
-    LearningRecommendation, PredictiveInsight, DataExport
+    LearningRecommendation, PredictiveInsight, DataExport, BackgroundJob
 )
 from .serializers import (
     AnalyticsEventSerializer, AnalyticsMetricSerializer, AnalyticsReportSerializer,
@@ -24,8 +26,16 @@ from .serializers import (
     MetricsQuerySerializer, DashboardStatsSerializer, UserEngagementSerializer,
     CoursePerformanceSerializer, RevenueAnalyticsSerializer, LearningPathSerializer,
     PredictiveAnalyticsSerializer, ReportGenerationSerializer,
-    BulkMetricsCalculationSerializer
+    BulkMetricsCalculationSerializer, BackgroundJobSerializer
 )
+from .services import (
+    event_buffer, EventBufferFull, MetricRollupService, DashboardStatsService,
+    CourseAnalyticsService, JobQueueService
+)
+from .parsers import NDJSONParser
+from . import exports
+from core.constants import AnalyticsConstants
+from core.pagination import KeysetPagination
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -41,6 +51,8 @@ class AnalyticsEventViewSet(viewsets.ModelViewSet):
     queryset = AnalyticsEvent.objects.all()
     serializer_class = AnalyticsEventSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_field = 'timestamp'
 
     def get_queryset(self):
         user = self.request.user
@@ -128,12 +140,15 @@ class AnalyticsReportViewSet(viewsets.ModelViewSet):
         if not report.can_access(request.user):
             return Response({'detail': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            file_path = report.generate_report()
-            serializer = self.get_serializer(report)
-            return Response(serializer.data)
-        except Exception as e:
-            return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        format_type = request.data.get('format_type', 'csv')
+        if format_type not in dict(AnalyticsReport.EXPORT_FORMATS):
+            return Response({'detail': f'Unsupported format: {format_type}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = JobQueueService.enqueue('generate_report', {
+            'report_id': str(report.report_id),
+            'format_type': format_type,
+        }, user=request.user)
+        return Response(BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
@@ -146,13 +161,23 @@ class AnalyticsReportViewSet(viewsets.ModelViewSet):
         if not report.file_path:
             raise Http404("Report file not available")
 
-        try:
-            file_obj = default_storage.open(report.file_path)
-            response = HttpResponse(file_obj, content_type='application/octet-stream')
-            response['Content-Disposition'] = f'attachment; filename="{report.title}.csv"'
-            return response
-        except Exception:
-            raise Http404("File not found")
+        return _file_download(report.file_path, report.title)
+
+
+def _file_download(file_path, title):
+    """Stream a stored file back to the client in chunks"""
+    try:
+        file_obj = default_storage.open(file_path)
+    except Exception:
+        raise Http404("File not found")
+
+    extension = os.path.splitext(file_path)[1]
+    return FileResponse(
+        file_obj,
+        as_attachment=True,
+        filename=f"{title}{extension}",
+        content_type=exports.content_type_for(file_path)
+    )
 
 
 class AnalyticsDashboardViewSet(viewsets.ModelViewSet):
@@ -294,8 +319,14 @@ class DataExportViewSet(viewsets.ModelViewSet):
 
         export = self.get_object()
         export.approve(request.user)
-        serializer = self.get_serializer(export)
-        return Response(serializer.data)
+
+        job = JobQueueService.enqueue('generate_export', {
+            'export_id': str(export.export_id),
+        }, user=export.requested_by)
+        return Response({
+            'export': self.get_serializer(export).data,
+            'job': BackgroundJobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
@@ -309,13 +340,19 @@ class DataExportViewSet(viewsets.ModelViewSet):
         if export.status != 'completed' or not export.file_path:
             raise Http404("Export not available")
 
-        try:
-            file_obj = default_storage.open(export.file_path)
-            response = HttpResponse(file_obj, content_type='application/octet-stream')
-            response['Content-Disposition'] = f'attachment; filename="{export.title}.{export.file_format}"'
-            return response
-        except Exception:
-            raise Http404("File not found")
+        return _file_download(export.file_path, export.title)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """Poll the status and progress of a background job"""
+    job = get_object_or_404(BackgroundJob, job_id=job_id)
+
+    if not job.can_access(request.user):
+        raise Http404("Job not found")
+
+    return Response(BackgroundJobSerializer(job).data)
 
 
 @api_view(['POST'])
@@ -336,7 +373,15 @@ def track_event(request):
         # Add user agent
         event_data['user_agent'] = request.META.get('HTTP_USER_AGENT', '')
 
-        event = AnalyticsEvent.track_event(**event_data)
+        # Queue for a batched insert instead of one INSERT per event
+        try:
+            event = event_buffer.enqueue(**event_data)
+        except EventBufferFull:
+            response = Response({'detail': 'Event ingestion is busy, retry later', 'tracked': False},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(AnalyticsConstants.EVENT_BUFFER_RETRY_AFTER_SECONDS)
+            return response
+
         return Response({
             'event_id': event.event_id,
             'tracked': True
@@ -345,68 +390,86 @@ def track_event(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def dashboard_stats(request):
-    """Get dashboard statistics"""
-    user = request.user
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Allow from internal services
+@parser_classes([JSONParser, NDJSONParser])
+def track_events_batch(request):
+    """
+    Track a batch of analytics events (JSON array or NDJSON body).
+    Valid events go through the ingestion buffer. Answers 200 when every
+    event is queued, 207 when only some are, 400 when none are valid and
+    503 with Retry-After when the buffer is full.
+    """
+    serializer = TrackEventSerializer(data=request.data, many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Request context shared by every event in the batch
+    context = {
+        'user': request.user if request.user.is_authenticated else None,
+        'ip_address': request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+    }
 
-    # Basic stats
-    total_users = User.objects.count()
-    active_users_today = AnalyticsEvent.objects.filter(
-        timestamp__date=timezone.now().date(),
-        event_type__in=['user_login', 'course_view', 'lesson_start']
-    ).values('user').distinct().count()
+    accepted = [
+        {**event_data, **context}
+        for event_data in serializer.validated_data if event_data is not None
+    ]
 
-    # Course stats
-    from courses.models import Course, Enrollment
-    total_courses = Course.objects.count()
-    total_enrollments = Enrollment.objects.count()
+    # Queue the valid events as one unit so a busy buffer rejects the batch
+    # with Retry-After instead of accepting part of it
+    events, busy = [], False
+    if accepted:
+        try:
+            events = event_buffer.enqueue_many(accepted)
+        except EventBufferFull:
+            busy = True
+    events = iter(events)
+
+    results = []
+    for index, errors in enumerate(serializer.item_errors):
+        if errors is not None:
+            results.append({'index': index, 'status': 'rejected', 'errors': errors})
+        elif busy:
+            results.append({'index': index, 'status': 'retry'})
+        else:
+            results.append({'index': index, 'status': 'accepted', 'event_id': next(events).event_id})
+
+    rejected = len(results) - len(accepted)
+    if busy:
+        response_status = status.HTTP_503_SERVICE_UNAVAILABLE
+    elif not accepted:
+        response_status = status.HTTP_400_BAD_REQUEST
+    elif rejected:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_200_OK
+
+    response = Response({
+        'accepted': 0 if busy else len(accepted),
+        'rejected': rejected,
+        'results': results
+    }, status=response_status)
+    if busy:
+        response['Retry-After'] = str(AnalyticsConstants.EVENT_BUFFER_RETRY_AFTER_SECONDS)
+    return response
 
-    # Completion rate
-    completed_enrollments = Enrollment.objects.filter(status='completed').count()
-    course_completion_rate = (completed_enrollments / total_enrollments * 100) if total_enrollments > 0 else 0
 
-    # Revenue stats
-    from payments.models import PaymentTransaction
-    total_revenue = PaymentTransaction.objects.filter(
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ingestion_stats(request):
+    """Get event ingestion buffer metrics (queue depth, flush latency)"""
+    if not request.user.profile.is_admin:
+        return Response({'detail': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
 
-    # Average session duration
-    avg_session = AnalyticsEvent.objects.filter(
-        event_type='user_login',
-        duration__isnull=False
-    ).aggregate(avg=Avg('duration'))['avg']
-    average_session_duration = avg_session or timedelta(seconds=0)
-
-    # Top courses
-    top_courses = Enrollment.objects.values('course__title').annotate(
-        enrollments=Count('id')
-    ).order_by('-enrollments')[:5]
-
-    # Recent activity
-    recent_activity = AnalyticsEvent.objects.select_related('user').order_by('-timestamp')[:10]
-    recent_activity_data = []
-    for event in recent_activity:
-        recent_activity_data.append({
-            'event_type': event.get_event_type_display(),
-            'user': event.user.get_full_name() if event.user else 'Anonymous',
-            'timestamp': event.timestamp,
-            'details': event.event_data.get('description', '')
-        })
+    return Response(event_buffer.stats())
 
-    stats_data = {
-        'total_users': total_users,
-        'active_users_today': active_users_today,
-        'total_courses': total_courses,
-        'total_enrollments': total_enrollments,
-        'course_completion_rate': round(course_completion_rate, 2),
-        'total_revenue': float(total_revenue),
-        'average_session_duration': average_session_duration,
-        'top_courses': list(top_courses),
-        'recent_activity': recent_activity_data
-    }
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_stats(request):
+    """Get dashboard statistics"""
+    stats_data = DashboardStatsService.get_stats()
 
     serializer = DashboardStatsSerializer(stats_data)
     return Response(serializer.data)
@@ -480,8 +543,8 @@ def user_engagement(request, user_id=None):
 @permission_classes([IsAuthenticated])
 def course_performance(request, course_id):
     """Get course performance analytics"""
-    from courses.models import Course, Enrollment, Lesson
-    from progress.models import QuizAttempt
+    from courses.models import Course, Enrollment
+    from progress.models import QuizSubmission
 
     course = get_object_or_404(Course, id=course_id)
 
@@ -489,49 +552,43 @@ def course_performance(request, course_id):
     if course.instructor != request.user and not request.user.profile.is_admin:
         return Response({'detail': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
 
-    # Basic metrics
-    total_enrollments = Enrollment.objects.filter(course=course).count()
-    total_completions = Enrollment.objects.filter(course=course, status='completed').count()
-    completion_rate = (total_completions / total_enrollments * 100) if total_enrollments > 0 else 0
-
-    # Average completion time
-    completed_enrollments = Enrollment.objects.filter(
-        course=course,
-        status='completed',
-        completed_at__isnull=False
+    # Basic metrics and average completion time in one pass
+    enrollment_stats = Enrollment.objects.filter(course=course).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed')),
+        avg_completion_time=Avg(
+            F('completed_at') - F('enrolled_at'),
+            filter=Q(status='completed', completed_at__isnull=False)
+        )
     )
-    avg_completion_time = timedelta(seconds=0)
-    if completed_enrollments.exists():
-        time_agg = completed_enrollments.aggregate(avg=Avg(F('completed_at') - F('enrolled_at')))
-        if time_agg['avg']:
-            avg_completion_time = time_agg['avg']
+    total_enrollments = enrollment_stats['total']
+    total_completions = enrollment_stats['completed']
+    completion_rate = (total_completions / total_enrollments * 100) if total_enrollments > 0 else 0
+    avg_completion_time = enrollment_stats['avg_completion_time'] or timedelta(seconds=0)
 
     # Average rating (placeholder)
     average_rating = 4.5  # Would come from a rating system
 
-    # Drop-off points (simplified)
-    total_lessons = Lesson.objects.filter(course=course).count()
-    drop_off_points = []
-
-    for i in range(1, min(total_lessons + 1, 10)):
-        completed_up_to = Enrollment.objects.filter(
-            course=course,
-            progress_percentage__gte=(i / total_lessons * 100)
-        ).count()
-        drop_off_rate = ((total_enrollments - completed_up_to) / total_enrollments * 100) if total_enrollments > 0 else 0
-        drop_off_points.append({
-            'lesson_number': i,
-            'drop_off_rate': round(drop_off_rate, 2)
-        })
+    # Drop-off points for every lesson
+    drop_off_points = CourseAnalyticsService.drop_off_funnel(course, total_enrollments)
 
     # Quiz performance
     quiz_performance = QuizSubmission.objects.filter(
-        lesson__course=course
+        lesson__module__course=course
     ).values('lesson__title').annotate(
         attempts=Count('id'),
         avg_score=Avg('percentage'),
-        pass_rate=Sum('passed') / Count('id') * 100
+        passed_count=Count('id', filter=Q(passed=True))
     ).order_by('-attempts')[:5]
+    quiz_performance = [
+        {
+            'lesson__title': row['lesson__title'],
+            'attempts': row['attempts'],
+            'avg_score': row['avg_score'],
+            'pass_rate': round(row['passed_count'] / row['attempts'] * 100, 2) if row['attempts'] else 0
+        }
+        for row in quiz_performance
+    ]
 
     performance_data = {
         'course_id': course.id,
@@ -542,7 +599,7 @@ def course_performance(request, course_id):
         'average_completion_time': avg_completion_time,
         'average_rating': average_rating,
         'drop_off_points': drop_off_points,
-        'quiz_performance': list(quiz_performance)
+        'quiz_performance': quiz_performance
     }
 
     serializer = CoursePerformanceSerializer(performance_data)
@@ -557,6 +614,7 @@ def revenue_analytics(request):
         return Response({'detail': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
 
     from payments.models import PaymentTransaction, SubscriptionPlan
+    from payments.services import RevenueService
 
     # Total revenue
     total_revenue_agg = PaymentTransaction.objects.filter(
@@ -564,23 +622,20 @@ def revenue_analytics(request):
     ).aggregate(total=Sum('amount'))
     total_revenue = total_revenue_agg['total'] or 0
 
-    # Monthly revenue (last 12 months)
-    monthly_revenue = []
-    for i in range(11, -1, -1):
-        month_start = timezone.now().replace(day=1) - timedelta(days=i*30)
-        month_end = month_start.replace(day=28) + timedelta(days=4)  # End of month
-        month_end = month_end - timedelta(days=month_end.day)
-
-        revenue = PaymentTransaction.objects.filter(
-            status='completed',
-            created_at__gte=month_start,
-            created_at__lte=month_end
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        monthly_revenue.append({
-            'month': month_start.strftime('%Y-%m'),
-            'revenue': float(revenue)
-        })
+    # Revenue series (last 12 months by default), one grouped query
+    period = request.query_params.get('period', 'month')
+    if period not in ('day', 'week', 'month'):
+        return Response({'detail': 'period must be one of day, week, month'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        periods = min(max(int(request.query_params.get('periods', 12)), 1), 366)
+    except ValueError:
+        return Response({'detail': 'periods must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    monthly_revenue = [
+        {'month': point['period'], 'revenue': point['revenue']}
+        for point in RevenueService.revenue_series(period, periods)
+    ]
 
     # Revenue by course
     revenue_by_course = PaymentTransaction.objects.filter(
@@ -649,9 +704,7 @@ def learning_recommendations(request):
     from courses.models import Course
     recommended_course_ids = Course.objects.exclude(
         id__in=current_courses
-    ).annotate(
-        enrollment_count=Count('enrollments')
-    ).order_by('-enrollment_count').values_list('id', flat=True)[:3]
+    ).order_by('-active_enrollment_count').values_list('id', flat=True)[:3]
 
     recommended_courses = Course.objects.filter(id__in=recommended_course_ids)
 
@@ -690,7 +743,10 @@ def learning_recommendations(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def calculate_metrics(request):
-    """Calculate analytics metrics"""
+    """Calculate analytics metrics for one aggregation period (admin only)"""
+    if not request.user.profile.is_admin:
+        return Response({'detail': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+
     serializer = BulkMetricsCalculationSerializer(data=request.data)
     if serializer.is_valid():
         metric_types = serializer.validated_data['metric_types']
@@ -706,13 +762,18 @@ def calculate_metrics(request):
             value = calculate_metric_value(metric_type, start_date, end_date, filters)
 
             if value is not None:
-                metric = AnalyticsMetric.objects.create(
+                # Ad-hoc results get their own rows; rows with empty filters belong to the rollups
+                metric, _ = AnalyticsMetric.objects.update_or_create(
                     metric_type=metric_type,
                     aggregation_period=aggregation_period,
                     period_start=start_date,
-                    period_end=end_date,
-                    value=value,
-                    filters=filters
+                    filters={**filters, MetricRollupService.AD_HOC_FILTER: True},
+                    defaults={
+                        'period_end': end_date,
+                        'value': value,
+                        'value_type': MetricRollupService.METRICS[metric_type][1],
+                        'calculated_at': timezone.now(),
+                    }
                 )
                 calculated_metrics.append(metric)
 
@@ -726,6 +787,10 @@ def calculate_metrics(request):
 
 def calculate_metric_value(metric_type, start_date, end_date, filters):
     """Calculate metric value based on type"""
+    if not filters:
+        # Unfiltered metrics are read from the rollups kept current by the rollup_metrics command
+        return MetricRollupService.value_for_range(metric_type, start_date, end_date)
+
     if metric_type == 'active_users':
         return AnalyticsEvent.objects.filter(
             timestamp__gte=start_date,
@@ -767,22 +832,25 @@ def generate_report(request):
             title=report_data['title'],
             description=report_data.get('description', ''),
             report_type=report_data['report_type'],
-            config=report_data['config'],
+            config={**report_data['config'], 'format_type': report_data['format_type']},
             is_scheduled=report_data['is_scheduled'],
-            schedule_frequency=report_data.get('schedule_frequency'),
+            schedule_frequency=report_data.get('schedule_frequency') or '',
+            next_run=timezone.now() if report_data['is_scheduled'] else None,
             created_by=request.user
         )
 
-        # Generate immediately if not scheduled
+        # Scheduled reports are picked up by the workers at next_run
+        job = None
         if not report_data['is_scheduled']:
-            try:
-                report.generate_report(report_data['format_type'])
-            except Exception as e:
-                return Response({'detail': f'Report generation failed: {str(e)}'},
-                              status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            job = JobQueueService.enqueue('generate_report', {
+                'report_id': str(report.report_id),
+                'format_type': report_data['format_type'],
+            }, user=request.user)
 
-        serializer = AnalyticsReportSerializer(report)
-        return Response(serializer.data)
+        return Response({
+            'report': AnalyticsReportSerializer(report).data,
+            'job': BackgroundJobSerializer(job).data if job else None
+        }, status=status.HTTP_202_ACCEPTED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
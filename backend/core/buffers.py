@@ -0,0 +1,108 @@
+"""
+Write-behind buffers shared by the high-volume tracking endpoints.
+
+Items are held in process memory and written in batches by a background
+timer instead of one write per request. Subclasses decide how items are
+stored and written; the timer, the flush loop and the backpressure rules
+live here.
+"""
+import atexit
+import threading
+import time
+
+from django.db import connection
+
+
+class BufferFull(Exception):
+    """Raised when a buffer cannot accept more items."""
+
+
+class WriteBehindBuffer:
+    """
+    Base class for in-process write-behind buffers.
+
+    Subclasses implement `__len__` and the storage hooks:
+
+    - `_offer(item)` queues an item, returning False when there is no room;
+    - `_take()` removes and returns the next batch (falsy when empty);
+    - `_write(batch)` writes a batch and returns the number of items written;
+    - `_write_failed(batch)` handles a batch whose write raised.
+
+    When the buffer is full the caller first flushes synchronously; if that
+    does not free space `full_error` is raised so the view can ask the
+    client to back off.
+    """
+
+    full_error = BufferFull
+    thread_name = 'write-behind-flush'
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def put(self, item):
+        """Queue `item`, flushing in the caller's thread if the buffer is full."""
+        if not self._offer(item):
+            # Backpressure: make room by flushing in the caller's thread
+            self.flush()
+            if not self._offer(item):
+                raise self.full_error(f"{type(self).__name__} is full")
+
+        if self._should_flush():
+            self.flush()
+        self._ensure_timer()
+
+    def flush(self):
+        """
+        Write everything queued, one batch at a time.
+        Returns the number of items written; stops at the first failed batch.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                try:
+                    written += self._write(batch)
+                except Exception:
+                    self._write_failed(batch)
+                    break
+        return written
+
+    def _should_flush(self):
+        """Whether `put` should flush right away instead of waiting for the timer."""
+        return False
+
+    def _ensure_timer(self):
+        """Start the background thread that enforces the flush interval."""
+        if self._timer is not None and self._timer.is_alive():
+            return
+        with self._lock:
+            if self._timer is not None and self._timer.is_alive():
+                return
+            self._timer = threading.Thread(
+                target=self._run_timer, name=self.thread_name, daemon=True
+            )
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if not len(self):
+                continue
+            try:
+                self.flush()
+            finally:
+                # The timer thread owns its own connection; don't leak it
+                connection.close()
+
+
+def flush_at_exit(buffer):
+    """Flush `buffer` on a clean worker shutdown so queued items are not lost."""
+    atexit.register(buffer.flush)
+    return buffer
@@ -0,0 +1,14 @@
+"""
+Cache helpers shared by the per-app cached snapshots.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+
+def invalidate(*keys):
+    """
+    Drop cache keys now and again once the current transaction commits, so a
+    reader that rebuilt the entry from pre-commit rows cannot leave it stale.
+    """
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,36 @@
+"""
+HTTP conditional GET helpers (ETag / Last-Modified).
+
+Views compute validators from data they already hold (row timestamps or a
+content version) and only serialize the response body when the client's
+copy is out of date; otherwise they answer 304 Not Modified.
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Strong ETag from the values a response depends on"""
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest[:32])
+
+
+def conditional_response(request, build_response, etag, last_modified=None):
+    """
+    Return 304 when the request's If-None-Match / If-Modified-Since still
+    match, without calling build_response(); otherwise build the response
+    and attach the validators.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    response = not_modified if not_modified is not None else build_response()
+
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Responses depend on the user's access; browsers may keep them but must revalidate
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -32,6 +32,8 @@ class UploadConstants:
     """File upload limits"""
     MAX_THUMBNAIL_SIZE_MB = 5
     ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/webp']
+    IMAGE_VARIANT_WIDTHS = (320, 640, 1280)  # Responsive widths generated for each upload
+    IMAGE_VARIANT_QUALITY = 80  # WebP/JPEG encoder quality
 
 
 # =============================================================================
@@ -60,3 +62,72 @@ class PaginationConstants:
 class PaymentConstants:
     """Payment-related constants"""
     DEFAULT_CURRENCY = 'USD'
+
+
+# =============================================================================
+# COURSE CONSTANTS
+# =============================================================================
+
+class CourseConstants:
+    """Course content settings"""
+    OUTLINE_CACHE_TTL_SECONDS = 3600  # Invalidated on any Unit/Module/Lesson save
+    SEQUENCE_CACHE_TTL_SECONDS = 3600  # Keyed by Course.content_version, so never stale
+    SEARCH_CONFIG = 'english'  # PostgreSQL text search configuration for the catalog
+    SLUG_BASE_MAX_LENGTH = 190  # Leaves room for a "-N" suffix in the 200-char slug column
+    SLUG_ALLOCATION_CHUNK_SIZE = 500  # Titles per slug lookup during bulk import
+    SLUG_ALLOCATION_RETRIES = 3  # Attempts when a concurrent writer takes the same slug
+    SLUG_SUFFIX_MAX_DIGITS = 18  # Longer "-N" tails are part of the title, and would overflow a bigint
+    ACCESS_CACHE_TTL_SECONDS = 300  # Cached enrolled course ids per user; 0 disables (invalidated on enrollment changes)
+
+
+# =============================================================================
+# PROGRESS CONSTANTS
+# =============================================================================
+
+class ProgressConstants:
+    """Lesson progress tracking settings"""
+    # Buffered player heartbeats
+    HEARTBEAT_MAX_SAMPLES = 100  # Samples accepted per request
+    HEARTBEAT_MAX_SECONDS = 300  # Cap on the time one sample can report
+    HEARTBEAT_BUFFER_MAX_KEYS = 5000  # Pending (student, lesson) pairs before a synchronous flush
+    HEARTBEAT_FLUSH_BATCH_SIZE = 100  # Rows per UPDATE; each adds CASE parameters
+    HEARTBEAT_FLUSH_INTERVAL_SECONDS = 5
+    HEARTBEAT_RETRY_AFTER_SECONDS = 5
+
+    # Quiz auto-grading
+    QUIZ_PASSING_PERCENTAGE = 70
+    QUIZ_ANSWER_KEY_CACHE_TTL_SECONDS = 3600  # Invalidated on any QuizQuestion/QuizAnswer change
+    QUIZ_REGRADE_BATCH_SIZE = 500  # Submissions per bulk_update when regrading
+
+
+# =============================================================================
+# ANALYTICS CONSTANTS
+# =============================================================================
+
+class AnalyticsConstants:
+    """Analytics ingestion and aggregation settings"""
+    # Buffered event ingestion
+    EVENT_BUFFER_MAX_SIZE = 10000
+    EVENT_FLUSH_BATCH_SIZE = 500
+    EVENT_FLUSH_INTERVAL_SECONDS = 5
+    EVENT_BUFFER_RETRY_AFTER_SECONDS = 5
+    EVENT_FLUSH_MAX_RETRIES = 5  # Consecutive failed flushes before a batch is dropped
+    MAX_EVENTS_PER_BATCH = 1000
+
+    # Metric rollups
+    ROLLUP_LATE_WINDOW_HOURS = 3  # Closed hours re-rolled on every run to pick up late rows
+
+    # Dashboard stats snapshot
+    DASHBOARD_STATS_TTL_SECONDS = 60  # Fresh window before a background refresh
+    DASHBOARD_STATS_MAX_STALE_SECONDS = 600  # Hard expiry; recomputed inline after this
+    DASHBOARD_STATS_REFRESH_LOCK_SECONDS = 120
+
+    # Background job queue
+    JOB_POLL_INTERVAL_SECONDS = 2
+    JOB_LOCK_TIMEOUT_SECONDS = 1800  # Running jobs without a heartbeat for this long are requeued
+    JOB_HEARTBEAT_INTERVAL_SECONDS = 60
+    JOB_RETRY_BACKOFF_SECONDS = 60  # Multiplied by the attempt number
+
+    # Event table partitioning (PostgreSQL)
+    EVENT_PARTITION_MONTHS_AHEAD = 3
+    EVENT_RETENTION_MONTHS = 13
@@ -0,0 +1,131 @@
+"""
+Responsive variants for uploaded images (course thumbnails, profile images).
+
+Uploads are stored as-is; resizing runs off the request path as a
+`build_image_variants` background job queued through core.jobs,
+so it is retried on failure and survives restarts. Every variant is
+re-encoded, which drops EXIF and other metadata, and stored under a
+content-hashed name so it can be served with an immutable cache header.
+"""
+
+import hashlib
+import io
+
+from django.apps import apps as django_apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from core import jobs
+from core.constants import UploadConstants
+
+# Variant format -> Pillow encoder
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+
+def variant_widths(width):
+    """Configured widths below the original, plus the original capped at the largest"""
+    widths = UploadConstants.IMAGE_VARIANT_WIDTHS
+    return sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+
+def build_variants(file, directory):
+    """
+    Resize an image to every variant width and format and store the results.
+    Returns [{'name', 'width', 'format'}] sorted by format then width.
+    """
+    with Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+
+    variants = []
+    for fmt, encoder in FORMATS.items():
+        for width in variant_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            if encoder == 'JPEG' and resized.mode == 'RGBA':
+                resized = _flatten(resized)
+
+            buffer = io.BytesIO()
+            resized.save(buffer, format=encoder, quality=UploadConstants.IMAGE_VARIANT_QUALITY, optimize=True)
+            data = buffer.getvalue()
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            name = f'{directory}/{digest}-{width}w.{fmt}'
+            # Same bytes, same name: identical uploads share their variants
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(data))
+            variants.append({'name': name, 'width': width, 'format': fmt})
+    return variants
+
+
+def srcset(variants, build_url=None):
+    """{format: 'url 320w, url 640w'} for a stored variant list"""
+    build_url = build_url or (lambda url: url)
+    sets = {}
+    for variant in sorted(variants or [], key=lambda v: v['width']):
+        url = build_url(default_storage.url(variant['name']))
+        sets.setdefault(variant['format'], []).append(f"{url} {variant['width']}w")
+    return {fmt: ', '.join(entries) for fmt, entries in sets.items()}
+
+
+def refresh_variants(model, pk, field_name, variants_field, name):
+    """
+    Build the variants of one stored image and record them on its row.
+    Returns None when the row is gone or its image was replaced meanwhile.
+    """
+    current = model.objects.filter(pk=pk, **{field_name: name})
+    if not current.exists():
+        return None
+    upload_to = model._meta.get_field(field_name).upload_to
+    directory = f"{upload_to.rstrip('/') if isinstance(upload_to, str) else 'images'}/variants"
+
+    with default_storage.open(name) as file:
+        variants = build_variants(file, directory)
+    current.update(**{variants_field: variants})
+    return variants
+
+
+def process_in_background(instance, field_name, variants_field):
+    """
+    Clear the instance's variants now and queue a job that rebuilds them
+    from instance.<field_name>. The job row commits with the upload.
+    """
+    model, pk = type(instance), instance.pk
+    name = getattr(instance, field_name).name
+    model.objects.filter(pk=pk).update(**{variants_field: []})
+    setattr(instance, variants_field, [])
+    if not name:
+        return None
+
+    return jobs.enqueue('build_image_variants', {
+        'model': model._meta.label,
+        'pk': pk,
+        'field_name': field_name,
+        'variants_field': variants_field,
+        'name': name,
+    })
+
+
+def run_variants_job(job):
+    """Job handler for `build_image_variants`"""
+    payload = job.payload
+    variants = refresh_variants(
+        django_apps.get_model(payload['model']), payload['pk'],
+        payload['field_name'], payload['variants_field'], payload['name']
+    )
+    # None means the image was replaced or removed before the job ran
+    return {'variant_count': len(variants) if variants is not None else 0}
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def _flatten(image):
+    """Composite an RGBA image onto white for formats without transparency"""
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
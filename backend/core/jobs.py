@@ -0,0 +1,27 @@
+"""
+Entry point for queueing background jobs from any app.
+
+Jobs are rows of settings.BACKGROUND_JOB_MODEL, claimed and run by the
+`run_workers` command (see analytics.services.JobQueueService, which maps
+each job type to its handler). Callers only need this module.
+"""
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.utils import timezone
+
+
+def job_model():
+    return django_apps.get_model(settings.BACKGROUND_JOB_MODEL)
+
+
+def enqueue(job_type, payload, user=None, run_after=None):
+    """Queue a job and return it"""
+    model = job_model()
+    if job_type not in dict(model._meta.get_field('job_type').choices):
+        raise ValueError(f"Unknown job type: {job_type}")
+    return model.objects.create(
+        job_type=job_type,
+        payload=payload,
+        created_by=user,
+        run_after=run_after or timezone.now()
+    )
@@ -0,0 +1,20 @@
+"""
+Model mixins shared across apps.
+"""
+
+
+class CounterFieldsMixin:
+    """
+    Keeps denormalized fields (counters, search documents, image variants)
+    out of ordinary saves. They only change through queryset updates, so
+    saving a stale instance must not overwrite them.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
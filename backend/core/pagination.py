@@ -3,7 +3,19 @@ Centralized pagination configuration for DRF viewsets.
 Reduces code duplication across all apps.
 """
 
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.constants import PaginationConstants
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -34,3 +46,150 @@ class SmallResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 50
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a (timestamp, id) key, newest first.
+
+    Pages are fetched with a WHERE on the key instead of OFFSET, so deep
+    pages cost the same as the first, and no COUNT(*) runs unless the
+    client asks for one with ?count=exact or ?count=estimate. Viewsets opt
+    in by setting pagination_class and naming their key in `keyset_field`.
+    """
+    page_size = PaginationConstants.DEFAULT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = PaginationConstants.MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    keyset_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.field = getattr(view, 'keyset_field', self.keyset_field)
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.count = self.get_count(queryset, request)
+
+        reverse = cursor is not None and cursor['reverse']
+        if cursor is not None:
+            position = cursor['position']
+            after = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{after}': position})
+                | Q(**{self.field: position, f'pk__{after}': cursor['pk']})
+            )
+        if reverse:
+            queryset = queryset.order_by(self.field, 'pk')
+        else:
+            queryset = queryset.order_by(f'-{self.field}', '-pk')
+
+        # One extra row tells us whether another page exists
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+        self.next_item = results[-1] if results and has_next else None
+        self.previous_item = results[0] if results and has_previous else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return {
+                'position': datetime.fromisoformat(data['p']),
+                'pk': int(data['pk']),
+                'reverse': bool(data.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverse):
+        data = {'p': getattr(item, self.field).isoformat(), 'pk': item.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_item, reverse=False) if self.next_item else None
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_item, reverse=True) if self.previous_item else None
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Only present when ?count= is given'},
+                'results': schema,
+            },
+        }
+
+
+def estimate_count(queryset):
+    """
+    Approximate row count without scanning (PostgreSQL only).
+
+    Unfiltered querysets read pg_class.reltuples for the table (summed over
+    partitions); filtered ones use the planner's row estimate. Falls back to
+    an exact COUNT elsewhere or when the table has never been analyzed.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT SUM(reltuples) FROM pg_class WHERE reltuples >= 0 AND ("
+                "oid = %s::regclass OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass))",
+                [queryset.model._meta.db_table] * 2
+            )
+            estimate = cursor.fetchone()[0]
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]['Plan']['Plan Rows']
+
+    if not estimate:
+        return queryset.count()
+    return int(estimate)
@@ -191,5 +191,16 @@ else:
     EMAIL_USE_TLS          = os.getenv('EMAIL_USE_TLS', 'True').lower() in ('true','1','yes')
     DEFAULT_FROM_EMAIL     = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@example.com')
 
+# Cache (shared backend such as Redis/Memcached recommended in production)
+CACHES = {
+    'default': {
+        'BACKEND':  os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'do-it-cache'),
+    }
+}
+
+# Table behind the background job queue (core.jobs)
+BACKGROUND_JOB_MODEL = 'analytics.BackgroundJob'
+
 # Frontend URL for email links
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
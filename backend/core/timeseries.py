@@ -0,0 +1,81 @@
+"""
+Time-bucketing helpers for analytics queries.
+Builds N-period series with exact calendar boundaries in a single GROUP BY.
+"""
+
+import calendar
+from datetime import timedelta
+
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+
+PERIOD_TRUNC = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+PERIOD_LABEL_FORMATS = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-%m-%d',
+    'month': '%Y-%m',
+}
+
+
+def period_floor(value, period):
+    """Start of the calendar day, ISO week (Monday) or month containing value"""
+    value = timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        return value - timedelta(days=value.weekday())
+    if period == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def shift_period(start, period, count=1):
+    """Move a period start forward (or backward for negative count) by whole periods"""
+    if period == 'day':
+        return start + timedelta(days=count)
+    if period == 'week':
+        return start + timedelta(weeks=count)
+    return add_months(start, count)
+
+
+def add_months(value, months):
+    """Same day and time `months` later, clamped to the end of shorter months"""
+    month_index = value.year * 12 + value.month - 1 + months
+    year, month = month_index // 12, month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def period_starts(period, periods, now=None):
+    """Starts of the last `periods` calendar periods, oldest first, ending with the current one"""
+    if period not in PERIOD_TRUNC:
+        raise ValueError(f"Unsupported period '{period}'")
+    current = period_floor(now or timezone.now(), period)
+    return [shift_period(current, period, -offset) for offset in range(periods - 1, -1, -1)]
+
+
+def bucketed_series(queryset, date_field, period='month', periods=12, aggregate=None, now=None):
+    """
+    Aggregate queryset into the last `periods` calendar periods with one query.
+
+    Returns a list of (period_start, value) tuples, oldest first, with empty
+    periods filled with None. `aggregate` defaults to Count('id').
+    """
+    starts = period_starts(period, periods, now)
+    trunc = PERIOD_TRUNC[period]
+    rows = queryset.filter(**{f'{date_field}__gte': starts[0]}).annotate(
+        bucket=trunc(date_field)
+    ).values('bucket').annotate(value=aggregate or Count('id')).order_by('bucket')
+
+    values = {period_floor(row['bucket'], period): row['value'] for row in rows}
+    return [(start, values.get(start)) for start in starts]
+
+
+def series_label(start, period):
+    """Display label for a period start"""
+    return start.strftime(PERIOD_LABEL_FORMATS[period])
@@ -0,0 +1,95 @@
+"""
+Per-request course access context.
+
+The requesting user's role and the ids of the courses they are enrolled in
+are loaded once per request (and cached across requests until their
+enrollments change), so viewsets answer "can this user see / manage this
+course or lesson?" from memory instead of querying Enrollment per check.
+"""
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from core import caching
+from core.constants import CourseConstants
+
+ENROLLED_STATUSES = ('active', 'completed')
+
+
+class CourseAccess:
+    """Access checks for one user, backed by their enrolled course ids"""
+
+    CACHE_KEY = 'courses:access:{user_id}'
+
+    def __init__(self, user):
+        self.user = user
+        profile = user.profile
+        self.is_admin = profile.is_admin
+        self.is_instructor = profile.is_instructor
+        self.is_staff = self.is_admin or self.is_instructor
+
+    @classmethod
+    def for_request(cls, request):
+        """The context for request.user, built once per request"""
+        # DRF wraps the Django request; keep the context on the inner one so
+        # middleware and nested views share it
+        http_request = getattr(request, '_request', request)
+        access = getattr(http_request, '_course_access', None)
+        if access is None or access.user.pk != request.user.pk:
+            access = cls(request.user)
+            http_request._course_access = access
+        return access
+
+    @cached_property
+    def enrolled_course_ids(self):
+        """Ids of courses the user is actively enrolled in (or has completed)"""
+        key = self.CACHE_KEY.format(user_id=self.user.pk)
+        ttl = CourseConstants.ACCESS_CACHE_TTL_SECONDS
+        course_ids = cache.get(key) if ttl else None
+        if course_ids is None:
+            from courses.models import Enrollment
+            course_ids = frozenset(
+                Enrollment.objects.filter(
+                    student=self.user, status__in=ENROLLED_STATUSES
+                ).values_list('course_id', flat=True)
+            )
+            if ttl:
+                cache.set(key, course_ids, timeout=ttl)
+        return course_ids
+
+    @staticmethod
+    def invalidate(user_id):
+        """Drop a user's cached enrollments"""
+        caching.invalidate(CourseAccess.CACHE_KEY.format(user_id=user_id))
+
+    def is_enrolled(self, course_id):
+        return course_id in self.enrolled_course_ids
+
+    def can_manage_course(self, course):
+        return self.is_admin or (self.is_instructor and course.instructor_id == self.user.pk)
+
+    def can_access_course(self, course):
+        return course.status == 'published' or self.can_manage_course(course)
+
+    def can_access_lesson(self, lesson):
+        """Load lessons with select_related('module__course') to keep this query-free"""
+        course = lesson.module.course
+        if not self.can_access_course(course):
+            return False
+        return self.is_staff or self.is_enrolled(course.id)
+
+
+class CourseAccessMixin:
+    """Viewset helpers answering access checks from the request's CourseAccess"""
+
+    @property
+    def access(self):
+        return CourseAccess.for_request(self.request)
+
+    def _can_access_course(self, course):
+        return self.access.can_access_course(course)
+
+    def _can_manage_course(self, course):
+        return self.access.can_manage_course(course)
+
+    def _can_access_lesson(self, lesson):
+        return self.access.can_access_lesson(lesson)
@@ -115,7 +115,7 @@ class CourseAdmin(admin.ModelAdmin):
                    'average_rating', 'is_free', 'published_at')
     list_filter = ('status', 'level', 'is_free', 'created_at', 'published_at')
     search_fields = ('title', 'description', 'instructor__username', 'instructor__email')
-    readonly_fields = ('slug', 'enrollment_count', 'completion_rate', 'created_at', 'updated_at')
+    readonly_fields = ('slug', 'enrollment_count', 'completion_rate', 'total_lessons', 'created_at', 'updated_at')
     inlines = [ModuleInline]
 
     fieldsets = (
@@ -154,11 +154,9 @@ class CourseAdmin(admin.ModelAdmin):
     status_badge.short_description = 'Status'
 
     def average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if not reviews:
+        if not obj.review_count:
             return 'No reviews'
-        avg = sum(review.rating for review in reviews) / len(reviews)
-        return f"{avg:.1f}★ ({len(reviews)})"
+        return f"{obj.average_rating:.1f}★ ({obj.review_count})"
     average_rating.short_description = 'Rating'
 
     def publish_courses(self, request, queryset):
@@ -0,0 +1,229 @@
+"""
+Course bundles: a whole Course -> Unit -> Module -> Lesson -> QuizQuestion ->
+QuizAnswer tree as one JSON document (optionally zipped as course.json).
+
+Importing validates every row in memory and inserts the tree level by level
+with bulk_create inside one transaction, so a course of any size costs a
+handful of INSERTs. Cloning is export followed by import.
+"""
+import io
+import json
+import zipfile
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+
+from courses.models import Course, Unit, Module, Lesson
+from courses.services import CourseService
+from courses import search as course_search
+from progress.models import QuizQuestion, QuizAnswer
+
+BUNDLE_VERSION = 1
+BUNDLE_FILENAME = 'course.json'
+BATCH_SIZE = 1000
+
+COURSE_FIELDS = [
+    'title', 'description', 'short_description', 'level', 'is_free', 'price',
+    'max_students', 'duration_weeks',
+]
+UNIT_FIELDS = ['title', 'description', 'order', 'duration_weeks']
+MODULE_FIELDS = ['title', 'description', 'order', 'duration_hours', 'is_locked', 'unlock_criteria']
+LESSON_FIELDS = [
+    'title', 'description', 'order', 'content_type', 'lesson_type', 'weight', 'content',
+    'video_url', 'video_duration', 'attachments', 'is_required', 'estimated_duration',
+    'tags', 'difficulty',
+]
+QUESTION_FIELDS = ['question_text', 'question_type', 'points', 'order', 'time_limit']
+ANSWER_FIELDS = ['answer_text', 'is_correct', 'order']
+
+
+class BundleError(ValueError):
+    """The bundle is malformed or does not describe a valid course"""
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def export_course(course):
+    """Serialize a course tree to a bundle dict (one query per level)"""
+    lessons = Lesson.objects.filter(module__course=course).order_by('order')
+    questions = QuizQuestion.objects.filter(lesson__module__course=course).order_by('order')
+    answers = QuizAnswer.objects.filter(question__lesson__module__course=course).order_by('order')
+
+    answers_by_question = _group(answers, 'question_id', ANSWER_FIELDS)
+    questions_by_lesson = _group(questions, 'lesson_id', QUESTION_FIELDS, 'answers', answers_by_question)
+    lessons_by_module = _group(lessons, 'module_id', LESSON_FIELDS, 'quiz_questions', questions_by_lesson)
+    modules = Module.objects.filter(course=course).order_by('order')
+    modules_by_unit = _group(modules, 'unit_id', MODULE_FIELDS, 'lessons', lessons_by_module)
+    units = _group(Unit.objects.filter(course=course).order_by('order'), 'course_id', UNIT_FIELDS,
+                   'modules', modules_by_unit)
+
+    bundle = {
+        'version': BUNDLE_VERSION,
+        'course': _values(course, COURSE_FIELDS),
+        'units': units.get(course.id, []),
+        # Modules that are not attached to a unit
+        'modules': modules_by_unit.get(None, []),
+    }
+    # Round-trip through the encoder so Decimals and durations become JSON values
+    return json.loads(json.dumps(bundle, cls=DjangoJSONEncoder))
+
+
+def dump_bundle(bundle, archive=False):
+    """Encode a bundle as JSON bytes, or as a zip holding course.json"""
+    payload = json.dumps(bundle, cls=DjangoJSONEncoder, indent=2).encode('utf-8')
+    if not archive:
+        return payload
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(BUNDLE_FILENAME, payload)
+    return buffer.getvalue()
+
+
+def load_bundle(data):
+    """Decode JSON or zip bytes into a bundle dict"""
+    try:
+        if zipfile.is_zipfile(io.BytesIO(data)):
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                data = zf.read(BUNDLE_FILENAME)
+        return json.loads(data)
+    except KeyError:
+        raise BundleError(f'Zip bundles must contain {BUNDLE_FILENAME}')
+    except (ValueError, zipfile.BadZipFile) as exc:
+        raise BundleError(f'Bundle is not valid JSON: {exc}')
+
+
+# =============================================================================
+# IMPORT
+# =============================================================================
+
+def import_course(bundle, instructor, title=None):
+    """
+    Create a draft course from a bundle dict and return it.
+    Raises BundleError when the bundle is invalid; nothing is written then.
+    """
+    if not isinstance(bundle, dict) or bundle.get('version') != BUNDLE_VERSION:
+        raise BundleError(f'Unsupported bundle version (expected {BUNDLE_VERSION})')
+
+    course_data = _mapping(bundle.get('course'), 'course')
+    course = _build(Course, course_data, COURSE_FIELDS, 'course', instructor=instructor, status='draft')
+    if title:
+        course.title = title
+
+    # Build the whole tree in memory first; parents are linked after insert
+    units, modules, lessons, questions, answers = [], [], [], [], []
+    for u, unit_data in enumerate(_list(bundle, 'units', 'bundle')):
+        path = f'units[{u}]'
+        unit = _build(Unit, unit_data, UNIT_FIELDS, path)
+        units.append(unit)
+        for m, module_data in enumerate(_list(unit_data, 'modules', path)):
+            modules.append((unit, _build(Module, module_data, MODULE_FIELDS, f'{path}.modules[{m}]'), module_data))
+    for m, module_data in enumerate(_list(bundle, 'modules', 'bundle')):
+        modules.append((None, _build(Module, module_data, MODULE_FIELDS, f'modules[{m}]'), module_data))
+
+    for unit, module, module_data in modules:
+        for l, lesson_data in enumerate(_list(module_data, 'lessons', module.title)):
+            path = f'{module.title}.lessons[{l}]'
+            lesson = _build(Lesson, lesson_data, LESSON_FIELDS, path)
+            lessons.append((module, lesson))
+            for q, question_data in enumerate(_list(lesson_data, 'quiz_questions', path)):
+                question = _build(QuizQuestion, question_data, QUESTION_FIELDS, f'{path}.quiz_questions[{q}]')
+                questions.append((lesson, question))
+                question_path = f'{path}.quiz_questions[{q}]'
+                for a, answer_data in enumerate(_list(question_data, 'answers', question_path)):
+                    answer = _build(QuizAnswer, answer_data, ANSWER_FIELDS, f'{question_path}.answers[{a}]')
+                    answers.append((question, answer))
+
+    # Counters the skipped post_save receivers would have maintained
+    course.total_lessons = len(lessons)
+    for unit in units:
+        unit.total_modules = sum(1 for parent, _, _ in modules if parent is unit)
+    for _, module, _ in modules:
+        module.total_lessons = sum(1 for parent, _ in lessons if parent is module)
+
+    try:
+        with transaction.atomic():
+            CourseService.bulk_create([course])
+            for unit in units:
+                unit.course = course
+            Unit.objects.bulk_create(units, batch_size=BATCH_SIZE)
+            for unit, module, _ in modules:
+                module.course, module.unit = course, unit
+            Module.objects.bulk_create([module for _, module, _ in modules], batch_size=BATCH_SIZE)
+            _bulk_create_children(Lesson, 'module', lessons)
+            _bulk_create_children(QuizQuestion, 'lesson', questions)
+            _bulk_create_children(QuizAnswer, 'question', answers)
+            course_search.refresh_vectors([course.pk])
+    except ValidationError as exc:
+        raise BundleError(f'course: {"; ".join(exc.messages)}')
+    except IntegrityError as exc:
+        raise BundleError(f'Bundle has conflicting rows (duplicate order values?): {exc}')
+    return course
+
+
+def clone_course(course, instructor=None, title=None):
+    """Copy a course tree into a new draft course"""
+    return import_course(
+        export_course(course), instructor or course.instructor, title=title or f'{course.title} (Copy)'
+    )
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def _values(obj, fields):
+    return {field: getattr(obj, field) for field in fields}
+
+
+def _group(queryset, parent_field, fields, child_key=None, children=None):
+    """{parent id: [row dicts]} with each row's children attached under child_key"""
+    grouped = {}
+    for obj in queryset:
+        row = _values(obj, fields)
+        if child_key:
+            row[child_key] = children.get(obj.pk, [])
+        grouped.setdefault(getattr(obj, parent_field), []).append(row)
+    return grouped
+
+
+def _mapping(value, path):
+    if not isinstance(value, dict):
+        raise BundleError(f'{path}: expected an object')
+    return value
+
+
+def _list(data, key, path):
+    value = data.get(key, [])
+    if not isinstance(value, list):
+        raise BundleError(f'{path}.{key}: expected a list')
+    return [_mapping(item, f'{path}.{key}[{i}]') for i, item in enumerate(value)]
+
+
+def _build(model, data, fields, path, **extra):
+    """Unsaved instance from bundle data, validated without touching the database"""
+    data = _mapping(data, path)
+    unknown = set(data) - set(fields) - {'units', 'modules', 'lessons', 'quiz_questions', 'answers'}
+    if unknown:
+        raise BundleError(f"{path}: unknown fields {', '.join(sorted(unknown))}")
+
+    obj = model(**extra)
+    try:
+        for name in fields:
+            if name in data:
+                setattr(obj, name, model._meta.get_field(name).to_python(data[name]))
+        foreign_keys = [f.name for f in model._meta.concrete_fields if f.is_relation]
+        obj.clean_fields(exclude=foreign_keys + ['slug'])
+    except ValidationError as exc:
+        raise BundleError(f'{path}: {"; ".join(exc.messages)}')
+    return obj
+
+
+def _bulk_create_children(model, parent_field, pairs):
+    objs = []
+    for parent, obj in pairs:
+        setattr(obj, parent_field, parent)
+        objs.append(obj)
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
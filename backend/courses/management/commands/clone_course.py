@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.bundles import BundleError, clone_course
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Copy a course with its units, modules, lessons and quizzes into a new draft course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('--title', help='Title of the copy (defaults to "<title> (Copy)")')
+        parser.add_argument('--instructor', help='Username of the instructor of the copy (defaults to the original)')
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(pk=options['course_id'])
+        except Course.DoesNotExist:
+            raise CommandError(f"No course with id {options['course_id']}")
+
+        instructor = None
+        if options['instructor']:
+            try:
+                instructor = get_user_model().objects.get(username=options['instructor'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user named {options['instructor']}")
+
+        try:
+            copy = clone_course(course, instructor=instructor, title=options['title'])
+        except BundleError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f'Cloned course {course.id} as course {copy.id} ({copy.slug})'))
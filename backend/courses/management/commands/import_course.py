@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.bundles import BundleError, import_course, load_bundle
+
+
+class Command(BaseCommand):
+    help = 'Create a draft course from a course bundle (JSON or zip)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .json bundle or a .zip containing course.json')
+        parser.add_argument('--instructor', required=True, help='Username of the course instructor')
+        parser.add_argument('--title', help='Override the course title from the bundle')
+
+    def handle(self, *args, **options):
+        try:
+            instructor = get_user_model().objects.get(username=options['instructor'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['instructor']}")
+
+        try:
+            with open(options['path'], 'rb') as bundle_file:
+                bundle = load_bundle(bundle_file.read())
+            course = import_course(bundle, instructor, title=options['title'])
+        except (OSError, BundleError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f'Imported "{course.title}" as course {course.id} ({course.slug})'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from courses.services import CourseCounterService
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized course, unit and module counters and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course', action='append', dest='course_ids', type=int,
+            help='Course id to reconcile (repeatable, defaults to all courses)'
+        )
+
+    def handle(self, *args, **options):
+        fixed = CourseCounterService.reconcile(options['course_ids'])
+
+        for table, rows in fixed.items():
+            self.stdout.write(f'{table}: {rows} rows repaired')
+        self.stdout.write(self.style.SUCCESS('Course counters reconciled'))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.5 on 2026-10-16 21:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_alter_course_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='lesson_type',
+            field=models.CharField(choices=[('simple', 'Simple Content'), ('project', 'Project/Milestone')], default='simple', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='weight',
+            field=models.DecimalField(decimal_places=2, default=30.0, help_text='Weight in course grade (e.g., 30 for 30%)', max_digits=5),
+        ),
+        migrations.CreateModel(
+            name='Unit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('order', models.PositiveIntegerField(default=1)),
+                ('duration_weeks', models.DecimalField(decimal_places=1, default=1, max_digits=4)),
+                ('total_modules', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='units', to='courses.course')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='modules', to='courses.unit'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['course', 'order'], name='courses_uni_course__5a010f_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='unit',
+            unique_together={('course', 'order')},
+        ),
+    ]
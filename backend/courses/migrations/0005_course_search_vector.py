@@ -0,0 +1,41 @@
+# Generated by Django 4.2.5 on 2026-10-16 22:41
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from courses import search
+
+
+INDEX_NAME = 'course_search_vector_gin'
+
+
+def index_and_backfill(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX "{INDEX_NAME}" ON "courses_course" USING gin ("search_vector")'
+    )
+    search.refresh_vectors(apps=apps)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{INDEX_NAME}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # GIN is PostgreSQL-only, so the index lives outside the model state
+        migrations.RunPython(index_and_backfill, drop_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-16 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_thumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='content_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-16 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completion_bitmap',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completion_version',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-17 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_enrollment_completion_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='review_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
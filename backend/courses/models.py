@@ -1,9 +1,46 @@
+import copy
+
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.utils.text import slugify
+from django.db import transaction, IntegrityError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.constants import CourseConstants
+from core.mixins import CounterFieldsMixin
+from courses import slugs
+
 
-class Course(models.Model):
+class SearchFieldsMixin:
+    """
+    Remembers the loaded values of `search_fields`, so receivers only
+    rebuild the course search vector when one of them actually changed.
+    """
+    search_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(name in field_names for name in cls.search_fields):
+            instance._loaded_search_values = copy.deepcopy(
+                tuple(values[field_names.index(name)] for name in cls.search_fields)
+            )
+        return instance
+
+    def search_fields_changed(self):
+        loaded = getattr(self, '_loaded_search_values', None)
+        return loaded is None or loaded != self._search_values()
+
+    def _remember_search_fields(self):
+        self._loaded_search_values = copy.deepcopy(self._search_values())
+
+    def _search_values(self):
+        return tuple(getattr(self, name) for name in self.search_fields)
+
+
+class Course(SearchFieldsMixin, CounterFieldsMixin, models.Model):
     """
     Top-level course container with metadata and enrollment rules.
     """
@@ -27,6 +64,7 @@ class Course(models.Model):
 
     # Metadata
     thumbnail = models.ImageField(upload_to='course_thumbnails/', blank=True, null=True)
+    thumbnail_variants = models.JSONField(default=list, blank=True, editable=False)  # Built by core.images
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     level = models.CharField(max_length=20, choices=LEVEL_CHOICES, default='beginner')
 
@@ -39,16 +77,38 @@ class Course(models.Model):
     duration_weeks = models.PositiveIntegerField(default=4)
     total_lessons = models.PositiveIntegerField(default=0)  # Auto-calculated
 
+    # Statistics, maintained by CourseCounterService
+    active_enrollment_count = models.PositiveIntegerField(default=0)  # Active + completed
+    completed_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    # Bumped by CourseContentService whenever units, modules or lessons change
+    content_version = models.PositiveIntegerField(default=0)
+    content_changed_at = models.DateTimeField(blank=True, null=True)
+    # Bumped on review changes; kept apart so reviews leave content-keyed caches alone
+    review_version = models.PositiveIntegerField(default=0)
+
+    # Full-text search document, maintained by courses.search (GIN-indexed on PostgreSQL)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(blank=True, null=True)
 
+    counter_fields = (
+        'total_lessons', 'active_enrollment_count', 'completed_count', 'review_count', 'rating_sum',
+        'search_vector', 'thumbnail_variants', 'content_version', 'content_changed_at', 'review_version'
+    )
+    search_fields = ('title', 'short_description', 'description')
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['status', 'published_at']),
             models.Index(fields=['instructor', 'status']),
+            models.Index(fields=['status', '-active_enrollment_count'], name='course_popularity_idx'),
         ]
 
     def __str__(self):
@@ -62,32 +122,43 @@ class Course(models.Model):
             self.published_at = None
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
-            while Course.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-
-        self.full_clean()
-        super().save(*args, **kwargs)
+        generated = not self.slug
+        # Slug uniqueness is left to the unique index; a lost race is retried below
+        self.full_clean(exclude=['slug'] if generated else None, validate_unique=False)
+
+        for attempt in range(CourseConstants.SLUG_ALLOCATION_RETRIES):
+            if generated:
+                self.slug = slugs.next_slug(
+                    slugs.base_slug(self.title), Course.objects.exclude(pk=self.pk)
+                )
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                self._remember_search_fields()
+                return
+            except IntegrityError:
+                taken = Course.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if not generated or not taken or attempt == CourseConstants.SLUG_ALLOCATION_RETRIES - 1:
+                    raise
 
     @property
     def enrollment_count(self):
-        return self.enrollments.filter(status__in=['active', 'completed']).count()
+        return self.active_enrollment_count
 
     @property
     def completion_rate(self):
-        total_enrollments = self.enrollments.filter(status__in=['active', 'completed']).count()
-        if total_enrollments == 0:
+        if self.active_enrollment_count == 0:
+            return 0
+        return (self.completed_count / self.active_enrollment_count) * 100
+
+    @property
+    def average_rating(self):
+        if self.review_count == 0:
             return 0
-        completed = self.enrollments.filter(status='completed').count()
-        return (completed / total_enrollments) * 100
+        return round(self.rating_sum / self.review_count, 1)
 
 
-class Unit(models.Model):
+class Unit(CounterFieldsMixin, models.Model):
     """
     Course units (sections/topics) containing modules.
     """
@@ -103,6 +174,8 @@ class Unit(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    counter_fields = ('total_modules',)
+
     class Meta:
         ordering = ['order']
         unique_together = ['course', 'order']
@@ -118,7 +191,7 @@ class Unit(models.Model):
             raise ValidationError(f"Order {self.order} already exists for this course.")
 
 
-class Module(models.Model):
+class Module(CounterFieldsMixin, models.Model):
     """
     Course modules (weeks/topics) containing lessons.
     """
@@ -139,6 +212,8 @@ class Module(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    counter_fields = ('total_lessons',)
+
     class Meta:
         ordering = ['order']
         unique_together = ['course', 'order']
@@ -154,8 +229,20 @@ class Module(models.Model):
         if Module.objects.filter(course=self.course, order=self.order).exclude(pk=self.pk).exists():
             raise ValidationError(f"Order {self.order} already exists for this course.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Unit as stored, so counter updates can see a move
+        if 'unit_id' in field_names:
+            instance._loaded_unit_id = values[field_names.index('unit_id')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_unit_id = self.unit_id
+
 
-class Lesson(models.Model):
+class Lesson(SearchFieldsMixin, models.Model):
     """
     Individual lessons containing content.
     """
@@ -205,6 +292,8 @@ class Lesson(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    search_fields = ('title', 'tags')
+
     class Meta:
         ordering = ['order']
         unique_together = ['module', 'order']
@@ -220,12 +309,25 @@ class Lesson(models.Model):
         if Lesson.objects.filter(module=self.module, order=self.order).exclude(pk=self.pk).exists():
             raise ValidationError(f"Order {self.order} already exists for this module.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Module as stored, so counter updates can see a move
+        if 'module_id' in field_names:
+            instance._loaded_module_id = values[field_names.index('module_id')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_module_id = self.module_id
+        self._remember_search_fields()
+
     @property
     def course(self):
         return self.module.course
 
 
-class Enrollment(models.Model):
+class Enrollment(CounterFieldsMixin, models.Model):
     """
     Student enrollments in courses.
     """
@@ -253,6 +355,13 @@ class Enrollment(models.Model):
     payment_id = models.CharField(max_length=100, blank=True)
     amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
+    # Completed lessons as a bitset over the course's lesson sequence,
+    # maintained by LessonCompletionService; null version means not built yet
+    completion_bitmap = models.BinaryField(default=bytes, editable=False)
+    completion_version = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    counter_fields = ('completion_bitmap', 'completion_version')
+
     class Meta:
         unique_together = ['student', 'course']
         indexes = [
@@ -264,6 +373,14 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.course.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Status as stored, so counter updates can see transitions
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        return instance
+
     @property
     def is_completed(self):
         return self.status == 'completed' and self.completed_at is not None
@@ -292,3 +409,176 @@ class CourseReview(models.Model):
 
     def __str__(self):
         return f"{self.student.username} - {self.course.title} ({self.rating}★)"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'rating' in field_names:
+            instance._loaded_rating = values[field_names.index('rating')]
+        return instance
+
+
+def _deleting_course(origin):
+    """
+    True for deletes cascading from a course delete. Receivers that only
+    maintain the course's own counters, content version and search vector
+    skip these rows instead of running queries against a dying course.
+    """
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model is Course
+
+
+@receiver(post_save, sender=Course)
+def invalidate_outline_for_course(sender, instance, created, **kwargs):
+    # The outline carries the course title and slug
+    if not created:
+        from courses.services import CourseOutlineService
+        CourseOutlineService.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+def invalidate_outline_for_course_delete(sender, instance, **kwargs):
+    from courses.services import CourseOutlineService
+    CourseOutlineService.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Unit)
+@receiver([post_save, post_delete], sender=Module)
+def content_changed_for_unit_or_module(sender, instance, **kwargs):
+    if _deleting_course(kwargs.get('origin')):
+        return
+    from courses.services import CourseContentService
+    CourseContentService.changed(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def content_changed_for_lesson(sender, instance, **kwargs):
+    if _deleting_course(kwargs.get('origin')):
+        return
+    from courses.services import CourseContentService
+    # A lesson moved between courses changes both
+    module_ids = {instance.module_id, getattr(instance, '_loaded_module_id', instance.module_id)}
+    for course_id in set(Module.objects.filter(pk__in=module_ids).values_list('course_id', flat=True)):
+        CourseContentService.changed(course_id)
+
+
+@receiver([post_save, post_delete], sender=CourseReview)
+def content_changed_for_review(sender, instance, **kwargs):
+    if _deleting_course(kwargs.get('origin')):
+        return
+    # Reviews are part of the course detail but not of the outline
+    from courses.services import CourseContentService
+    CourseContentService.reviews_changed(instance.course_id)
+
+
+@receiver(post_save, sender=Enrollment)
+def invalidate_access_for_enrollment_save(sender, instance, created, **kwargs):
+    # Runs before count_enrollment_save, which moves _loaded_status forward
+    from courses.access import CourseAccess, ENROLLED_STATUSES
+    old_status = None if created else getattr(instance, '_loaded_status', None)
+    if (old_status in ENROLLED_STATUSES) != (instance.status in ENROLLED_STATUSES):
+        CourseAccess.invalidate(instance.student_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def invalidate_access_for_enrollment_delete(sender, instance, **kwargs):
+    from courses.access import CourseAccess
+    CourseAccess.invalidate(instance.student_id)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment_save(sender, instance, created, **kwargs):
+    from courses.services import CourseCounterService
+    old_status = None if created else getattr(instance, '_loaded_status', instance.status)
+    CourseCounterService.enrollment_changed(instance.course_id, old_status, instance.status)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Enrollment)
+def count_enrollment_delete(sender, instance, **kwargs):
+    if _deleting_course(kwargs.get('origin')):
+        return
+    from courses.services import CourseCounterService
+    old_status = getattr(instance, '_loaded_status', instance.status)
+    CourseCounterService.enrollment_changed(instance.course_id, old_status, None)
+
+
+@receiver(post_save, sender=CourseReview)
+def count_review_save(sender, instance, created, **kwargs):
+    from courses.services import CourseCounterService
+    # Ratings set straight from request data may still be strings
+    rating = int(instance.rating)
+    old_rating = None if created else getattr(instance, '_loaded_rating', rating)
+    CourseCounterService.review_changed(instance.course_id, old_rating, rating)
+    instance._loaded_rating = rating
+
+
+@receiver(post_delete, sender=CourseReview)
+def count_review_delete(sender, instance, **kwargs):
+    if _deleting_course(kwargs.get('origin')):
+        return
+    from courses.services import CourseCounterService
+    old_rating = getattr(instance, '_loaded_rating', instance.rating)
+    CourseCounterService.review_changed(instance.course_id, old_rating, None)
+
+
+@receiver(post_save, sender=Lesson)
+def count_lesson_save(sender, instance, created, **kwargs):
+    # Lesson.save moves _loaded_module_id forward once receivers have run
+    old_module_id = None if created else getattr(instance, '_loaded_module_id', instance.module_id)
+    if old_module_id != instance.module_id:
+        from courses.services import CourseCounterService
+        if old_module_id is not None:
+            CourseCounterService.lessons_changed(old_module_id, -1)
+        CourseCounterService.lessons_changed(instance.module_id, 1)
+
+
+@receiver(post_delete, sender=Lesson)
+def count_lesson_delete(sender, instance, **kwargs):
+    if _deleting_course(kwargs.get('origin')):
+        return
+    from courses.services import CourseCounterService
+    CourseCounterService.lessons_changed(instance.module_id, -1)
+
+
+@receiver(post_save, sender=Module)
+def count_module_save(sender, instance, created, **kwargs):
+    # Module.save moves _loaded_unit_id forward once receivers have run
+    old_unit_id = None if created else getattr(instance, '_loaded_unit_id', instance.unit_id)
+    if old_unit_id != instance.unit_id:
+        from courses.services import CourseCounterService
+        if old_unit_id is not None:
+            CourseCounterService.modules_changed(old_unit_id, -1)
+        if instance.unit_id is not None:
+            CourseCounterService.modules_changed(instance.unit_id, 1)
+
+
+@receiver(post_delete, sender=Module)
+def count_module_delete(sender, instance, **kwargs):
+    if instance.unit_id and not _deleting_course(kwargs.get('origin')):
+        from courses.services import CourseCounterService
+        CourseCounterService.modules_changed(instance.unit_id, -1)
+
+
+@receiver(post_save, sender=Course)
+def refresh_search_for_course(sender, instance, created, **kwargs):
+    if created or instance.search_fields_changed():
+        from courses import search
+        search.refresh_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Lesson)
+def refresh_search_for_lesson_save(sender, instance, created, **kwargs):
+    old_module_id = getattr(instance, '_loaded_module_id', instance.module_id)
+    if created or old_module_id != instance.module_id or instance.search_fields_changed():
+        from courses import search
+        search.refresh_vectors(
+            Module.objects.filter(pk__in={old_module_id, instance.module_id}).values('course_id')
+        )
+
+
+@receiver(post_delete, sender=Lesson)
+def refresh_search_for_lesson_delete(sender, instance, **kwargs):
+    if not _deleting_course(kwargs.get('origin')):
+        from courses import search
+        search.refresh_vectors(Module.objects.filter(pk=instance.module_id).values('course_id'))
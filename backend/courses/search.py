@@ -0,0 +1,89 @@
+"""
+Full-text search for the course catalog (PostgreSQL only).
+
+Each course stores a weighted `tsvector` in `Course.search_vector`, built
+from its title, short description, description and the titles and tags of
+its lessons. The column carries a GIN index (created by migration 0005)
+and is refreshed by the save/delete receivers in courses.models. Other
+database backends fall back to case-insensitive matching on course fields.
+"""
+import re
+
+from django.apps import apps as django_apps
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+from core.constants import CourseConstants
+
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def refresh_vectors(course_ids=None, apps=django_apps):
+    """
+    Recompute the stored search vector for the given courses (all when None)
+    in one UPDATE. `apps` lets migrations run this against historical models.
+    """
+    if not is_supported():
+        return 0
+    course_model = apps.get_model('courses', 'Course')
+    lessons = apps.get_model('courses', 'Lesson').objects.filter(
+        module__course=OuterRef('pk')
+    ).order_by().values('module__course')
+
+    tags = Coalesce(Cast('tags', TextField()), Value(''), output_field=TextField())
+    lesson_text = lessons.annotate(
+        text=StringAgg(Concat('title', Value(' '), tags, output_field=TextField()), delimiter=' ')
+    ).values('text')
+
+    config = CourseConstants.SEARCH_CONFIG
+    vector = (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector(
+            Coalesce(Subquery(lesson_text), Value(''), output_field=TextField()), weight='B', config=config
+        )
+        + SearchVector('short_description', weight='B', config=config)
+        + SearchVector('description', weight='C', config=config)
+    )
+
+    courses = course_model.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    return courses.update(search_vector=vector)
+
+
+def prefix_query(terms):
+    """
+    Build a tsquery that matches every term as a prefix, so partial input
+    ("pyth dat") finds "Python data".
+    """
+    return SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        search_type='raw', config=CourseConstants.SEARCH_CONFIG
+    )
+
+
+def search(queryset, text):
+    """Filter a Course queryset to matches for `text`, best matches first"""
+    terms = TERM_PATTERN.findall(text.lower())
+    if not terms:
+        return queryset.none()
+
+    if not is_supported():
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(short_description__icontains=term)
+                | Q(description__icontains=term)
+            )
+        return queryset.order_by('-active_enrollment_count', '-created_at')
+
+    query = prefix_query(terms)
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-active_enrollment_count', '-created_at')
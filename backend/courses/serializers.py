@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from .models import Course, Unit, Module, Lesson, Enrollment, CourseReview
+from core import images
 
 
 class UnitSerializer(serializers.ModelSerializer):
@@ -118,7 +119,7 @@ class CourseSerializer(serializers.ModelSerializer):
     reviews = CourseReviewSerializer(many=True, read_only=True)
     enrollment_count = serializers.ReadOnlyField()
     completion_rate = serializers.ReadOnlyField()
-    average_rating = serializers.SerializerMethodField()
+    average_rating = serializers.ReadOnlyField()
 
     class Meta:
         model = Course
@@ -133,15 +134,9 @@ class CourseSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             'id', 'slug', 'instructor', 'enrollment_count', 'completion_rate',
-            'published_at', 'created_at', 'updated_at'
+            'total_lessons', 'published_at', 'created_at', 'updated_at'
         ]
 
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if not reviews:
-            return 0
-        return round(sum(review.rating for review in reviews) / len(reviews), 1)
-
     def validate(self, attrs):
         """Validate course data - skip validation for updates"""
         # Skip all validation for updates (PATCH requests)
@@ -167,22 +162,22 @@ class CourseListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for course listings"""
     instructor_name = serializers.CharField(source='instructor.get_full_name', read_only=True)
     enrollment_count = serializers.ReadOnlyField()
-    average_rating = serializers.SerializerMethodField()
+    average_rating = serializers.ReadOnlyField()
+    thumbnail_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
         fields = [
-            'id', 'title', 'slug', 'description', 'short_description', 'thumbnail',
+            'id', 'title', 'slug', 'description', 'short_description', 'thumbnail', 'thumbnail_srcset',
             'instructor_name', 'level', 'is_free', 'price',
             'duration_weeks', 'enrollment_count', 'average_rating',
             'status', 'published_at', 'created_at'
         ]
 
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if not reviews:
-            return 0
-        return round(sum(review.rating for review in reviews) / len(reviews), 1)
+    def get_thumbnail_srcset(self, obj):
+        """{'webp': 'url 320w, ...', 'jpeg': ...}; empty until the variants are built"""
+        request = self.context.get('request')
+        return images.srcset(obj.thumbnail_variants, request.build_absolute_uri if request else None)
 
 
 class CourseCreateSerializer(serializers.ModelSerializer):
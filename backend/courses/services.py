@@ -2,14 +2,23 @@
 Service layer for courses app.
 Separates business logic from views for maintainability and testability.
 """
-from django.db import transaction
-from django.db.models import F
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django.db.models import (
+    F, Q, Case, When, Value, JSONField, IntegerField, Count, Sum, OuterRef, Subquery
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 
-from courses.models import Course, Enrollment, Module, Lesson
+from courses.models import Course, Enrollment, Unit, Module, Lesson
+from courses import slugs, search as course_search
+from core import caching
+from core.conditional import make_etag
 from users.models import Profile
 
 # Import centralized constants
-from core.constants import SecurityConstants, UploadConstants
+from core.constants import SecurityConstants, UploadConstants, CourseConstants
 
 
 class EnrollmentService:
@@ -88,13 +97,11 @@ class EnrollmentService:
                 student=user, course=course
             )
             
+            from progress.services import LessonCompletionService
+
             # Get progress stats
-            total_lessons = Lesson.objects.filter(
-                module__course=course
-            ).count()
-            
-            # This would call ProgressService in real implementation
-            completed_lessons = 0  # Placeholder
+            total_lessons = enrollment.course.total_lessons
+            completed_lessons = LessonCompletionService.completed_count(enrollment)
             
             return {
                 'enrollment': enrollment,
@@ -146,4 +153,328 @@ class CourseService:
         
         return True, None
 
+    @staticmethod
+    def bulk_create(courses, batch_size=500):
+        """
+        Insert many unsaved courses at once.
+        Fields are validated in memory (no per-row uniqueness or foreign key
+        queries), slugs are allocated in bulk, and a slug race retries.
+        """
+        for course in courses:
+            course.clean_fields(exclude=['slug', 'instructor'])
+            course.clean()
+
+        generated = [course for course in courses if not course.slug]
+        for attempt in range(CourseConstants.SLUG_ALLOCATION_RETRIES):
+            slugs.allocate_slugs(courses, Course.objects.all())
+            try:
+                with transaction.atomic():
+                    created = Course.objects.bulk_create(courses, batch_size=batch_size)
+                break
+            except IntegrityError:
+                if attempt == CourseConstants.SLUG_ALLOCATION_RETRIES - 1:
+                    raise
+                # Rolled back: forget ids from earlier batches and pick slugs again
+                for course in courses:
+                    course.pk = None
+                    course._state.adding = True
+                for course in generated:
+                    course.slug = None
+
+        # bulk_create skips the post_save receivers
+        course_search.refresh_vectors([course.pk for course in created])
+        return created
+
+
+class CourseCounterService:
+    """
+    Maintains the denormalized statistics on Course, Unit and Module.
+    Each change is one F() update in the caller's transaction, applied by
+    the model signals in courses.models; reconcile() repairs any drift.
+    """
+
+    COUNTED_STATUSES = ('active', 'completed')
+
+    @staticmethod
+    def enrollment_changed(course_id, old_status, new_status):
+        """Apply an enrollment status change (None means no enrollment)"""
+        counted = CourseCounterService.COUNTED_STATUSES
+        _increment(Course.objects.filter(pk=course_id), {
+            'active_enrollment_count': (new_status in counted) - (old_status in counted),
+            'completed_count': (new_status == 'completed') - (old_status == 'completed'),
+        })
+
+    @staticmethod
+    def review_changed(course_id, old_rating, new_rating):
+        """Apply a review rating change (None means no review)"""
+        _increment(Course.objects.filter(pk=course_id), {
+            'review_count': (new_rating is not None) - (old_rating is not None),
+            'rating_sum': (new_rating or 0) - (old_rating or 0),
+        })
+
+    @staticmethod
+    def lessons_changed(module_id, delta):
+        _increment(Module.objects.filter(pk=module_id), {'total_lessons': delta})
+        _increment(Course.objects.filter(modules=module_id), {'total_lessons': delta})
+
+    @staticmethod
+    def modules_changed(unit_id, delta):
+        _increment(Unit.objects.filter(pk=unit_id), {'total_modules': delta})
+
+    @staticmethod
+    def reconcile(course_ids=None, apps=django_apps):
+        """
+        Recompute counters from the source tables.
+        Returns {'courses': n, 'units': n, 'modules': n} rows that had drifted.
+        `apps` lets migrations run this against historical models.
+        """
+        course_model = apps.get_model('courses', 'Course')
+        unit_model = apps.get_model('courses', 'Unit')
+        module_model = apps.get_model('courses', 'Module')
+        lessons = apps.get_model('courses', 'Lesson').objects.all()
+        enrollments = apps.get_model('courses', 'Enrollment').objects.all()
+        reviews = apps.get_model('courses', 'CourseReview').objects.all()
+
+        courses = course_model.objects.all()
+        if course_ids is not None:
+            courses = courses.filter(pk__in=course_ids)
+        counted = CourseCounterService.COUNTED_STATUSES
+
+        return {
+            'courses': _repair(courses, {
+                'active_enrollment_count': _subquery_total(
+                    enrollments.filter(status__in=counted), 'course', Count('pk')
+                ),
+                'completed_count': _subquery_total(
+                    enrollments.filter(status='completed'), 'course', Count('pk')
+                ),
+                'review_count': _subquery_total(reviews, 'course', Count('pk')),
+                'rating_sum': _subquery_total(reviews, 'course', Sum('rating')),
+                'total_lessons': _subquery_total(lessons, 'module__course', Count('pk')),
+            }),
+            'units': _repair(unit_model.objects.filter(course__in=courses), {
+                'total_modules': _subquery_total(module_model.objects.all(), 'unit', Count('pk')),
+            }),
+            'modules': _repair(module_model.objects.filter(course__in=courses), {
+                'total_lessons': _subquery_total(lessons, 'module', Count('pk')),
+            }),
+        }
+
+
+def _increment(queryset, deltas):
+    """Add deltas to counter fields in one UPDATE, never going below zero"""
+    changes = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items() if delta
+    }
+    if changes:
+        queryset.update(**changes)
+
+
+def _subquery_total(queryset, fk, aggregate):
+    """Correlated subquery aggregating queryset rows per outer row, 0 when none"""
+    totals = queryset.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(
+        total=aggregate
+    ).values('total')
+    return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+
+def _repair(queryset, expected):
+    """Rewrite the rows whose counters differ from `expected`; returns how many"""
+    in_sync = Q(**{field: F(f'expected_{field}') for field in expected})
+    drifted = queryset.annotate(
+        **{f'expected_{field}': value for field, value in expected.items()}
+    ).exclude(in_sync).values_list('pk', flat=True)
+    return queryset.model.objects.filter(pk__in=list(drifted)).update(**expected)
+
+
+class CourseContentService:
+    """
+    Tracks a per-course content version for HTTP validators.
+    Any unit, module or lesson change bumps it with one UPDATE, so ETags and
+    Last-Modified dates are read straight off the course row. The version
+    also keys the lesson sequence cache and completion bitmaps, so review
+    changes bump the separate review_version instead.
+    """
+
+    @staticmethod
+    def changed(course_id):
+        Course.objects.filter(pk=course_id).update(
+            content_version=F('content_version') + 1, content_changed_at=timezone.now()
+        )
+        CourseOutlineService.invalidate(course_id)
+
+    @staticmethod
+    def reviews_changed(course_id):
+        Course.objects.filter(pk=course_id).update(review_version=F('review_version') + 1)
+
+    @staticmethod
+    def course_etag(course):
+        """Validator for the course detail: its row, counters and content and review versions"""
+        return make_etag(
+            'course', course.pk, course.updated_at.isoformat(), course.content_version, course.review_version,
+            course.active_enrollment_count, course.completed_count, course.review_count, course.rating_sum,
+            course.total_lessons
+        )
+
+    @staticmethod
+    def outline_etag(course):
+        return make_etag('outline', course.pk, course.updated_at.isoformat(), course.content_version)
+
+    @staticmethod
+    def outline_last_modified(course):
+        return max(filter(None, [course.updated_at, course.content_changed_at]))
+
+    @staticmethod
+    def lesson_etag(lesson):
+        """Validator for a lesson loaded with select_related('module__course')"""
+        return make_etag(
+            'lesson', lesson.pk, lesson.updated_at.isoformat(),
+            lesson.module.updated_at.isoformat(), lesson.module.course.updated_at.isoformat()
+        )
+
+    @staticmethod
+    def lesson_last_modified(lesson):
+        return max(lesson.updated_at, lesson.module.updated_at, lesson.module.course.updated_at)
+
+
+class LessonSequence:
+    """
+    A course's lessons in study order: modules by order, then lessons by
+    order. Built once per content version and answers navigation and
+    prerequisite questions from memory.
+    """
+
+    def __init__(self, modules, lessons):
+        # modules: [(module_id, title)] in order; lessons: [(lesson_id, module_id)] in order
+        self.module_titles = dict(modules)
+        lessons_by_module = {}
+        for lesson_id, module_id in lessons:
+            lessons_by_module.setdefault(module_id, []).append(lesson_id)
+
+        self.entries = []  # (lesson_id, module_id)
+        self.module_start = {}  # module_id -> index of its first lesson (or where it would be)
+        for module_id, _ in modules:
+            self.module_start[module_id] = len(self.entries)
+            self.entries.extend((lesson_id, module_id) for lesson_id in lessons_by_module.get(module_id, []))
+        self.position = {lesson_id: index for index, (lesson_id, _) in enumerate(self.entries)}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def next(self, lesson_id):
+        """(lesson_id, module_id) after the lesson, or None at the end"""
+        index = self.position.get(lesson_id)
+        if index is None or index + 1 >= len(self.entries):
+            return None
+        return self.entries[index + 1]
+
+    def previous(self, lesson_id):
+        """(lesson_id, module_id) before the lesson, or None at the start"""
+        index = self.position.get(lesson_id)
+        if not index:
+            return None
+        return self.entries[index - 1]
+
+    def lessons_before(self, module_id):
+        """Ids of every lesson in the modules preceding module_id"""
+        return [lesson_id for lesson_id, _ in self.entries[:self.module_start.get(module_id, 0)]]
+
+    def first_incomplete_module(self, module_id, completed_ids):
+        """The earliest preceding module with a lesson not in completed_ids, or None"""
+        for lesson_id, prior_module_id in self.entries[:self.module_start.get(module_id, 0)]:
+            if lesson_id not in completed_ids:
+                return prior_module_id
+        return None
+
+
+class CourseSequenceService:
+    """
+    Caches each course's LessonSequence under its content version, so any
+    structural change (CourseContentService.changed) switches to a fresh key.
+    """
+
+    CACHE_KEY = 'courses:sequence:{course_id}:{version}'
+
+    @staticmethod
+    def get_sequence(course):
+        key = CourseSequenceService.CACHE_KEY.format(course_id=course.id, version=course.content_version)
+        sequence = cache.get(key)
+        if sequence is None:
+            sequence = CourseSequenceService.build(course)
+            cache.set(key, sequence, timeout=CourseConstants.SEQUENCE_CACHE_TTL_SECONDS)
+        return sequence
+
+    @staticmethod
+    def build(course):
+        """Build the sequence with two queries"""
+        modules = Module.objects.filter(course=course).order_by('order').values_list('id', 'title')
+        lessons = Lesson.objects.filter(module__course=course).order_by('order').values_list('id', 'module_id')
+        return LessonSequence(list(modules), list(lessons))
+
+
+class CourseOutlineService:
+    """
+    Builds the Course -> Units -> Modules -> Lessons outline.
+    One flat query per level, assembled in memory and cached per course.
+    """
+
+    CACHE_KEY = 'courses:outline:{course_id}'
+
+    @staticmethod
+    def get_outline(course):
+        """Return the cached outline, building it on a miss"""
+        key = CourseOutlineService.CACHE_KEY.format(course_id=course.id)
+        outline = cache.get(key)
+        if outline is None:
+            outline = CourseOutlineService.build(course)
+            cache.set(key, outline, timeout=CourseConstants.OUTLINE_CACHE_TTL_SECONDS)
+        return outline
+
+    @staticmethod
+    def invalidate(course_id):
+        """Drop the cached outline"""
+        caching.invalidate(CourseOutlineService.CACHE_KEY.format(course_id=course_id))
+
+    @staticmethod
+    def build(course):
+        """Build the outline with three queries"""
+        units = list(
+            Unit.objects.filter(course=course).order_by('order').values('id', 'title', 'description', 'order')
+        )
+        modules = Module.objects.filter(course=course, unit__isnull=False).order_by('order').values(
+            'id', 'unit_id', 'title', 'description', 'order'
+        )
+        # Only quiz lessons need their content loaded
+        lessons = Lesson.objects.filter(module__course=course).order_by('order').annotate(
+            quiz_content=Case(
+                When(content_type='quiz', then=F('content')),
+                default=Value(None),
+                output_field=JSONField()
+            )
+        ).values('id', 'module_id', 'title', 'order', 'content_type', 'quiz_content')
+
+        lessons_by_module = {}
+        for lesson in lessons:
+            lesson_data = {
+                'id': lesson['id'], 'title': lesson['title'],
+                'order': lesson['order'], 'content_type': lesson['content_type']
+            }
+            if lesson['content_type'] == 'quiz':
+                content = lesson['quiz_content']
+                lesson_data['quiz_info'] = {
+                    'has_content': bool(content),
+                    'questions_count': len(content.get('questions', [])) if content else 0
+                }
+            lessons_by_module.setdefault(lesson['module_id'], []).append(lesson_data)
+
+        modules_by_unit = {}
+        for module in modules:
+            unit_id = module.pop('unit_id')
+            module['lessons'] = lessons_by_module.get(module['id'], [])
+            modules_by_unit.setdefault(unit_id, []).append(module)
+
+        for unit in units:
+            unit['modules'] = modules_by_unit.get(unit['id'], [])
 
+        return {'id': course.id, 'title': course.title, 'slug': course.slug, 'outline': units}
@@ -0,0 +1,78 @@
+"""
+Slug allocation for courses.
+
+A free slug is found with one query: every existing slug equal to the base
+or shaped `base-N` is matched by regex, and the next slug is `base-(max N + 1)`.
+Two writers can still race for the same slug, so callers retry on a unique
+violation (see Course.save and CourseService.bulk_create).
+"""
+import re
+
+from django.db.models import BigIntegerField, Count, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+from core.constants import CourseConstants
+
+# Only suffixes short enough to be ones we generated count as taken
+SUFFIX_DIGITS = rf'[0-9]{{1,{CourseConstants.SLUG_SUFFIX_MAX_DIGITS}}}'
+SUFFIX_PATTERN = re.compile(rf'^(?P<base>.+)-(?P<n>{SUFFIX_DIGITS})$')
+
+
+def base_slug(title):
+    # Leave room for a numeric suffix within the 200-character column
+    return slugify(title)[:CourseConstants.SLUG_BASE_MAX_LENGTH].strip('-') or 'course'
+
+
+def next_slug(base, queryset):
+    """The first free slug for `base` among `queryset` (one query)"""
+    stats = queryset.filter(slug__regex=rf'^{base}(-{SUFFIX_DIGITS})?$').aggregate(
+        taken=Count('pk'),
+        top=Max(
+            Cast(Substr('slug', len(base) + 2), BigIntegerField()),
+            filter=~Q(slug=base)
+        )
+    )
+    if not stats['taken']:
+        return base
+    return f"{base}-{(stats['top'] or 0) + 1}"
+
+
+def allocate_slugs(courses, queryset):
+    """
+    Give every course without a slug a free one, reading all the slugs that
+    could collide in one query per chunk of titles rather than one per course.
+    """
+    pending = [course for course in courses if not course.slug]
+    bases = sorted({base_slug(course.title) for course in pending})
+    if not bases:
+        return
+
+    # base -> highest suffix in use (0 means only the bare base is taken)
+    taken = {}
+    chunk_size = CourseConstants.SLUG_ALLOCATION_CHUNK_SIZE
+    for start in range(0, len(bases), chunk_size):
+        chunk = bases[start:start + chunk_size]
+        pattern = rf"^({'|'.join(chunk)})(-{SUFFIX_DIGITS})?$"
+        for slug in queryset.filter(slug__regex=pattern).values_list('slug', flat=True).iterator():
+            if slug in chunk:
+                taken[slug] = max(taken.get(slug, 0), 0)
+            match = SUFFIX_PATTERN.match(slug)
+            if match and match['base'] in chunk:
+                taken[match['base']] = max(taken.get(match['base'], 0), int(match['n']))
+
+    # Slugs already claimed within this batch: "Python" can land on python-1,
+    # the bare base of "Python 1", so each candidate is checked against them
+    reserved = {course.slug for course in courses if course.slug}
+    for course in pending:
+        base = base_slug(course.title)
+        slug = None
+        while slug is None or slug in reserved:
+            if base not in taken:
+                slug = base
+                taken[base] = 0
+            else:
+                taken[base] += 1
+                slug = f'{base}-{taken[base]}'
+        reserved.add(slug)
+        course.slug = slug
@@ -1,3 +1,723 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from PIL import Image
+
+from .models import Course, Unit, Module, Lesson, Enrollment, CourseReview
+from .services import CourseOutlineService, CourseCounterService, CourseService
+from . import bundles
+from .access import CourseAccess
+from analytics.models import BackgroundJob
+from progress.models import QuizQuestion, QuizAnswer
+from core import images
+
+User = get_user_model()
+
+
+class CourseOutlineAPITest(APITestCase):
+    """Test the course outline endpoint and its cached snapshot"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Outline Course', description='Outline test', instructor=self.instructor
+        )
+        for unit_order in (1, 2):
+            unit = Unit.objects.create(course=self.course, title=f'Unit {unit_order}', order=unit_order)
+            for module_order in (1, 2):
+                order = (unit_order - 1) * 2 + module_order
+                module = Module.objects.create(
+                    course=self.course, unit=unit, title=f'Module {order}', order=order
+                )
+                Lesson.objects.create(module=module, title=f'Lesson {order}', order=1)
+                Lesson.objects.create(
+                    module=module, title=f'Quiz {order}', order=2, content_type='quiz',
+                    content={'questions': [{'q': 1}, {'q': 2}]}
+                )
+        cache.delete(CourseOutlineService.CACHE_KEY.format(course_id=self.course.id))
+        self.url = reverse('course-outline', args=[self.course.id])
+        self.client.force_authenticate(user=self.instructor)
+
+    def test_outline_built_in_constant_queries(self):
+        """Test the tree is loaded with one query per level"""
+        with self.assertNumQueries(3):
+            outline = CourseOutlineService.build(self.course)
+
+        self.assertEqual([u['title'] for u in outline['outline']], ['Unit 1', 'Unit 2'])
+        modules = outline['outline'][1]['modules']
+        self.assertEqual([m['title'] for m in modules], ['Module 3', 'Module 4'])
+        quiz = modules[0]['lessons'][1]
+        self.assertEqual(quiz['quiz_info'], {'has_content': True, 'questions_count': 2})
+        self.assertNotIn('quiz_info', modules[0]['lessons'][0])
+
+    def test_outline_served_from_cache(self):
+        """Test a second request does not rebuild the outline"""
+        self.client.get(self.url)
+        # The course only: the owner check needs no profile or enrollment lookups
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['outline']), 2)
+
+    def test_saving_lesson_invalidates_outline(self):
+        """Test editing a lesson drops the cached outline"""
+        self.client.get(self.url)
+        lesson = Lesson.objects.get(title='Lesson 1')
+        lesson.title = 'Renamed'
+        lesson.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['outline'][0]['modules'][0]['lessons'][0]['title'], 'Renamed')
+
+    def test_deleting_unit_invalidates_outline(self):
+        """Test removing a unit drops the cached outline"""
+        self.client.get(self.url)
+        Unit.objects.get(title='Unit 2').delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual([u['title'] for u in response.data['outline']], ['Unit 1'])
+
+
+class CourseListAPITest(APITestCase):
+    """Test the course catalog listing"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.students = [
+            User.objects.create_user(username=f'student{i}', email=f'student{i}@test.com', password='password123')
+            for i in range(3)
+        ]
+        self.url = reverse('course-list')
+
+    def _create_courses(self, count):
+        for i in range(count):
+            course = Course.objects.create(
+                title=f'Course {Course.objects.count()}', description='Listing test',
+                instructor=self.instructor, status='published'
+            )
+            for rating, student in zip((4, 5), self.students):
+                Enrollment.objects.create(student=student, course=course, status='completed')
+                CourseReview.objects.create(student=student, course=course, rating=rating)
+            Enrollment.objects.create(student=self.students[2], course=course, status='dropped')
+
+    def test_list_query_count_is_constant(self):
+        """Test listing more courses does not add queries"""
+        self._create_courses(1)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 1)
+
+        self._create_courses(5)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 6)
+
+    def test_list_reports_course_stats(self):
+        """Test enrollment count and rating match the per-course values"""
+        self._create_courses(1)
+        response = self.client.get(self.url)
+
+        course = response.data['results'][0]
+        self.assertEqual(course['enrollment_count'], 2)
+        self.assertEqual(course['average_rating'], 4.5)
+
+
+class CourseCounterServiceTest(APITestCase):
+    """Test the denormalized course counters"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Counter Course', description='Counter test', instructor=self.instructor, status='published'
+        )
+        self.unit = Unit.objects.create(course=self.course, title='Unit 1', order=1)
+        self.module = Module.objects.create(course=self.course, unit=self.unit, title='Module 1', order=1)
+
+    def test_enrollment_transitions_update_counters(self):
+        """Test enrolling, completing and dropping move the counters"""
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(reverse('course-enroll', args=[self.course.id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.active_enrollment_count, self.course.completed_count), (1, 0))
+
+        enrollment = Enrollment.objects.get(student=self.student, course=self.course)
+        enrollment.status = 'completed'
+        enrollment.save()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.active_enrollment_count, self.course.completed_count), (1, 1))
+        self.assertEqual(self.course.completion_rate, 100)
+
+        enrollment.status = 'dropped'
+        enrollment.save()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.active_enrollment_count, self.course.completed_count), (0, 0))
+
+    def test_review_updates_rating(self):
+        """Test creating and editing a review keeps count and sum in step"""
+        Enrollment.objects.create(student=self.student, course=self.course, status='completed')
+        self.client.force_authenticate(user=self.student)
+        url = reverse('course-review', args=[self.course.id])
+        self.client.post(url, {'rating': 3})
+        self.client.post(url, {'rating': 5})
+
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.review_count, self.course.rating_sum), (1, 5))
+        self.assertEqual(self.course.average_rating, 5)
+
+    def test_lessons_and_modules_counted(self):
+        """Test lesson and module create/delete update their parents"""
+        lessons = [Lesson.objects.create(module=self.module, title=f'Lesson {i}', order=i) for i in (1, 2)]
+        lessons[0].delete()
+        Module.objects.create(course=self.course, unit=self.unit, title='Module 2', order=2)
+
+        self.course.refresh_from_db()
+        self.module.refresh_from_db()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.course.total_lessons, 1)
+        self.assertEqual(self.module.total_lessons, 1)
+        self.assertEqual(self.unit.total_modules, 2)
+
+    def test_moving_a_lesson_updates_both_modules(self):
+        """Test a lesson saved under another module moves its count with it"""
+        other = Module.objects.create(course=self.course, unit=self.unit, title='Module 2', order=2)
+        Lesson.objects.create(module=self.module, title='Lesson 1', order=1)
+        lesson = Lesson.objects.get(title='Lesson 1')
+
+        lesson.module = other
+        lesson.save()
+
+        self.module.refresh_from_db()
+        other.refresh_from_db()
+        self.course.refresh_from_db()
+        self.assertEqual((self.module.total_lessons, other.total_lessons), (0, 1))
+        self.assertEqual(self.course.total_lessons, 1)
+
+    def test_course_delete_skips_per_row_receivers(self):
+        """Test deleting a course does not update counters row by row for its children"""
+        for order in range(1, 4):
+            Lesson.objects.create(module=self.module, title=f'Lesson {order}', order=order)
+        Enrollment.objects.create(student=self.student, course=self.course)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.course.delete()
+
+        counter_tables = ('UPDATE "courses_course"', 'UPDATE "courses_unit"', 'UPDATE "courses_module"')
+        updates = [query['sql'] for query in queries if query['sql'].startswith(counter_tables)]
+        self.assertEqual(updates, [])
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_stale_instance_does_not_overwrite_counters(self):
+        """Test saving an instance loaded before a counter change keeps the counter"""
+        Lesson.objects.create(module=self.module, title='Lesson 1', order=1)
+        self.course.title = 'Renamed'
+        self.course.save()
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.title, 'Renamed')
+        self.assertEqual(self.course.total_lessons, 1)
+
+    def test_reconcile_repairs_drift(self):
+        """Test the reconcile command rewrites counters that drifted"""
+        Enrollment.objects.create(student=self.student, course=self.course, status='completed')
+        Lesson.objects.create(module=self.module, title='Lesson 1', order=1)
+        Course.objects.filter(pk=self.course.pk).update(active_enrollment_count=7, total_lessons=0)
+        Module.objects.filter(pk=self.module.pk).update(total_lessons=9)
+
+        out = StringIO()
+        call_command('reconcile_course_counters', stdout=out)
+        self.assertIn('courses: 1 rows repaired', out.getvalue())
+
+        self.course.refresh_from_db()
+        self.module.refresh_from_db()
+        self.assertEqual((self.course.active_enrollment_count, self.course.total_lessons), (1, 1))
+        self.assertEqual(self.module.total_lessons, 1)
+        self.assertEqual(CourseCounterService.reconcile(), {'courses': 0, 'units': 0, 'modules': 0})
+
+
+class CourseSearchAPITest(APITestCase):
+    """Test catalog search"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.python = self._course('Python Programming', 'Learn Python from scratch', level='beginner', is_free=True)
+        self.data = self._course(
+            'Data Engineering', 'Pipelines and warehouses', level='advanced', price='49.00'
+        )
+        self._course('Python Drafts', 'Not published yet', status='draft', is_free=True)
+        self.url = reverse('course-search')
+
+    def _course(self, title, description, status='published', **fields):
+        return Course.objects.create(
+            title=title, description=description, instructor=self.instructor, status=status, **fields
+        )
+
+    def _titles(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [course['title'] for course in response.data['results']]
+
+    def test_search_matches_prefixes_of_published_courses(self):
+        """Test partial terms match and drafts are hidden from anonymous users"""
+        self.assertEqual(self._titles(q='pyth'), ['Python Programming'])
+        self.assertEqual(self._titles(q='pipe eng'), ['Data Engineering'])
+        self.assertEqual(self._titles(q='   '), [])
+
+    def test_search_filters(self):
+        """Test level, is_free and price filters narrow the results"""
+        self.assertEqual(self._titles(q='python', level='advanced'), [])
+        self.assertEqual(self._titles(q='data', is_free='false', min_price='40'), ['Data Engineering'])
+        self.assertEqual(self._titles(q='data', max_price='10'), [])
+        response = self.client.get(self.url, {'q': 'data', 'min_price': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search needs PostgreSQL')
+    def test_search_ranks_and_indexes_lesson_titles(self):
+        """Test lesson titles are searchable and title matches rank first"""
+        module = Module.objects.create(course=self.data, title='Module 1', order=1)
+        Lesson.objects.create(module=module, title='Python for pipelines', order=1, tags=['airflow'])
+
+        self.assertEqual(self._titles(q='python'), ['Python Programming', 'Data Engineering'])
+        self.assertEqual(self._titles(q='airfl'), ['Data Engineering'])
+
+        Lesson.objects.filter(module=module).delete()
+        self.assertEqual(self._titles(q='airflow'), [])
+
+    def test_vector_refreshed_only_for_searchable_changes(self):
+        """Test lesson saves that leave title and tags alone do not rebuild the course vector"""
+        module = Module.objects.create(course=self.data, title='Module 1', order=1)
+        Lesson.objects.create(module=module, title='Batch jobs', order=1, tags=['spark'])
+        lesson = Lesson.objects.get(module=module)
+
+        with patch('courses.search.refresh_vectors') as refresh:
+            lesson.description = 'Reworded'
+            lesson.save()
+            refresh.assert_not_called()
+
+            lesson.tags.append('airflow')
+            lesson.save()
+            refresh.assert_called_once()
+
+
+class CourseSlugTest(TestCase):
+    """Test slug allocation"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+
+    def _course(self, title, **fields):
+        return Course(title=title, description='Slug test', instructor=self.instructor, **fields)
+
+    def test_next_suffix_found_in_one_query(self):
+        """Test the slug lookup is a single query however many siblings exist"""
+        for _ in range(4):
+            self._course('Intro to Python').save()
+        self._course('Intro to Python 3').save()
+
+        course = self._course('Intro to Python')
+        with CaptureQueriesContext(connection) as queries:
+            course.save()
+        slug_queries = [q for q in queries.captured_queries if 'slug' in q['sql'] and 'SELECT' in q['sql']]
+        self.assertEqual(len(slug_queries), 1)
+        self.assertEqual(course.slug, 'intro-to-python-4')
+
+    def test_lost_race_is_retried(self):
+        """Test a unique violation on a generated slug picks the next one"""
+        self._course('Race').save()
+        course = self._course('Race')
+        with patch('courses.slugs.next_slug', side_effect=['race', 'race-1']):
+            course.save()
+        self.assertEqual(course.slug, 'race-1')
+
+    def test_bulk_create_allocates_slugs(self):
+        """Test bulk import assigns distinct slugs without per-row lookups"""
+        self._course('Data Science').save()
+        self._course('Data').save()
+        courses = [self._course(title) for title in ('Data Science', 'Data Science', 'Data', 'Web')]
+
+        with CaptureQueriesContext(connection) as queries:
+            created = CourseService.bulk_create(courses)
+        slug_queries = [q for q in queries.captured_queries if 'REGEXP' in q['sql'].upper() or '~' in q['sql']]
+        self.assertEqual(len(slug_queries), 1)
+        self.assertEqual(
+            [course.slug for course in created], ['data-science-1', 'data-science-2', 'data-1', 'web']
+        )
+        self.assertTrue(all(course.pk for course in created))
+
+    def test_bulk_slugs_do_not_collide_within_the_batch(self):
+        """Test a suffixed slug and another title's bare slug are not handed out twice"""
+        self._course('Python').save()
+        courses = [self._course(title) for title in ('Python', 'Python 1', 'Python 2', 'Python')]
+
+        created = CourseService.bulk_create(courses)
+
+        self.assertEqual(
+            [course.slug for course in created], ['python-1', 'python-1-1', 'python-2', 'python-3']
+        )
+
+
+    def test_long_numeric_tails_do_not_overflow(self):
+        """Test a title ending in a huge number is not read as a slug suffix"""
+        self._course('Python').save()
+        self._course('Python 99999999999999999999').save()
+        self._course('Python 9999999999').save()
+
+        course = self._course('Python')
+        course.save()
+        self.assertEqual(course.slug, 'python-10000000000')
+        created = CourseService.bulk_create([self._course('Python')])
+        self.assertEqual(created[0].slug, 'python-10000000001')
+
+
+class CourseBundleTest(APITestCase):
+    """Test course bundle export, import and cloning"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password123'
+        )
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.course = Course.objects.create(
+            title='Bundled Course', description='Bundle test', instructor=self.admin, price='19.99'
+        )
+        unit = Unit.objects.create(course=self.course, title='Unit 1', order=1)
+        for order in (1, 2):
+            module = Module.objects.create(course=self.course, unit=unit, title=f'Module {order}', order=order)
+            Lesson.objects.create(module=module, title=f'Reading {order}', order=1, tags=['intro'])
+            quiz = Lesson.objects.create(module=module, title=f'Quiz {order}', order=2, content_type='quiz')
+            question = QuizQuestion.objects.create(lesson=quiz, question_text='2 + 2?', order=1)
+            QuizAnswer.objects.create(question=question, answer_text='4', is_correct=True, order=1)
+            QuizAnswer.objects.create(question=question, answer_text='5', order=2)
+        Module.objects.create(course=self.course, title='Loose Module', order=3)
+        self.client.force_authenticate(user=self.admin)
+
+    def test_clone_copies_tree_with_bulk_inserts(self):
+        """Test a clone inserts each level once and keeps counters in step"""
+        bundle = bundles.export_course(self.course)
+        with CaptureQueriesContext(connection) as queries:
+            copy = bundles.import_course(bundle, self.admin, title='Copy')
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 6)
+
+        copy.refresh_from_db()
+        self.assertEqual(copy.status, 'draft')
+        self.assertEqual(copy.total_lessons, 4)
+        self.assertNotEqual(copy.slug, self.course.slug)
+        self.assertEqual(Unit.objects.get(course=copy).total_modules, 2)
+        self.assertEqual(Module.objects.get(course=copy, order=1).total_lessons, 2)
+        self.assertIsNone(Module.objects.get(course=copy, order=3).unit)
+        self.assertEqual(QuizAnswer.objects.filter(question__lesson__module__course=copy, is_correct=True).count(), 2)
+        self.assertEqual(bundles.export_course(copy)['units'], bundle['units'])
+        self.assertEqual(CourseCounterService.reconcile([copy.id]), {'courses': 0, 'units': 0, 'modules': 0})
+
+    def test_invalid_bundle_writes_nothing(self):
+        """Test a bad row anywhere in the tree rejects the whole import"""
+        bundle = bundles.export_course(self.course)
+        bundle['units'][0]['modules'][1]['lessons'][0]['difficulty'] = 'impossible'
+        with self.assertRaises(bundles.BundleError):
+            bundles.import_course(bundle, self.admin)
+
+        bundle = bundles.export_course(self.course)
+        bundle['units'][0]['modules'][0]['lessons'][1]['order'] = 1
+        with self.assertRaises(bundles.BundleError):
+            bundles.import_course(bundle, self.admin)
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_zip_round_trip_through_api(self):
+        """Test a zip export can be uploaded to the import endpoint"""
+        response = self.client.get(reverse('course-export', args=[self.course.id]), {'archive': 'zip'})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        upload = SimpleUploadedFile('course.zip', response.content, content_type='application/zip')
+        response = self.client.post(
+            reverse('course-import-bundle'), {'bundle': upload, 'title': 'Uploaded'}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['title'], 'Uploaded')
+        self.assertEqual(Lesson.objects.filter(module__course_id=response.data['id']).count(), 4)
+
+    def test_clone_endpoint_and_permissions(self):
+        """Test cloning via the API and that students cannot import"""
+        response = self.client.post(reverse('course-clone', args=[self.course.id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['title'], 'Bundled Course (Copy)')
+
+        student = User.objects.create_user(username='student', email='student@test.com', password='password123')
+        self.client.force_authenticate(user=student)
+        response = self.client.post(reverse('course-import-bundle'), bundles.export_course(self.course), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_course_command(self):
+        """Test the management command imports a bundle file"""
+        with tempfile.NamedTemporaryFile(suffix='.json') as bundle_file:
+            bundle_file.write(bundles.dump_bundle(bundles.export_course(self.course)))
+            bundle_file.flush()
+            out = StringIO()
+            call_command('import_course', bundle_file.name, instructor='admin', title='From File', stdout=out)
+        self.assertIn('Imported "From File"', out.getvalue())
+        self.assertTrue(Course.objects.filter(title='From File', total_lessons=4).exists())
+
+
+class CourseAccessTest(APITestCase):
+    """Test the per-request access context shared by the content viewsets"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.instructor.profile.role = 'mentor'
+        self.instructor.profile.save()
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Access Course', description='Access test', instructor=self.instructor, status='published'
+        )
+        module = Module.objects.create(course=self.course, title='Module 1', order=1)
+        self.lesson = Lesson.objects.create(module=module, title='Lesson 1', order=1)
+        cache.delete(CourseAccess.CACHE_KEY.format(user_id=self.student.id))
+        self.client.force_authenticate(user=self.student)
+
+    def _lesson_titles(self):
+        response = self.client.get(reverse('lesson-list'))
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [lesson['title'] for lesson in results]
+
+    def test_enrollments_cached_until_they_change(self):
+        """Test enrolled course ids are read once and refreshed on enrollment"""
+        self.assertEqual(self._lesson_titles(), [])
+
+        with CaptureQueriesContext(connection) as queries:
+            self._lesson_titles()
+        self.assertFalse(any('courses_enrollment' in q['sql'] for q in queries.captured_queries))
+
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        self.assertEqual(self._lesson_titles(), ['Lesson 1'])
+
+        enrollment.status = 'dropped'
+        enrollment.save()
+        self.assertEqual(self._lesson_titles(), [])
+
+    def test_lesson_access_checked_from_memory(self):
+        """Test progress creation checks enrollment without extra lookups"""
+        url = reverse('progress-list')
+        response = self.client.post(url, {'lesson': self.lesson.id})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        Enrollment.objects.create(student=self.student, course=self.course)
+        response = self.client.post(url, {'lesson': self.lesson.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_only_owner_manages_course(self):
+        """Test another mentor cannot add modules and cannot see draft content"""
+        other = User.objects.create_user(username='other', email='other@test.com', password='password123')
+        other.profile.role = 'mentor'
+        other.profile.save()
+        draft = Course.objects.create(title='Draft', description='x', instructor=self.instructor)
+        self.client.force_authenticate(user=other)
+
+        response = self.client.post(reverse('module-list'), {'course': self.course.id, 'title': 'Intruder'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('unit-list'), {'course': draft.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['results'] if isinstance(response.data, dict) else response.data)
+
+        self.client.force_authenticate(user=self.instructor)
+        response = self.client.post(reverse('module-list'), {'course': self.course.id, 'title': 'Owned'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='course-images-'))
+class CourseThumbnailVariantTest(APITestCase):
+    """Test resized thumbnail variants and the catalog srcset"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Pictured Course', description='Image test', instructor=self.instructor, status='published'
+        )
+        self.client.force_authenticate(user=self.instructor)
+
+    def _jpeg(self, width=2000, height=1000):
+        exif = Image.Exif()
+        exif[0x010F] = 'Test Camera'  # Make
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'teal').save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('thumb.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_resized_and_stripped(self):
+        """Test each width and format is built without metadata under a content hash"""
+        variants = images.build_variants(self._jpeg(), 'course_thumbnails/variants')
+        self.assertEqual(
+            [(v['format'], v['width']) for v in variants],
+            [('webp', 320), ('webp', 640), ('webp', 1280), ('jpeg', 320), ('jpeg', 640), ('jpeg', 1280)]
+        )
+        with default_storage.open(variants[4]['name']) as stored, Image.open(stored) as image:
+            self.assertEqual(image.size, (640, 320))
+            self.assertFalse(image.getexif())
+
+        again = images.build_variants(self._jpeg(), 'course_thumbnails/variants')
+        self.assertEqual(again, variants)
+        self.assertEqual(images.variant_widths(500), [320, 500])
+
+    def test_upload_processed_after_commit(self):
+        """Test the upload defers resizing and the list exposes the srcset once built"""
+        url = reverse('course-upload-thumbnail', args=[self.course.id])
+        response = self.client.post(url, {'thumbnail': self._jpeg()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.thumbnail_variants, [])
+        call_command('run_workers', processes=0, once=True, stdout=StringIO())
+        job = BackgroundJob.objects.get(job_type='build_image_variants')
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.result, {'variant_count': 6})
+
+        response = self.client.get(reverse('course-list'))
+        srcset = response.data['results'][0]['thumbnail_srcset']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertTrue(srcset['webp'].startswith('http://testserver/media/course_thumbnails/variants/'))
+        self.assertTrue(srcset['webp'].endswith(' 1280w'))
+
+    def test_replaced_image_is_not_recorded(self):
+        """Test a stale job does not overwrite the variants of a newer upload"""
+        self.course.thumbnail = self._jpeg()
+        self.course.save()
+        stale_name = self.course.thumbnail.name
+        self.course.thumbnail = self._jpeg(800, 600)
+        self.course.save()
+
+        self.assertIsNone(images.refresh_variants(Course, self.course.id, 'thumbnail', 'thumbnail_variants', stale_name))
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.thumbnail_variants, [])
+
+
+class CourseConditionalGetTest(APITestCase):
+    """Test ETag / Last-Modified handling on course, outline and lesson reads"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.instructor.profile.role = 'mentor'
+        self.instructor.profile.save()
+        self.course = Course.objects.create(
+            title='Cached Course', description='Conditional test', instructor=self.instructor, status='published'
+        )
+        unit = Unit.objects.create(course=self.course, title='Unit 1', order=1)
+        self.module = Module.objects.create(course=self.course, unit=unit, title='Module 1', order=1)
+        self.lesson = Lesson.objects.create(module=self.module, title='Lesson 1', order=1)
+        Lesson.objects.create(module=self.module, title='Lesson 2', order=2)
+        self.client.force_authenticate(user=self.instructor)
+
+    def test_outline_not_modified_until_content_changes(self):
+        """Test a matching ETag skips the outline and a lesson delete changes it"""
+        url = reverse('course-outline', args=[self.course.id])
+        first = self.client.get(url)
+        self.assertIn('Last-Modified', first)
+        self.assertIn('private', first['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        Lesson.objects.get(title='Lesson 2').delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['outline'][0]['modules'][0]['lessons']), 1)
+
+    def test_course_detail_tracks_counters(self):
+        """Test the course ETag changes when enrollments move the counters"""
+        url = reverse('course-detail', args=[self.course.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        student = User.objects.create_user(username='student', email='student@test.com', password='password123')
+        Enrollment.objects.create(student=student, course=self.course)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['enrollment_count'], 1)
+
+    def test_reviews_change_detail_but_not_content_version(self):
+        """Test a review edit refreshes the course ETag without touching content-keyed caches"""
+        student = User.objects.create_user(username='student', email='student@test.com', password='password123')
+        self.course.refresh_from_db()
+        content_version = self.course.content_version
+        review = CourseReview.objects.create(student=student, course=self.course, rating=4, review_text='Good')
+        url = reverse('course-detail', args=[self.course.id])
+        etag = self.client.get(url)['ETag']
+
+        review.review_text = 'Very good'
+        review.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reviews'][0]['review_text'], 'Very good')
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.content_version, content_version)
+
+    def test_lesson_if_modified_since(self):
+        """Test lessons honour If-Modified-Since and notice a renamed module"""
+        url = reverse('lesson-detail', args=[self.lesson.id])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Module.objects.filter(pk=self.module.pk).update(title='Renamed', updated_at=timezone.now() + timedelta(seconds=2))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['module_title'], 'Renamed')
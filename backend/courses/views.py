@@ -1,7 +1,8 @@
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Max, Avg
+from django.http import HttpResponse
+from django.db.models import Q, Max, Count
 from django.utils import timezone
-from rest_framework import viewsets, status, parsers
+from rest_framework import viewsets, status, parsers, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
@@ -9,12 +10,20 @@ from rest_framework.pagination import PageNumberPagination
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 import os
+from decimal import Decimal, InvalidOperation
 
 from .models import Course, Unit, Module, Lesson, Enrollment, CourseReview
 from .serializers import (
     CourseSerializer, CourseListSerializer, CourseCreateSerializer,
     UnitSerializer, ModuleSerializer, LessonSerializer, EnrollmentSerializer, CourseReviewSerializer
 )
+from .services import CourseOutlineService, CourseContentService
+from . import search as course_search
+from . import bundles
+from .access import CourseAccess, CourseAccessMixin
+from core.pagination import SmallResultsSetPagination
+from core import images
+from core.conditional import conditional_response
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -31,8 +40,14 @@ class CourseViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         queryset = Course.objects.all()
+        if self.action in ('list', 'search'):
+            queryset = queryset.select_related('instructor')
+        # ?ordering=popular ranks by the maintained enrollment counter
+        ordering = ['-created_at']
+        if self.request.query_params.get('ordering') == 'popular':
+            ordering = ['-active_enrollment_count', '-created_at']
         if not user.is_authenticated:
-            return queryset.filter(status='published').order_by('-created_at')
+            return queryset.filter(status='published').order_by(*ordering)
         if not user.profile.is_instructor and not user.profile.is_admin:
             enrolled_course_ids = Enrollment.objects.filter(
                 student=user, status__in=['active', 'completed']
@@ -42,22 +57,58 @@ class CourseViewSet(viewsets.ModelViewSet):
             )
         if user.profile.is_instructor and not user.profile.is_admin:
             queryset = queryset.filter(instructor=user)
-        return queryset.order_by('-created_at')
+        return queryset.order_by(*ordering)
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CourseCreateSerializer
-        elif self.action == 'list':
+        elif self.action in ('list', 'search'):
             return CourseListSerializer
         return CourseSerializer
 
     def get_permissions(self):
-        if self.action == 'list':
+        if self.action in ('list', 'search'):
             return [AllowAny()]
         return [IsAuthenticated()]
 
     def perform_create(self, serializer):
-        serializer.save(instructor=self.request.user)
+        course = serializer.save(instructor=self.request.user)
+        if course.thumbnail:
+            images.process_in_background(course, 'thumbnail', 'thumbnail_variants')
+
+    def perform_update(self, serializer):
+        course = serializer.save()
+        if 'thumbnail' in serializer.validated_data:
+            images.process_in_background(course, 'thumbnail', 'thumbnail_variants')
+
+    def retrieve(self, request, *args, **kwargs):
+        """Course detail; 304 when the client's copy is current"""
+        course = self.get_object()
+        return conditional_response(
+            request, lambda: Response(self.get_serializer(course).data), CourseContentService.course_etag(course)
+        )
+
+    @action(detail=False, methods=['get'], pagination_class=SmallResultsSetPagination)
+    def search(self, request):
+        """Ranked catalog search: ?q= (prefix matched), level, is_free, min_price, max_price"""
+        queryset = self.get_queryset()
+        params = request.query_params
+        if params.get('level'):
+            queryset = queryset.filter(level=params['level'])
+        if params.get('is_free') in ('true', 'false'):
+            queryset = queryset.filter(is_free=params['is_free'] == 'true')
+        try:
+            if params.get('min_price'):
+                queryset = queryset.filter(price__gte=Decimal(params['min_price']))
+            if params.get('max_price'):
+                queryset = queryset.filter(price__lte=Decimal(params['max_price']))
+        except InvalidOperation:
+            return Response({'detail': 'min_price and max_price must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = course_search.search(queryset, params.get('q', ''))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def publish(self, request, pk=None):
@@ -119,6 +170,51 @@ class CourseViewSet(viewsets.ModelViewSet):
         serializer = CourseReviewSerializer(review)
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[parsers.JSONParser, parsers.MultiPartParser])
+    def import_bundle(self, request):
+        """Create a draft course from a bundle: a JSON body, or a multipart `bundle` file (JSON or zip)"""
+        if not request.user.profile.is_instructor and not request.user.profile.is_admin:
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        title = request.query_params.get('title')
+        try:
+            if 'bundle' in request.FILES:
+                bundle = bundles.load_bundle(request.FILES['bundle'].read())
+                title = request.data.get('title') or title
+            else:
+                bundle = request.data
+            course = bundles.import_course(bundle, request.user, title=title)
+        except bundles.BundleError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CourseSerializer(course, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Download the course tree as a bundle (?archive=zip for a zip file)"""
+        course = self.get_object()
+        if course.instructor != request.user and not request.user.profile.is_admin:
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        bundle = bundles.export_course(course)
+        if request.query_params.get('archive') != 'zip':
+            return Response(bundle)
+        response = HttpResponse(bundles.dump_bundle(bundle, archive=True), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{course.slug}.zip"'
+        return response
+
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """Copy the course tree into a new draft course owned by the requester"""
+        course = self.get_object()
+        if course.instructor != request.user and not request.user.profile.is_admin:
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            copy = bundles.clone_course(course, instructor=request.user, title=request.data.get('title'))
+        except bundles.BundleError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CourseSerializer(copy, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], parser_classes=[parsers.MultiPartParser])
     def upload_thumbnail(self, request, pk=None):
         course = self.get_object()
@@ -140,11 +236,12 @@ class CourseViewSet(viewsets.ModelViewSet):
                 pass
         course.thumbnail = thumbnail_file
         course.save()
+        images.process_in_background(course, 'thumbnail', 'thumbnail_variants')
         serializer = self.get_serializer(course)
         return Response(serializer.data)
 
 
-class UnitViewSet(viewsets.ModelViewSet):
+class UnitViewSet(CourseAccessMixin, viewsets.ModelViewSet):
     queryset = Unit.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = UnitSerializer
@@ -154,34 +251,25 @@ class UnitViewSet(viewsets.ModelViewSet):
         course_id = self.request.query_params.get('course')
         if course_id:
             course = get_object_or_404(Course, id=course_id)
-            if not self._can_access_course(user, course):
+            if not self._can_access_course(course):
                 return Unit.objects.none()
             return course.units.all()
-        if user.profile.is_instructor and not user.profile.is_admin:
+        if self.access.is_instructor and not self.access.is_admin:
             return Unit.objects.filter(course__instructor=user)
-        elif user.profile.is_admin:
+        elif self.access.is_admin:
             return Unit.objects.all()
         else:
-            enrolled_course_ids = Enrollment.objects.filter(student=user, status__in=['active', 'completed']).values_list('course_id', flat=True)
-            return Unit.objects.filter(course_id__in=enrolled_course_ids)
+            return Unit.objects.filter(course_id__in=self.access.enrolled_course_ids)
 
     def perform_create(self, serializer):
         course_id = self.request.data.get('course')
         course = get_object_or_404(Course, id=course_id)
-        if not self._can_manage_course(self.request.user, course):
+        if not self._can_manage_course(course):
             raise serializers.ValidationError("Cannot add units to this course")
         serializer.save(course=course)
 
-    def _can_access_course(self, user, course):
-        if course.status != 'published' and not self._can_manage_course(user, course):
-            return False
-        return True
 
-    def _can_manage_course(self, user, course):
-        return (user.profile.is_instructor and course.instructor == user) or user.profile.is_admin
-
-
-class ModuleViewSet(viewsets.ModelViewSet):
+class ModuleViewSet(CourseAccessMixin, viewsets.ModelViewSet):
     queryset = Module.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = ModuleSerializer
@@ -191,21 +279,20 @@ class ModuleViewSet(viewsets.ModelViewSet):
         course_id = self.request.query_params.get('course')
         if course_id:
             course = get_object_or_404(Course, id=course_id)
-            if not self._can_access_course(user, course):
+            if not self._can_access_course(course):
                 return Module.objects.none()
             return course.modules.all()
-        if user.profile.is_instructor and not user.profile.is_admin:
+        if self.access.is_instructor and not self.access.is_admin:
             return Module.objects.filter(course__instructor=user)
-        elif user.profile.is_admin:
+        elif self.access.is_admin:
             return Module.objects.all()
         else:
-            enrolled_course_ids = Enrollment.objects.filter(student=user, status__in=['active', 'completed']).values_list('course_id', flat=True)
-            return Module.objects.filter(course_id__in=enrolled_course_ids)
+            return Module.objects.filter(course_id__in=self.access.enrolled_course_ids)
 
     def perform_create(self, serializer):
         course_id = self.request.data.get('course')
         course = get_object_or_404(Course, id=course_id)
-        if not self._can_manage_course(self.request.user, course):
+        if not self._can_manage_course(course):
             raise serializers.ValidationError("Cannot add modules to this course")
         if 'order' not in self.request.data or not self.request.data.get('order'):
             max_order = Module.objects.filter(course=course).aggregate(Max('order'))['order__max'] or 0
@@ -213,40 +300,43 @@ class ModuleViewSet(viewsets.ModelViewSet):
         else:
             serializer.save(course=course)
 
-    def _can_access_course(self, user, course):
-        if course.status != 'published' and not self._can_manage_course(user, course):
-            return False
-        return True
-
-    def _can_manage_course(self, user, course):
-        return (user.profile.is_instructor and course.instructor == user) or user.profile.is_admin
 
-
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(CourseAccessMixin, viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = LessonSerializer
 
     def get_queryset(self):
+        # The serializer and the validators read the module and course titles and timestamps
+        return self._visible_lessons().select_related('module__course')
+
+    def retrieve(self, request, *args, **kwargs):
+        """Lesson content; 304 when the client's copy is current"""
+        lesson = self.get_object()
+        return conditional_response(
+            request, lambda: Response(self.get_serializer(lesson).data),
+            CourseContentService.lesson_etag(lesson), CourseContentService.lesson_last_modified(lesson)
+        )
+
+    def _visible_lessons(self):
         user = self.request.user
         module_id = self.request.query_params.get('module')
         if module_id:
-            module = get_object_or_404(Module, id=module_id)
-            if not self._can_access_course(user, module.course):
+            module = get_object_or_404(Module.objects.select_related('course'), id=module_id)
+            if not self._can_access_course(module.course):
                 return Lesson.objects.none()
             return module.lessons.all()
-        if user.profile.is_instructor and not user.profile.is_admin:
+        if self.access.is_instructor and not self.access.is_admin:
             return Lesson.objects.filter(module__course__instructor=user)
-        elif user.profile.is_admin:
+        elif self.access.is_admin:
             return Lesson.objects.all()
         else:
-            enrolled_course_ids = Enrollment.objects.filter(student=user, status__in=['active', 'completed']).values_list('course_id', flat=True)
-            return Lesson.objects.filter(module__course_id__in=enrolled_course_ids)
+            return Lesson.objects.filter(module__course_id__in=self.access.enrolled_course_ids)
 
     def perform_create(self, serializer):
         module_id = self.request.data.get('module')
-        module = get_object_or_404(Module, id=module_id)
-        if not self._can_manage_course(self.request.user, module.course):
+        module = get_object_or_404(Module.objects.select_related('course'), id=module_id)
+        if not self._can_manage_course(module.course):
             raise serializers.ValidationError("Cannot add lessons to this module")
         if 'order' not in self.request.data or not self.request.data.get('order'):
             max_order = Lesson.objects.filter(module=module).aggregate(Max('order'))['order__max'] or 0
@@ -254,14 +344,6 @@ class LessonViewSet(viewsets.ModelViewSet):
         else:
             serializer.save(module=module)
 
-    def _can_access_course(self, user, course):
-        if course.status != 'published' and not self._can_manage_course(user, course):
-            return False
-        return True
-
-    def _can_manage_course(self, user, course):
-        return (user.profile.is_instructor and course.instructor == user) or user.profile.is_admin
-
 
 class EnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Enrollment.objects.all()
@@ -308,14 +390,14 @@ def instructor_dashboard(request):
     if not user.profile.is_instructor and not user.profile.is_admin:
         return Response({'detail': 'Only instructors can access this dashboard'}, status=status.HTTP_403_FORBIDDEN)
     courses = Course.objects.filter(instructor=user) if not user.profile.is_admin else Course.objects.all()
-    courses = courses.prefetch_related('modules', 'reviews', 'enrollments')
+    courses = courses.annotate(modules_count=Count('modules'))
     data = []
     for course in courses:
         course_data = {
             'id': course.id, 'title': course.title, 'slug': course.slug, 'status': course.status,
             'level': course.level, 'enrollment_count': course.enrollment_count, 'completion_rate': course.completion_rate,
-            'average_rating': course.reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0,
-            'modules_count': course.modules.count(), 'total_lessons': course.total_lessons,
+            'average_rating': course.average_rating,
+            'modules_count': course.modules_count, 'total_lessons': course.total_lessons,
             'published_at': course.published_at, 'created_at': course.created_at,
         }
         data.append(course_data)
@@ -327,28 +409,12 @@ def instructor_dashboard(request):
 def course_outline(request, course_id):
     """Get full course outline: Course -> Units -> Modules -> Lessons"""
     course = get_object_or_404(Course, id=course_id)
-    user = request.user
-    is_owner = course.instructor == user
-    is_admin = hasattr(user, 'profile') and user.profile.is_admin
-    is_enrolled = Enrollment.objects.filter(student=user, course=course, status__in=['active', 'completed']).exists()
-    if not (is_owner or is_admin or is_enrolled):
+    access = CourseAccess.for_request(request)
+    is_owner = course.instructor_id == request.user.pk
+    if not (is_owner or access.is_admin or access.is_enrolled(course.id)):
         return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Simple approach - just iterate and build the tree
-    units = course.units.order_by('order')
-    outline = []
-    for unit in units:
-        unit_data = {'id': unit.id, 'title': unit.title, 'description': unit.description, 'order': unit.order, 'modules': []}
-        modules = unit.modules.order_by('order')
-        for module in modules:
-            module_data = {'id': module.id, 'title': module.title, 'description': module.description, 'order': module.order, 'lessons': []}
-            lessons = module.lessons.order_by('order')
-            for lesson in lessons:
-                lesson_data = {'id': lesson.id, 'title': lesson.title, 'order': lesson.order, 'content_type': lesson.content_type}
-                if lesson.content_type == 'quiz':
-                    lesson_data['quiz_info'] = {'has_content': bool(lesson.content), 'questions_count': len(lesson.content.get('questions', [])) if lesson.content else 0}
-                module_data['lessons'].append(lesson_data)
-            unit_data['modules'].append(module_data)
-        outline.append(unit_data)
-    
-    return Response({'id': course.id, 'title': course.title, 'slug': course.slug, 'outline': outline})
\ No newline at end of file
+    return conditional_response(
+        request, lambda: Response(CourseOutlineService.get_outline(course)),
+        CourseContentService.outline_etag(course), CourseContentService.outline_last_modified(course)
+    )
\ No newline at end of file
@@ -197,6 +197,7 @@ class Notification(models.Model):
             models.Index(fields=['notification_type', 'status']),
             models.Index(fields=['scheduled_for']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['recipient', 'created_at'], name='notification_recipient_keyset'),
         ]
 
     def __str__(self):
@@ -1,3 +1,73 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from .models import Notification
+
+User = get_user_model()
+
+
+class NotificationKeysetPaginationTest(APITestCase):
+    """Test cursor pagination on the notification list"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        other = User.objects.create_user(username='other', email='other@test.com', password='password123')
+        Notification.objects.create(recipient=other, notification_type='course_update', title='Other', message='x')
+
+        # Pairs share a timestamp so the id tie-breaker is exercised
+        now = timezone.now()
+        for i in range(5):
+            notification = Notification.objects.create(
+                recipient=self.user, notification_type='course_update', title=f'Note {i}', message='x'
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+        self.url = reverse('notification-list')
+        self.client.force_authenticate(user=self.user)
+
+    def _titles(self, response):
+        return [item['title'] for item in response.data['results']]
+
+    def test_pages_walk_forward_and_back(self):
+        """Test next/previous cursors visit every row once, newest first"""
+        first = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(self._titles(first), ['Note 1', 'Note 0'])
+        self.assertIsNone(first.data['previous'])
+        self.assertNotIn('count', first.data)
+
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+        self.assertEqual(self._titles(second), ['Note 3', 'Note 2'])
+        self.assertEqual(self._titles(third), ['Note 4'])
+        self.assertIsNone(third.data['next'])
+
+        back = self.client.get(third.data['previous'])
+        self.assertEqual(self._titles(back), ['Note 3', 'Note 2'])
+        self.assertEqual(self._titles(self.client.get(back.data['previous'])), ['Note 1', 'Note 0'])
+
+    def test_page_skips_count_query(self):
+        """Test no COUNT runs unless a count is requested"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'page_size': 2})
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(self.url, {'count': 'exact'})
+        self.assertEqual(response.data['count'], 5)
+        response = self.client.get(self.url, {'count': 'estimate'})
+        self.assertGreater(response.data['count'], 0)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -6,6 +6,7 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from core.pagination import KeysetPagination
 
 from .models import (
     NotificationTemplate, UserNotificationPreferences, Notification,
@@ -88,6 +89,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = NotificationSerializer
+    pagination_class = KeysetPagination
+    keyset_field = 'created_at'
 
     def get_queryset(self):
         user = self.request.user
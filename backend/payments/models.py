@@ -70,6 +70,9 @@ class PaymentTransaction(models.Model):
             models.Index(fields=['gateway', 'status']),
             models.Index(fields=['payment_type', 'status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'created_at'], name='payment_tx_user_keyset_idx'),
+            # Covers revenue aggregations (status filter, created_at buckets, SUM(amount))
+            models.Index(fields=['status', 'created_at', 'amount'], name='payment_tx_revenue_idx'),
         ]
 
     def __str__(self):
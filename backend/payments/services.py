@@ -6,6 +6,7 @@ from datetime import timedelta
 from django.db import models, transaction
 from django.utils import timezone
 
+from core.timeseries import bucketed_series, series_label
 from .models import PaymentTransaction, Refund, Coupon, CouponUsage
 
 
@@ -227,6 +228,36 @@ class PaymentService:
         return qs.aggregate(total=models.Sum('amount'))
 
 
+class RevenueService:
+    """
+    Revenue reporting queries.
+    Series are bucketed by calendar period in a single grouped query.
+    """
+
+    @staticmethod
+    def completed_transactions():
+        """Completed transactions; served by the (status, created_at, amount) index."""
+        return PaymentTransaction.objects.filter(status='completed')
+
+    @staticmethod
+    def revenue_series(period='month', periods=12, payment_type=None):
+        """
+        Revenue for the last N days, weeks or months, oldest first.
+        Returns [{'period': label, 'revenue': float}].
+        """
+        qs = RevenueService.completed_transactions()
+        if payment_type:
+            qs = qs.filter(payment_type=payment_type)
+
+        series = bucketed_series(
+            qs, 'created_at', period=period, periods=periods, aggregate=models.Sum('amount')
+        )
+        return [
+            {'period': series_label(start, period), 'revenue': float(revenue or 0)}
+            for start, revenue in series
+        ]
+
+
 class CouponApplicationService:
     """
     Service for coupon application - owns all coupon logic.
@@ -1,3 +1,55 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
 from django.test import TestCase
+from django.db.models import Sum
+from django.contrib.auth import get_user_model
+
+from core.timeseries import bucketed_series
+from .models import PaymentTransaction
+from .services import RevenueService
+
+User = get_user_model()
+
+
+class RevenueSeriesTest(TestCase):
+    """Test calendar-bucketed revenue series"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@test.com',
+            password='password123'
+        )
+
+    def _transaction(self, amount, created_at, status='completed'):
+        tx = PaymentTransaction.objects.create(
+            user=self.user,
+            amount=Decimal(amount),
+            payment_type='course_purchase',
+            status=status,
+            related_objects={}
+        )
+        PaymentTransaction.objects.filter(pk=tx.pk).update(created_at=created_at)
+
+    def test_monthly_series_uses_calendar_boundaries(self):
+        """Test month edges are exact and empty months are filled with zero"""
+        now = datetime(2024, 3, 15, tzinfo=dt_timezone.utc)
+        self._transaction('10.00', datetime(2024, 1, 31, 23, 59, tzinfo=dt_timezone.utc))
+        self._transaction('5.00', datetime(2024, 3, 1, 0, 0, tzinfo=dt_timezone.utc))
+        self._transaction('7.00', datetime(2024, 3, 2, tzinfo=dt_timezone.utc), status='failed')
+
+        with self.assertNumQueries(1):
+            series = bucketed_series(
+                RevenueService.completed_transactions(), 'created_at',
+                period='month', periods=3, aggregate=Sum('amount'), now=now
+            )
+
+        self.assertEqual([start.month for start, _ in series], [1, 2, 3])
+        self.assertEqual([value or 0 for _, value in series], [Decimal('10.00'), 0, Decimal('5.00')])
 
-# Create your tests here.
+    def test_revenue_series_labels(self):
+        """Test the service returns one labelled point per period"""
+        series = RevenueService.revenue_series('week', 4)
+        self.assertEqual(len(series), 4)
+        self.assertTrue(all(point['revenue'] == 0 for point in series))
@@ -6,6 +6,7 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from core.pagination import KeysetPagination
 
 from .models import (
     PaymentTransaction, SubscriptionPlan, UserSubscription,
@@ -17,6 +18,7 @@ from .serializers import (
     PaymentWebhookSerializer, CoursePurchaseSerializer, SubscriptionPurchaseSerializer,
     PaymentIntentSerializer, RefundRequestSerializer, PaymentAnalyticsSerializer
 )
+from .services import RevenueService
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -32,6 +34,8 @@ class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = PaymentTransaction.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = PaymentTransactionSerializer
+    pagination_class = KeysetPagination
+    keyset_field = 'created_at'
 
     def get_queryset(self):
         user = self.request.user
@@ -447,41 +451,46 @@ def payment_analytics(request):
     if not user.profile.is_admin:
         return Response({'detail': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
 
-    # Calculate analytics
-    total_revenue = PaymentTransaction.objects.filter(
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    total_transactions = PaymentTransaction.objects.count()
-    successful_transactions = PaymentTransaction.objects.filter(status='completed').count()
-    failed_transactions = PaymentTransaction.objects.filter(status='failed').count()
+    # Calculate analytics (transaction counts and revenue in one pass)
+    totals = PaymentTransaction.objects.aggregate(
+        total_transactions=Count('id'),
+        successful_transactions=Count('id', filter=Q(status='completed')),
+        failed_transactions=Count('id', filter=Q(status='failed')),
+        total_revenue=Sum('amount', filter=Q(status='completed')),
+        avg_transaction_value=Avg('amount', filter=Q(status='completed')),
+    )
+    total_transactions = totals['total_transactions']
+    successful_transactions = totals['successful_transactions']
 
     refund_amount = Refund.objects.filter(
         status='completed'
     ).aggregate(total=Sum('amount'))['total'] or 0
 
-    avg_transaction_value = PaymentTransaction.objects.filter(
-        status='completed'
-    ).aggregate(avg=Avg('amount'))['avg'] or 0
-
     # Revenue by payment type
-    revenue_by_type = PaymentTransaction.objects.filter(
-        status='completed'
-    ).values('payment_type').annotate(
+    revenue_by_type = RevenueService.completed_transactions().values('payment_type').annotate(
         total=Sum('amount')
     ).order_by('-total')
 
+    # Top courses by revenue
+    top_courses = RevenueService.completed_transactions().filter(
+        payment_type='course_purchase'
+    ).values('related_objects__course_id').annotate(
+        revenue=Sum('amount')
+    ).order_by('-revenue')[:10]
+
     # Simple conversion rate (successful transactions / total attempts)
     conversion_rate = (successful_transactions / total_transactions * 100) if total_transactions > 0 else 0
 
     analytics_data = {
-        'total_revenue': total_revenue,
+        'total_revenue': totals['total_revenue'] or 0,
         'total_transactions': total_transactions,
         'successful_transactions': successful_transactions,
-        'failed_transactions': failed_transactions,
+        'failed_transactions': totals['failed_transactions'],
         'refund_amount': refund_amount,
-        'average_transaction_value': avg_transaction_value,
+        'average_transaction_value': totals['avg_transaction_value'] or 0,
         'revenue_by_payment_type': list(revenue_by_type),
+        'revenue_trend': RevenueService.revenue_series('month', 12),
+        'top_courses': list(top_courses),
         'conversion_rate': round(conversion_rate, 2)
     }
 
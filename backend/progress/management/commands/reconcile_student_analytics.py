@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from progress.services import StudentAnalyticsService, LessonCompletionService
+
+
+class Command(BaseCommand):
+    help = 'Recompute student analytics from lesson progress and repair any drift (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course', action='append', dest='course_ids', type=int,
+            help='Course id to reconcile (repeatable, defaults to all courses)'
+        )
+
+    def handle(self, *args, **options):
+        result = StudentAnalyticsService.reconcile(options['course_ids'])
+        # Completion bitmaps rebuild lazily from the same progress rows
+        invalidated = LessonCompletionService.invalidate(options['course_ids'])
+
+        self.stdout.write(f"{result['created']} rows created, {result['repaired']} rows repaired")
+        self.stdout.write(f"{invalidated} completion bitmaps marked for rebuild")
+        self.stdout.write(self.style.SUCCESS('Student analytics reconciled'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from progress.models import QuizSubmission
+from progress.services import QuizGradingService
+
+
+class Command(BaseCommand):
+    help = 'Re-score quiz submissions against the current answer keys (run after editing quiz answers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lesson', action='append', dest='lesson_ids', type=int,
+            help='Quiz lesson id to regrade (repeatable)'
+        )
+        parser.add_argument(
+            '--course', action='append', dest='course_ids', type=int,
+            help='Course id to regrade (repeatable, defaults to all courses)'
+        )
+
+    def handle(self, *args, **options):
+        submissions = QuizSubmission.objects.all()
+        if options['lesson_ids']:
+            submissions = submissions.filter(lesson_id__in=options['lesson_ids'])
+        if options['course_ids']:
+            submissions = submissions.filter(lesson__module__course_id__in=options['course_ids'])
+
+        result = QuizGradingService.regrade(submissions)
+
+        self.stdout.write(f"{result['checked']} submissions checked, {result['changed']} rescored")
+        self.stdout.write(self.style.SUCCESS('Quiz submissions regraded'))
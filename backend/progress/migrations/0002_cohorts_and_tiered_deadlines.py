@@ -0,0 +1,106 @@
+# Generated by Django 4.2.5 on 2026-10-16 21:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_units_and_lesson_types'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('progress', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cohort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('reviewers_per_submission', models.PositiveIntegerField(default=3, help_text='Number of peers to assign per submission')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cohorts', to='courses.course')),
+            ],
+            options={
+                'ordering': ['-start_date'],
+                'unique_together': {('name', 'course')},
+            },
+        ),
+        migrations.AddField(
+            model_name='assignmentsubmission',
+            name='applied_tier',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Which tier was applied: 1, 2, or 3', null=True),
+        ),
+        migrations.AddField(
+            model_name='assignmentsubmission',
+            name='tier_1_deadline',
+            field=models.DateTimeField(blank=True, help_text='First deadline - 100% max score', null=True),
+        ),
+        migrations.AddField(
+            model_name='assignmentsubmission',
+            name='tier_2_deadline',
+            field=models.DateTimeField(blank=True, help_text='Second deadline - 65% max score', null=True),
+        ),
+        migrations.AddField(
+            model_name='assignmentsubmission',
+            name='tier_3_deadline',
+            field=models.DateTimeField(blank=True, help_text='Third/late deadline - 50% max score', null=True),
+        ),
+        migrations.AddField(
+            model_name='assignmentsubmission',
+            name='tier_cap_percentage',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='The capped percentage based on tier', max_digits=5, null=True),
+        ),
+        migrations.CreateModel(
+            name='PeerReviewRubric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='e.g., Project Code Quality Rubric', max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('criteria', models.JSONField(default=list)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='peer_review_rubrics', to='courses.course')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PeerReviewAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending Review'), ('in_progress', 'In Progress'), ('completed', 'Completed')], default='pending', max_length=20)),
+                ('rubric_scores', models.JSONField(blank=True, default=dict)),
+                ('total_score', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('feedback', models.TextField(blank=True)),
+                ('assigned_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='peer_review_tasks', to=settings.AUTH_USER_MODEL)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='peer_reviews', to='progress.assignmentsubmission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reviewer', 'status'], name='progress_pe_reviewe_38a513_idx'), models.Index(fields=['submission', 'status'], name='progress_pe_submiss_b31ac6_idx')],
+                'unique_together': {('submission', 'reviewer')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CohortMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('cohort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='progress.cohort')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cohort_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('cohort', 'student')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-16 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0002_cohorts_and_tiered_deadlines'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['student', 'first_accessed'], name='lesson_progress_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-16 22:56
+
+from django.db import migrations, models
+
+
+def backfill_analytics(apps, schema_editor):
+    from progress.services import StudentAnalyticsService
+    StudentAnalyticsService.reconcile(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentanalytics',
+            name='score_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentanalytics',
+            name='score_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_analytics, migrations.RunPython.noop),
+    ]
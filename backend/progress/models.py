@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from courses.models import Course, Module, Lesson
@@ -38,6 +40,7 @@ class LessonProgress(models.Model):
             models.Index(fields=['student', 'status']),
             models.Index(fields=['lesson', 'status']),
             models.Index(fields=['status', 'last_accessed']),
+            models.Index(fields=['student', 'first_accessed'], name='lesson_progress_keyset_idx'),
         ]
 
     def __str__(self):
@@ -47,6 +50,33 @@ class LessonProgress(models.Model):
     def is_completed(self):
         return self.status == 'completed' and self.completed_at is not None
 
+    def save(self, *args, **kwargs):
+        # The post_save receiver updates StudentAnalytics in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember what StudentAnalytics last counted so saves apply only the difference
+        instance = super().from_db(db, field_names, values)
+        # Partial loads (only(), refresh_from_db(fields=...)) would recurse into deferred fields
+        if {'status', 'time_spent_seconds', 'score'}.issubset(field_names):
+            instance._loaded_totals = instance.analytics_totals()
+        return instance
+
+    def analytics_totals(self):
+        """This record's contribution to StudentAnalytics counters"""
+        return {
+            'completed': int(self.status == 'completed'),
+            'time_spent': int(self.time_spent_seconds or 0),
+            'score_sum': self.score or 0,
+            'score_count': int(self.score is not None),
+        }
+
 
 class QuizQuestion(models.Model):
     """
@@ -274,6 +304,9 @@ class StudentAnalytics(models.Model):
     # Progress metrics
     total_time_spent = models.PositiveIntegerField(default=0)  # in seconds
     lessons_completed = models.PositiveIntegerField(default=0)
+    # Running score totals behind average_score, maintained by StudentAnalyticsService
+    score_sum = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    score_count = models.PositiveIntegerField(default=0)
     completion_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
     average_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
 
@@ -444,3 +477,44 @@ class PeerReviewAssignment(models.Model):
 
     def __str__(self):
         return f"Peer Review: {self.submission.student.username}'s {self.submission.lesson.title} by {self.reviewer.username}"
+
+
+@receiver(post_save, sender=LessonProgress)
+def apply_progress_to_analytics(sender, instance, created, **kwargs):
+    from progress.services import StudentAnalyticsService, LessonCompletionService
+    totals = instance.analytics_totals()
+    old = StudentAnalyticsService.EMPTY_TOTALS if created else getattr(instance, '_loaded_totals', None)
+    StudentAnalyticsService.progress_changed(instance, old, totals)
+    # An unknown old state just rewrites the bit
+    LessonCompletionService.progress_changed(
+        instance, old['completed'] if old else None, totals['completed']
+    )
+    instance._loaded_totals = totals
+
+
+@receiver(post_delete, sender=LessonProgress)
+def remove_progress_from_analytics(sender, instance, **kwargs):
+    from progress.services import StudentAnalyticsService, LessonCompletionService
+    old = getattr(instance, '_loaded_totals', instance.analytics_totals())
+    StudentAnalyticsService.progress_changed(instance, old, StudentAnalyticsService.EMPTY_TOTALS)
+    LessonCompletionService.progress_changed(instance, old['completed'], 0)
+
+
+@receiver(post_save, sender=QuizQuestion)
+@receiver(post_delete, sender=QuizQuestion)
+def invalidate_answer_key_for_question(sender, instance, **kwargs):
+    from progress.services import QuizGradingService
+    QuizGradingService.invalidate(instance.lesson_id)
+
+
+@receiver(post_save, sender=QuizAnswer)
+@receiver(post_delete, sender=QuizAnswer)
+def invalidate_answer_key_for_answer(sender, instance, **kwargs):
+    from progress.services import QuizGradingService
+    if QuizAnswer._meta.get_field('question').is_cached(instance):
+        lesson_id = instance.question.lesson_id
+    else:
+        lesson_id = QuizQuestion.objects.filter(pk=instance.question_id).values_list('lesson_id', flat=True).first()
+    # A question deleted along with its answers invalidates through its own receiver
+    if lesson_id is not None:
+        QuizGradingService.invalidate(lesson_id)
@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from django.utils import timezone
+from core.constants import ProgressConstants
 from .models import (
     LessonProgress, QuizSubmission, AssignmentSubmission,
     StudentAnalytics, QuizQuestion, QuizAnswer, AssignmentRequirement,
     Cohort, CohortMember, PeerReviewRubric, PeerReviewAssignment
 )
+from .services import QuizGradingService
 
 
 class QuizAnswerSerializer(serializers.ModelSerializer):
@@ -55,8 +57,9 @@ class LessonProgressSerializer(serializers.ModelSerializer):
             'time_spent_seconds', 'first_accessed', 'last_accessed',
             'completed_at', 'score', 'max_score', 'attempts_count'
         ]
+        # Time only enters through update_progress and heartbeat increments
         read_only_fields = [
-            'id', 'student', 'first_accessed', 'updated_at'
+            'id', 'student', 'first_accessed', 'updated_at', 'time_spent_seconds'
         ]
 
     def update(self, instance, validated_data):
@@ -65,7 +68,12 @@ class LessonProgressSerializer(serializers.ModelSerializer):
             if not instance.completed_at:
                 validated_data['completed_at'] = timezone.now()
 
-        return super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Write only what the request changed, so a stale time_spent_seconds
+        # on the loaded row cannot undo increments made since it was read
+        instance.save(update_fields=[*validated_data, 'last_accessed'])
+        return instance
 
 
 class QuizSubmissionSerializer(serializers.ModelSerializer):
@@ -97,32 +105,8 @@ class QuizSubmissionSerializer(serializers.ModelSerializer):
         return submission
 
     def _auto_grade_submission(self, submission):
-        """Auto-grade objective quiz questions"""
-        lesson = submission.lesson
-        answers = submission.answers or {}
-        total_score = 0
-        max_score = 0
-
-        # Get all questions for this lesson
-        questions = lesson.quiz_questions.all()
-
-        for question in questions:
-            max_score += question.points
-            submitted_answer = answers.get(str(question.id))
-
-            if submitted_answer and question.question_type in ['multiple_choice', 'true_false']:
-                # Check if answer is correct
-                correct_answers = question.answers.filter(is_correct=True)
-                if correct_answers.filter(id=submitted_answer).exists():
-                    total_score += question.points
-
-        # Update submission with calculated score
-        submission.score = total_score
-        submission.max_score = max_score
-        submission.percentage = (total_score / max_score * 100) if max_score > 0 else 0
-        submission.passed = submission.percentage >= 70  # 70% passing threshold
-        submission.graded_at = timezone.now()
-        submission.save()
+        """Auto-grade objective quiz questions against the lesson's cached answer key"""
+        QuizGradingService.grade_submission(submission)
 
 
 class AssignmentSubmissionSerializer(serializers.ModelSerializer):
@@ -244,6 +228,21 @@ class InstructorAnalyticsSerializer(serializers.Serializer):
     struggling_students_count = serializers.IntegerField()
 
 
+class HeartbeatSampleSerializer(serializers.Serializer):
+    """One lesson player heartbeat: time watched since the last one and position reached"""
+    lesson = serializers.IntegerField(min_value=1)
+    seconds = serializers.IntegerField(min_value=0, max_value=ProgressConstants.HEARTBEAT_MAX_SECONDS)
+    percentage = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100, required=False, allow_null=True
+    )
+
+
+class HeartbeatSerializer(serializers.Serializer):
+    """Batch of heartbeat samples from the lesson player"""
+    samples = HeartbeatSampleSerializer(many=True, allow_empty=False,
+                                        max_length=ProgressConstants.HEARTBEAT_MAX_SAMPLES)
+
+
 class GradingSerializer(serializers.Serializer):
     """Serializer for grading submissions"""
     submission_id = serializers.IntegerField()
@@ -1,7 +1,24 @@
-from django.db.models import Q, Avg, Count, Sum
+import itertools
+import logging
+import unicodedata
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django.db.models import (
+    Q, F, Avg, Case, Count, Sum, Exists, OuterRef, Subquery, Value, When, DecimalField, FloatField
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, NullIf
 from django.utils import timezone
-from courses.models import Course, Enrollment
-from .models import LessonProgress, QuizSubmission, AssignmentSubmission
+from courses.models import Course, Enrollment, Lesson
+from courses.services import CourseSequenceService
+from core import caching
+from core.buffers import BufferFull, WriteBehindBuffer, flush_at_exit
+from core.constants import ProgressConstants
+from .models import LessonProgress, QuizQuestion, QuizSubmission, AssignmentSubmission, StudentAnalytics
+
+logger = logging.getLogger(__name__)
 
 
 class ProgressAnalyticsService:
@@ -256,3 +273,577 @@ class ProgressAnalyticsService:
             analytics_data.append(analytics_summary)
 
         return analytics_data
+
+
+class StudentAnalyticsService:
+    """
+    Maintains StudentAnalytics incrementally.
+    Every LessonProgress save or delete applies its difference in one F()
+    update in the caller's transaction (see the receivers in
+    progress.models); reconcile() recomputes from LessonProgress and
+    repairs any drift.
+    """
+
+    EMPTY_TOTALS = {'completed': 0, 'time_spent': 0, 'score_sum': 0, 'score_count': 0}
+
+    @staticmethod
+    def progress_changed(progress, old_totals, new_totals):
+        """Apply the change in one progress record's totals (None when unknown)"""
+        course_id = _course_id(progress)
+        if course_id is None:
+            return
+        if old_totals is None:
+            # Saved without having been loaded, so the old contribution is unknown
+            StudentAnalyticsService.reconcile([course_id], student_ids=[progress.student_id])
+            return
+
+        delta = {key: new_totals[key] - old_totals[key] for key in new_totals}
+        rows = StudentAnalytics.objects.filter(student_id=progress.student_id, course_id=course_id)
+        changes = _apply_deltas(Course, delta)
+        if rows.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                StudentAnalytics.objects.create(student_id=progress.student_id, course_id=course_id)
+        except IntegrityError:
+            pass  # Created concurrently
+        rows.update(**changes)
+
+    @staticmethod
+    def reconcile(course_ids=None, student_ids=None, apps=django_apps):
+        """
+        Recompute analytics from LessonProgress, creating missing rows.
+        Returns {'created': n, 'repaired': n}; new rows count as repaired
+        once filled in. `apps` lets migrations run this against historical
+        models.
+        """
+        analytics_model = apps.get_model('progress', 'StudentAnalytics')
+        course_model = apps.get_model('courses', 'Course')
+        progress = apps.get_model('progress', 'LessonProgress').objects.all()
+        rows = analytics_model.objects.all()
+        if course_ids is not None:
+            progress = progress.filter(lesson__module__course_id__in=course_ids)
+            rows = rows.filter(course_id__in=course_ids)
+        if student_ids is not None:
+            progress = progress.filter(student_id__in=student_ids)
+            rows = rows.filter(student_id__in=student_ids)
+
+        missing = progress.annotate(
+            has_row=Exists(analytics_model.objects.filter(
+                student_id=OuterRef('student_id'), course_id=OuterRef('lesson__module__course_id')
+            ))
+        ).filter(has_row=False).values_list('student_id', 'lesson__module__course_id').distinct()
+        created = analytics_model.objects.bulk_create(
+            [analytics_model(student_id=student_id, course_id=course_id) for student_id, course_id in missing],
+            ignore_conflicts=True
+        )
+
+        per_row = progress.filter(student_id=OuterRef('student_id'), lesson__module__course_id=OuterRef('course_id'))
+        scored = per_row.filter(score__isnull=False)
+        expected = {
+            'lessons_completed': _subquery_total(per_row.filter(status='completed'), Count('pk')),
+            'total_time_spent': _subquery_total(per_row, Sum('time_spent_seconds')),
+            'score_count': _subquery_total(scored, Count('pk')),
+            'score_sum': _subquery_total(scored, Sum('score'), DecimalField(max_digits=10, decimal_places=2)),
+        }
+        in_sync = Q(**{field: F(f'expected_{field}') for field in expected})
+        drifted = list(rows.annotate(
+            **{f'expected_{field}': value for field, value in expected.items()}
+        ).exclude(in_sync).values_list('pk', flat=True))
+        analytics_model.objects.filter(pk__in=drifted).update(**expected)
+
+        # Lesson counts move as courses are edited, so refresh every derived figure
+        rows.update(**_derived_fields(course_model, F('lessons_completed'), F('score_sum'), F('score_count')))
+        return {'created': len(created), 'repaired': len(drifted)}
+
+
+class LessonCompletionService:
+    """
+    Per-enrollment completion bitmaps.
+    Bit i of Enrollment.completion_bitmap (lowest bit of each byte first) is
+    set when the student has completed lesson i of the course's
+    LessonSequence. completion_version records the content_version the
+    bitmap was built against; one that no longer matches its course is
+    rebuilt from LessonProgress on next use. Load enrollments with
+    select_related('course') to keep reads query-free.
+    """
+
+    @staticmethod
+    def progress_changed(progress, was_completed, is_completed):
+        """Set or clear the lesson's bit in the caller's transaction, holding the enrollment row"""
+        if was_completed == is_completed:
+            return
+        course_id = _course_id(progress)
+        if course_id is None:
+            return
+        enrollment = Enrollment.objects.select_for_update(of=('self',)).select_related('course').filter(
+            student_id=progress.student_id, course_id=course_id
+        ).first()
+        if enrollment is None:
+            return
+
+        sequence = CourseSequenceService.get_sequence(enrollment.course)
+        if enrollment.completion_version != enrollment.course.content_version:
+            LessonCompletionService.rebuild(enrollment, sequence)
+            return
+        position = sequence.position.get(progress.lesson_id)
+        if position is None:
+            return
+        bitmap = _with_bit(enrollment.completion_bitmap, position, is_completed)
+        Enrollment.objects.filter(pk=enrollment.pk).update(completion_bitmap=bitmap)
+        enrollment.completion_bitmap = bitmap
+
+    @staticmethod
+    def rebuild(enrollment, sequence=None):
+        """Recompute the bitmap from LessonProgress (one query) and store it"""
+        course = enrollment.course
+        sequence = sequence or CourseSequenceService.get_sequence(course)
+        completed_ids = LessonProgress.objects.filter(
+            student_id=enrollment.student_id, lesson__module__course_id=course.id, status='completed'
+        ).values_list('lesson_id', flat=True)
+        bitmap = bytearray((len(sequence) + 7) // 8)
+        for lesson_id in completed_ids:
+            position = sequence.position.get(lesson_id)
+            if position is not None:
+                bitmap[position // 8] |= 1 << (position % 8)
+        bitmap = bytes(bitmap)
+
+        # Only replace the version this rebuild started from, so a completion
+        # committed meanwhile is not overwritten with an older picture
+        loaded_version = enrollment.completion_version
+        current = Enrollment.objects.filter(pk=enrollment.pk)
+        if loaded_version is None:
+            current = current.filter(completion_version__isnull=True)
+        else:
+            current = current.filter(completion_version=loaded_version)
+        current.update(completion_bitmap=bitmap, completion_version=course.content_version)
+        enrollment.completion_bitmap, enrollment.completion_version = bitmap, course.content_version
+        return bitmap
+
+    @staticmethod
+    def invalidate(course_ids=None, student_ids=None):
+        """Mark bitmaps for rebuilding, e.g. after bulk LessonProgress updates that skip signals"""
+        enrollments = Enrollment.objects.all()
+        if course_ids is not None:
+            enrollments = enrollments.filter(course_id__in=course_ids)
+        if student_ids is not None:
+            enrollments = enrollments.filter(student_id__in=student_ids)
+        return enrollments.update(completion_version=None)
+
+    @staticmethod
+    def get_bitmap(enrollment, sequence=None):
+        """The enrollment's current bitmap, rebuilt first when stale"""
+        if enrollment.completion_version != enrollment.course.content_version:
+            return LessonCompletionService.rebuild(enrollment, sequence)
+        return bytes(enrollment.completion_bitmap)
+
+    @staticmethod
+    def completed_count(enrollment):
+        return sum(bin(byte).count('1') for byte in LessonCompletionService.get_bitmap(enrollment))
+
+    @staticmethod
+    def completion_percentage(enrollment):
+        total_lessons = enrollment.course.total_lessons
+        if not total_lessons:
+            return 0
+        return min(LessonCompletionService.completed_count(enrollment) / total_lessons * 100, 100)
+
+    @staticmethod
+    def completed_lesson_ids(enrollment):
+        sequence = CourseSequenceService.get_sequence(enrollment.course)
+        bitmap = LessonCompletionService.get_bitmap(enrollment, sequence)
+        return {
+            sequence.entries[position][0]
+            for position in _set_positions(bitmap) if position < len(sequence)
+        }
+
+    @staticmethod
+    def first_incomplete_module(enrollment, module_id):
+        """The earliest module before module_id with an incomplete lesson, or None"""
+        sequence = CourseSequenceService.get_sequence(enrollment.course)
+        bitmap = LessonCompletionService.get_bitmap(enrollment, sequence)
+        position = _first_clear(bitmap, sequence.module_start.get(module_id, 0))
+        return None if position is None else sequence.entries[position][1]
+
+
+def _with_bit(bitmap, position, value):
+    bitmap = bytearray(bitmap)
+    index = position // 8
+    if index >= len(bitmap):
+        bitmap.extend(bytes(index + 1 - len(bitmap)))
+    if value:
+        bitmap[index] |= 1 << (position % 8)
+    else:
+        bitmap[index] &= ~(1 << (position % 8)) & 0xFF
+    return bytes(bitmap)
+
+
+def _set_positions(bitmap):
+    for index, byte in enumerate(bitmap):
+        while byte:
+            low = byte & -byte
+            yield index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+def _first_clear(bitmap, limit):
+    """The lowest position below limit whose bit is clear, or None"""
+    for index in range((limit + 7) // 8):
+        byte = bitmap[index] if index < len(bitmap) else 0
+        if byte == 0xFF:
+            continue
+        clear = ~byte & 0xFF
+        position = index * 8 + (clear & -clear).bit_length() - 1
+        return position if position < limit else None
+    return None
+
+
+class LessonTimeService:
+    """
+    Adds time spent on lessons with UPDATE ... SET time_spent_seconds =
+    time_spent_seconds + n, so concurrent writers (several open tabs, the
+    heartbeat flush) add to each other instead of overwriting.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def apply(samples):
+        """
+        Apply {(student_id, lesson_id): {'course_id', 'seconds', 'percentage'}}
+        to LessonProgress (creating in_progress rows where missing) and to
+        StudentAnalytics, with a fixed number of queries per call.
+        Returns the number of progress rows updated.
+        """
+        # Lessons deleted since the samples were queued would fail the whole INSERT
+        lesson_ids = set(Lesson.objects.filter(
+            pk__in={lesson_id for _, lesson_id in samples}
+        ).values_list('pk', flat=True))
+        samples = {key: sample for key, sample in samples.items() if key[1] in lesson_ids}
+        if not samples:
+            return 0
+        now = timezone.now()
+        student_ids = {student_id for student_id, _ in samples}
+
+        LessonProgress.objects.bulk_create(
+            [LessonProgress(student_id=student_id, lesson_id=lesson_id, status='in_progress')
+             for student_id, lesson_id in samples],
+            ignore_conflicts=True
+        )
+        rows = {
+            pk: samples[(student_id, lesson_id)]
+            for pk, student_id, lesson_id in LessonProgress.objects.filter(
+                student_id__in=student_ids, lesson_id__in=lesson_ids
+            ).values_list('pk', 'student_id', 'lesson_id')
+            if (student_id, lesson_id) in samples
+        }
+        percentage = DecimalField(max_digits=5, decimal_places=2)
+        percentages = [
+            When(pk=pk, then=Value(sample['percentage'], output_field=percentage))
+            for pk, sample in rows.items() if sample['percentage'] is not None
+        ]
+        changes = {
+            'time_spent_seconds': F('time_spent_seconds') + _per_row(rows, 'seconds'),
+            'status': Case(When(status='not_started', then=Value('in_progress')), default=F('status')),
+            'last_accessed': now,
+        }
+        if percentages:
+            # The player can seek backwards; keep the furthest position reached
+            changes['progress_percentage'] = Greatest(
+                F('progress_percentage'), Case(*percentages, default=F('progress_percentage')),
+                output_field=percentage
+            )
+        updated = LessonProgress.objects.filter(pk__in=rows).update(**changes)
+
+        # The UPDATE skips the post_save receivers, so add the time to StudentAnalytics here
+        time_by_pair = {}
+        for (student_id, _), sample in samples.items():
+            pair = (student_id, sample['course_id'])
+            time_by_pair[pair] = time_by_pair.get(pair, 0) + sample['seconds']
+        analytics_pks = {
+            (student_id, course_id): pk
+            for pk, student_id, course_id in StudentAnalytics.objects.filter(
+                student_id__in=student_ids, course_id__in={course_id for _, course_id in time_by_pair}
+            ).values_list('pk', 'student_id', 'course_id')
+            if (student_id, course_id) in time_by_pair
+        }
+        analytics = {pk: {'seconds': time_by_pair[pair]} for pair, pk in analytics_pks.items()}
+        if analytics:
+            StudentAnalytics.objects.filter(pk__in=analytics).update(
+                total_time_spent=F('total_time_spent') + _per_row(analytics, 'seconds'),
+                last_activity=now, updated_at=now
+            )
+        missing = set(time_by_pair) - set(analytics_pks)
+        if missing:
+            # First activity in a course: reconcile creates the row from the progress just written
+            StudentAnalyticsService.reconcile(
+                course_ids={course_id for _, course_id in missing},
+                student_ids={student_id for student_id, _ in missing}
+            )
+        return updated
+
+
+class HeartbeatBufferFull(BufferFull):
+    """Raised when the heartbeat buffer cannot accept more samples."""
+
+
+class LessonHeartbeatBuffer(WriteBehindBuffer):
+    """
+    In-process buffer coalescing lesson player heartbeats.
+
+    Samples are summed per (student, lesson) as they arrive, so a player
+    reporting every few seconds holds one entry in memory instead of causing
+    a write per request. The flush timer writes them through
+    LessonTimeService.apply; a full buffer raises HeartbeatBufferFull once
+    flushing in the caller's thread does not free space.
+    """
+
+    full_error = HeartbeatBufferFull
+    thread_name = 'lesson-heartbeat-flush'
+
+    def __init__(self, max_keys=None, batch_size=None, flush_interval=None):
+        super().__init__(
+            batch_size=batch_size or ProgressConstants.HEARTBEAT_FLUSH_BATCH_SIZE,
+            flush_interval=flush_interval or ProgressConstants.HEARTBEAT_FLUSH_INTERVAL_SECONDS,
+        )
+        self.max_keys = max_keys or ProgressConstants.HEARTBEAT_BUFFER_MAX_KEYS
+        self._pending = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, student_id, samples):
+        """
+        Queue one request's samples, [(lesson_id, course_id, seconds, percentage)].
+        Either all of them are accepted or HeartbeatBufferFull is raised.
+        """
+        self.put((student_id, samples))
+
+    def _offer(self, item):
+        student_id, samples = item
+        with self._lock:
+            new_keys = {(student_id, lesson_id) for lesson_id, _, _, _ in samples} - set(self._pending)
+            if len(self._pending) + len(new_keys) > self.max_keys:
+                return False
+            for lesson_id, course_id, seconds, percentage in samples:
+                self._merge((student_id, lesson_id), {
+                    'course_id': course_id, 'seconds': seconds, 'percentage': percentage
+                })
+            return True
+
+    def _take(self):
+        with self._lock:
+            keys = list(itertools.islice(self._pending, self.batch_size))
+            return {key: self._pending.pop(key) for key in keys}
+
+    def _write(self, batch):
+        LessonTimeService.apply(batch)
+        return len(batch)
+
+    def _write_failed(self, batch):
+        """Put unwritten samples back, merged with anything queued meanwhile"""
+        with self._lock:
+            for key, sample in batch.items():
+                self._merge(key, sample)
+        logger.exception("Failed to flush %d lesson heartbeats", len(batch))
+
+    def _merge(self, key, sample):
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = dict(sample)
+            return
+        current['seconds'] += sample['seconds']
+        if sample['percentage'] is not None:
+            current['percentage'] = max(current['percentage'] or 0, sample['percentage'])
+
+
+# Process-wide buffer used by the heartbeat endpoint
+heartbeat_buffer = flush_at_exit(LessonHeartbeatBuffer())
+
+
+class QuizGradingService:
+    """
+    Auto-grades quiz submissions against a per-lesson answer key.
+    The key is loaded in one query and cached until a question or answer of
+    the lesson changes (see the receivers in progress.models); grading
+    itself runs in memory.
+
+    Submitted answers map question ids to an answer id, a list of answer ids
+    (questions with several correct answers must be matched exactly) or,
+    for short answers, text compared after normalization. Essays are left
+    for manual grading but still count towards max_score.
+    """
+
+    CACHE_KEY = 'progress:answer_key:{lesson_id}'
+    CHOICE_TYPES = ('multiple_choice', 'true_false')
+
+    @staticmethod
+    def get_answer_key(lesson_id):
+        key = QuizGradingService.CACHE_KEY.format(lesson_id=lesson_id)
+        answer_key = cache.get(key)
+        if answer_key is None:
+            answer_key = QuizGradingService.build_answer_key(lesson_id)
+            cache.set(key, answer_key, timeout=ProgressConstants.QUIZ_ANSWER_KEY_CACHE_TTL_SECONDS)
+        return answer_key
+
+    @staticmethod
+    def invalidate(lesson_id):
+        """Drop the cached answer key"""
+        caching.invalidate(QuizGradingService.CACHE_KEY.format(lesson_id=lesson_id))
+
+    @staticmethod
+    def build_answer_key(lesson_id):
+        """{question_id: {'type', 'points', 'correct_ids', 'correct_texts'}} in one query"""
+        rows = QuizQuestion.objects.filter(lesson_id=lesson_id).order_by().values_list(
+            'id', 'question_type', 'points', 'answers__id', 'answers__is_correct', 'answers__answer_text'
+        )
+        answer_key = {}
+        for question_id, question_type, points, answer_id, is_correct, answer_text in rows:
+            entry = answer_key.setdefault(question_id, {
+                'type': question_type, 'points': points, 'correct_ids': set(), 'correct_texts': set(),
+            })
+            if is_correct:
+                entry['correct_ids'].add(answer_id)
+                entry['correct_texts'].add(normalize_answer(answer_text))
+        return answer_key
+
+    @staticmethod
+    def grade(answer_key, answers):
+        """Score submitted answers: {'score', 'max_score', 'percentage', 'passed'}"""
+        answers = answers if isinstance(answers, dict) else {}
+        score = max_score = 0
+        for question_id, entry in answer_key.items():
+            max_score += entry['points']
+            if _is_correct(entry, answers.get(str(question_id))):
+                score += entry['points']
+        percentage = Decimal(score * 100) / max_score if max_score else Decimal(0)
+        percentage = percentage.quantize(Decimal('0.01'))
+        return {
+            'score': Decimal(score),
+            'max_score': Decimal(max_score),
+            'percentage': percentage,
+            'passed': percentage >= ProgressConstants.QUIZ_PASSING_PERCENTAGE,
+        }
+
+    @staticmethod
+    def grade_submission(submission):
+        """Grade and save one submission"""
+        result = QuizGradingService.grade(QuizGradingService.get_answer_key(submission.lesson_id), submission.answers)
+        for field, value in result.items():
+            setattr(submission, field, value)
+        submission.graded_at = timezone.now()
+        submission.save(update_fields=[*result, 'graded_at'])
+        return result
+
+    @staticmethod
+    def regrade(submissions):
+        """
+        Re-score submissions against current answer keys, one key per lesson,
+        saving only those whose result changed with batched bulk_update.
+        Returns {'checked': n, 'changed': n}.
+        """
+        batch_size = ProgressConstants.QUIZ_REGRADE_BATCH_SIZE
+        fields = ['score', 'max_score', 'percentage', 'passed']
+        lesson_id = answer_key = None
+        pending, checked, changed, now = [], 0, 0, timezone.now()
+
+        submissions = submissions.order_by('lesson_id', 'pk').only('lesson_id', 'answers', *fields)
+        for submission in submissions.iterator(chunk_size=batch_size):
+            checked += 1
+            if submission.lesson_id != lesson_id:
+                # Build directly rather than trust a key cached before an edit
+                lesson_id = submission.lesson_id
+                answer_key = QuizGradingService.build_answer_key(lesson_id)
+            result = QuizGradingService.grade(answer_key, submission.answers)
+            if all(getattr(submission, field) == value for field, value in result.items()):
+                continue
+            for field, value in result.items():
+                setattr(submission, field, value)
+            submission.graded_at = now
+            pending.append(submission)
+            changed += 1
+            if len(pending) >= batch_size:
+                QuizSubmission.objects.bulk_update(pending, [*fields, 'graded_at'])
+                pending = []
+
+        if pending:
+            QuizSubmission.objects.bulk_update(pending, [*fields, 'graded_at'])
+        return {'checked': checked, 'changed': changed}
+
+
+def normalize_answer(text):
+    """Short-answer comparison form: Unicode-normalized, case-folded, single-spaced, no end punctuation"""
+    text = unicodedata.normalize('NFKC', str(text))
+    return ' '.join(text.casefold().split()).strip(' .,;:!?')
+
+
+def _is_correct(entry, submitted):
+    if submitted in (None, '', []):
+        return False
+    if entry['type'] in QuizGradingService.CHOICE_TYPES:
+        choices = submitted if isinstance(submitted, list) else [submitted]
+        try:
+            chosen = {int(choice) for choice in choices}
+        except (TypeError, ValueError):
+            return False
+        if len(entry['correct_ids']) > 1:
+            return chosen == entry['correct_ids']
+        return len(chosen) == 1 and chosen <= entry['correct_ids']
+    if entry['type'] == 'short_answer':
+        return not isinstance(submitted, (list, dict)) and normalize_answer(submitted) in entry['correct_texts']
+    return False
+
+
+def _per_row(values, key):
+    """CASE pk WHEN ... mapping each row to its own increment"""
+    return Case(*[When(pk=pk, then=Value(value[key])) for pk, value in values.items()], default=Value(0))
+
+
+def _course_id(progress):
+    """The progress record's course, without queries when the lesson tree is loaded"""
+    if LessonProgress._meta.get_field('lesson').is_cached(progress):
+        lesson = progress.lesson
+        if Lesson._meta.get_field('module').is_cached(lesson):
+            return lesson.module.course_id
+    return Lesson.objects.filter(pk=progress.lesson_id).values_list('module__course_id', flat=True).first()
+
+
+def _apply_deltas(course_model, delta):
+    """UPDATE expressions adding `delta` to the counters and refreshing the derived fields"""
+    completed = Greatest(F('lessons_completed') + delta['completed'], Value(0))
+    score_sum = Greatest(
+        F('score_sum') + Value(Decimal(delta['score_sum'])), Value(Decimal(0)),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+    score_count = Greatest(F('score_count') + delta['score_count'], Value(0))
+    now = timezone.now()
+    return {
+        'lessons_completed': completed,
+        'total_time_spent': Greatest(F('total_time_spent') + delta['time_spent'], Value(0)),
+        'score_sum': score_sum,
+        'score_count': score_count,
+        # The right-hand side reads the pre-update values, so derive from the same expressions
+        **_derived_fields(course_model, completed, score_sum, score_count),
+        'last_activity': now,
+        'updated_at': now,
+    }
+
+
+def _derived_fields(course_model, completed, score_sum, score_count):
+    total_lessons = Subquery(
+        course_model.objects.filter(pk=OuterRef('course_id')).values('total_lessons')[:1]
+    )
+    ratio = Cast(completed, FloatField()) * 100 / NullIf(total_lessons, 0)
+    average = Cast(score_sum, FloatField()) / NullIf(score_count, 0)
+    # Casting to the column type rounds to two places
+    percentage = DecimalField(max_digits=5, decimal_places=2)
+    return {
+        'completion_percentage': Cast(Least(Coalesce(ratio, Value(0.0)), Value(100.0)), percentage),
+        'average_score': Cast(average, percentage),
+    }
+
+
+def _subquery_total(queryset, aggregate, output_field=None):
+    """Correlated per-row aggregate, 0 when there are no rows"""
+    totals = queryset.order_by().values('student_id').annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(totals, output_field=output_field), 0, output_field=output_field)
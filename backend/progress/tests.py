@@ -1,3 +1,503 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from courses.models import Course, Module, Lesson, Enrollment
+from .models import LessonProgress, StudentAnalytics, Cohort, CohortMember, QuizQuestion, QuizAnswer, QuizSubmission
+from courses.services import CourseSequenceService
+from .services import (
+    StudentAnalyticsService, LessonCompletionService, LessonHeartbeatBuffer, QuizGradingService
+)
+
+User = get_user_model()
+
+
+class StudentAnalyticsServiceTest(APITestCase):
+    """Test incremental StudentAnalytics maintenance"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Tracked Course', description='Analytics test', instructor=self.instructor, status='published'
+        )
+        module = Module.objects.create(course=self.course, title='Module 1', order=1)
+        self.lessons = [Lesson.objects.create(module=module, title=f'Lesson {i}', order=i) for i in range(1, 5)]
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_authenticate(user=self.student)
+
+    def _analytics(self):
+        return StudentAnalytics.objects.get(student=self.student, course=self.course)
+
+    def test_progress_writes_apply_deltas(self):
+        """Test completions, time and scores are added without rescanning progress"""
+        first = LessonProgress.objects.create(
+            student=self.student, lesson=self.lessons[0], status='completed', score=80, time_spent_seconds=60
+        )
+        LessonProgress.objects.create(student=self.student, lesson=self.lessons[1], score=90)
+        analytics = self._analytics()
+        self.assertEqual(analytics.lessons_completed, 1)
+        self.assertEqual(analytics.total_time_spent, 60)
+        self.assertEqual(analytics.completion_percentage, Decimal('25.00'))
+        self.assertEqual(analytics.average_score, Decimal('85.00'))
+
+        url = reverse('progress-update-progress', args=[first.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'time_spent_seconds': 30}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('SUM(' in q['sql'].upper() for q in queries.captured_queries))
+        self.assertEqual(self._analytics().total_time_spent, 90)
+
+        LessonProgress.objects.get(pk=first.pk).delete()
+        analytics = self._analytics()
+        self.assertEqual(analytics.lessons_completed, 0)
+        self.assertEqual(analytics.total_time_spent, 0)
+        self.assertEqual(analytics.average_score, Decimal('90.00'))
+
+    def test_status_transition_counted_once(self):
+        """Test re-saving a completed lesson does not count it again"""
+        progress = LessonProgress.objects.create(student=self.student, lesson=self.lessons[0], status='completed')
+        progress.save()
+        progress = LessonProgress.objects.get(pk=progress.pk)
+        progress.status = 'in_progress'
+        progress.save()
+        self.assertEqual(self._analytics().lessons_completed, 0)
+
+    def test_reconcile_repairs_drift(self):
+        """Test the periodic job rebuilds drifted and missing rows"""
+        LessonProgress.objects.create(student=self.student, lesson=self.lessons[0], status='completed', score=70)
+        StudentAnalytics.objects.update(lessons_completed=3, score_count=0, completion_percentage=75)
+        other = User.objects.create_user(username='other', email='other@test.com', password='password123')
+        LessonProgress.objects.create(student=other, lesson=self.lessons[0], status='completed')
+        StudentAnalytics.objects.filter(student=other).delete()
+
+        out = StringIO()
+        call_command('reconcile_student_analytics', stdout=out)
+        self.assertIn('1 rows created, 2 rows repaired', out.getvalue())
+        analytics = self._analytics()
+        self.assertEqual((analytics.lessons_completed, analytics.score_count), (1, 1))
+        self.assertEqual(analytics.completion_percentage, Decimal('25.00'))
+        self.assertEqual(StudentAnalytics.objects.get(student=other).lessons_completed, 1)
+        self.assertEqual(StudentAnalyticsService.reconcile(), {'created': 0, 'repaired': 0})
+
+
+class LessonSequenceTest(APITestCase):
+    """Test next-lesson navigation and unlock checks backed by the cached sequence"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Sequenced Course', description='Sequence test', instructor=self.instructor, status='published'
+        )
+        self.intro = Module.objects.create(course=self.course, title='Intro', order=1)
+        Module.objects.create(course=self.course, title='Empty', order=2)
+        self.locked = Module.objects.create(course=self.course, title='Advanced', order=3, is_locked=True)
+        self.a1 = Lesson.objects.create(module=self.intro, title='A1', order=1)
+        self.a2 = Lesson.objects.create(module=self.intro, title='A2', order=2)
+        self.b1 = Lesson.objects.create(module=self.locked, title='B1', order=1)
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_authenticate(user=self.student)
+
+    def test_sequence_navigation(self):
+        """Test next/previous cross modules and skip empty ones"""
+        self.course.refresh_from_db()
+        sequence = CourseSequenceService.get_sequence(self.course)
+        self.assertEqual(sequence.next(self.a2.id), (self.b1.id, self.locked.id))
+        self.assertEqual(sequence.previous(self.b1.id), (self.a2.id, self.intro.id))
+        self.assertIsNone(sequence.next(self.b1.id))
+        self.assertIsNone(sequence.previous(self.a1.id))
+
+        # A structural change moves the course to a new sequence
+        b2 = Lesson.objects.create(module=self.locked, title='B2', order=2)
+        self.course.refresh_from_db()
+        self.assertEqual(CourseSequenceService.get_sequence(self.course).next(self.b1.id), (b2.id, self.locked.id))
+
+    def test_completion_returns_next_lesson_from_cache(self):
+        """Test completing a lesson reports the next one without walking modules"""
+        url = reverse('progress-list')
+        response = self.client.post(url, {'lesson': self.a2.id, 'status': 'completed'})
+        self.assertEqual(response.data['next_lesson_id'], self.b1.id)
+        self.assertEqual(response.data['next_module_id'], self.locked.id)
+        self.assertFalse(response.data['is_last_lesson'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'lesson': self.a1.id})
+        self.assertEqual(response.data['next_lesson_id'], self.a2.id)
+        self.assertIsNone(response.data['next_module_id'])
+        ordered_lookups = [q for q in queries.captured_queries if 'ORDER BY "courses_' in q['sql']]
+        self.assertEqual(ordered_lookups, [])
+
+    def test_unlock_requires_prior_lessons(self):
+        """Test a locked module opens once every earlier lesson is complete"""
+        url = reverse('unlock-content')
+        response = self.client.post(url, {'lesson_id': self.b1.id})
+        self.assertFalse(response.data['can_access'])
+        self.assertEqual(response.data['unlock_reason'], 'Complete all lessons in Intro first')
+
+        for lesson in (self.a1, self.a2):
+            LessonProgress.objects.create(student=self.student, lesson=lesson, status='completed')
+        response = self.client.post(url, {'lesson_id': self.b1.id})
+        self.assertTrue(response.data['can_access'])
+
+
+class LessonCompletionServiceTest(APITestCase):
+    """Test the per-enrollment completion bitmap"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Bitmap Course', description='Bitmap test', instructor=self.instructor, status='published'
+        )
+        self.module = Module.objects.create(course=self.course, title='Module 1', order=1)
+        self.lessons = [Lesson.objects.create(module=self.module, title=f'Lesson {i}', order=i) for i in range(1, 11)]
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+
+    def reload_enrollment(self):
+        return Enrollment.objects.select_related('course').get(pk=self.enrollment.pk)
+
+    def test_completions_set_and_clear_bits(self):
+        """Test completing and reopening lessons flips their bits in place"""
+        for index in (0, 3, 9):
+            LessonProgress.objects.create(student=self.student, lesson=self.lessons[index], status='completed')
+        self.assertEqual(LessonCompletionService.completed_count(self.reload_enrollment()), 3)
+
+        enrollment = self.reload_enrollment()
+        self.assertEqual(bytes(enrollment.completion_bitmap), bytes([0b00001001, 0b00000010]))
+        self.assertEqual(
+            LessonCompletionService.completed_lesson_ids(enrollment),
+            {self.lessons[0].id, self.lessons[3].id, self.lessons[9].id}
+        )
+        self.assertEqual(LessonCompletionService.completion_percentage(enrollment), 30)
+
+        progress = LessonProgress.objects.get(student=self.student, lesson=self.lessons[3])
+        progress.status = 'in_progress'
+        progress.save()
+        LessonProgress.objects.get(student=self.student, lesson=self.lessons[9]).delete()
+        self.assertEqual(LessonCompletionService.completed_lesson_ids(self.reload_enrollment()), {self.lessons[0].id})
+
+    def test_reads_are_query_free_when_current(self):
+        """Test counting completions from a current bitmap runs no queries"""
+        LessonProgress.objects.create(student=self.student, lesson=self.lessons[0], status='completed')
+        enrollment = self.reload_enrollment()
+        LessonCompletionService.completed_count(enrollment)
+        with self.assertNumQueries(0):
+            self.assertEqual(LessonCompletionService.completed_count(enrollment), 1)
+
+    def test_content_change_rebuilds_bitmap(self):
+        """Test reordering lessons re-keys the bitmap to the new positions"""
+        LessonProgress.objects.create(student=self.student, lesson=self.lessons[1], status='completed')
+        first = Lesson.objects.create(module=self.module, title='Lesson 0', order=0)
+
+        enrollment = self.reload_enrollment()
+        self.assertNotEqual(enrollment.completion_version, enrollment.course.content_version)
+        self.assertEqual(LessonCompletionService.completed_lesson_ids(enrollment), {self.lessons[1].id})
+        self.assertEqual(bytes(self.reload_enrollment().completion_bitmap)[0], 0b00000100)
+        self.assertNotIn(first.id, LessonCompletionService.completed_lesson_ids(enrollment))
+
+    def test_stale_enrollment_save_keeps_bitmap(self):
+        """Test saving an enrollment loaded before a completion does not drop its bit"""
+        stale = Enrollment.objects.get(pk=self.enrollment.pk)
+        LessonProgress.objects.create(student=self.student, lesson=self.lessons[0], status='completed')
+        stale.status = 'completed'
+        stale.save()
+        self.assertEqual(LessonCompletionService.completed_count(self.reload_enrollment()), 1)
+
+    def test_cohort_detail_counts_from_bitmaps(self):
+        """Test the cohort grid reports completions without counting progress rows"""
+        mentor = User.objects.create_user(username='mentor', email='mentor@test.com', password='password123')
+        mentor.profile.role = 'admin'
+        mentor.profile.save()
+        cohort = Cohort.objects.create(name='Cohort A', course=self.course, start_date=date.today())
+        CohortMember.objects.create(cohort=cohort, student=self.student)
+        for lesson in self.lessons[:4]:
+            LessonProgress.objects.create(student=self.student, lesson=lesson, status='completed')
+
+        self.client.force_authenticate(user=mentor)
+        response = self.client.get(reverse('cohort-detail', args=[cohort.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        member_progress = response.data['members'][0]['progress']
+        self.assertEqual(member_progress['lessons_completed'], 4)
+        self.assertEqual(member_progress['percentage'], 40.0)
+
+
+class LessonHeartbeatTest(APITestCase):
+    """Test buffered lesson time tracking"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Watched Course', description='Heartbeat test', instructor=self.instructor, status='published'
+        )
+        module = Module.objects.create(course=self.course, title='Module 1', order=1)
+        self.lessons = [Lesson.objects.create(module=module, title=f'Lesson {i}', order=i) for i in range(1, 3)]
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('progress-heartbeat')
+
+        # A private buffer without the timer thread, flushed explicitly by each test
+        self.buffer = LessonHeartbeatBuffer(flush_interval=60)
+        for patcher in (patch('progress.views.heartbeat_buffer', self.buffer),
+                        patch.object(self.buffer, '_ensure_timer')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post_samples(self, *samples):
+        return self.client.post(self.url, {'samples': list(samples)}, format='json')
+
+    def test_samples_coalesce_until_flush(self):
+        """Test heartbeats are summed in memory and written in one flush"""
+        first, second = self.lessons
+        response = self.post_samples(
+            {'lesson': first.id, 'seconds': 10, 'percentage': '20.00'},
+            {'lesson': second.id, 'seconds': 5},
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.post_samples({'lesson': first.id, 'seconds': 15, 'percentage': '10.00'})
+        self.assertFalse(LessonProgress.objects.exists())
+        self.assertEqual(len(self.buffer), 2)
+
+        self.assertEqual(self.buffer.flush(), 2)
+        progress = LessonProgress.objects.get(student=self.student, lesson=first)
+        self.assertEqual(progress.time_spent_seconds, 25)
+        self.assertEqual(progress.progress_percentage, Decimal('20.00'))
+        self.assertEqual(progress.status, 'in_progress')
+        analytics = StudentAnalytics.objects.get(student=self.student, course=self.course)
+        self.assertEqual(analytics.total_time_spent, 30)
+
+        # Later flushes add to the rows instead of overwriting them
+        self.post_samples({'lesson': first.id, 'seconds': 5, 'percentage': '50.00'})
+        self.buffer.flush()
+        progress.refresh_from_db()
+        self.assertEqual(progress.time_spent_seconds, 30)
+        self.assertEqual(progress.progress_percentage, Decimal('50.00'))
+        analytics.refresh_from_db()
+        self.assertEqual(analytics.total_time_spent, 35)
+
+    def test_rejects_inaccessible_and_invalid_samples(self):
+        """Test samples for unknown or unenrolled lessons are refused before buffering"""
+        other = Course.objects.create(
+            title='Other Course', description='Not enrolled', instructor=self.instructor, status='published'
+        )
+        other_lesson = Lesson.objects.create(
+            module=Module.objects.create(course=other, title='Module 1', order=1), title='Hidden', order=1
+        )
+        self.assertEqual(self.post_samples({'lesson': other_lesson.id, 'seconds': 5}).status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.post_samples({'lesson': 999999, 'seconds': 5}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post_samples({'lesson': self.lessons[0].id, 'seconds': 100000}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_full_buffer_asks_client_to_retry(self):
+        """Test a buffer that cannot drain answers 503 with Retry-After"""
+        self.buffer.max_keys = 1
+        self.post_samples({'lesson': self.lessons[0].id, 'seconds': 5})
+        with patch('progress.services.LessonTimeService.apply', side_effect=Exception), \
+                self.assertLogs('progress.services', level='ERROR'):
+            response = self.post_samples({'lesson': self.lessons[1].id, 'seconds': 5})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(len(self.buffer), 1)
+
+    def test_update_progress_increments_time(self):
+        """Test update_progress adds time atomically and keeps analytics in step"""
+        progress = LessonProgress.objects.create(
+            student=self.student, lesson=self.lessons[0], status='in_progress', time_spent_seconds=10
+        )
+        url = reverse('progress-update-progress', args=[progress.id])
+        self.client.post(url, {'time_spent_seconds': 20}, format='json')
+        response = self.client.post(url, {'time_spent_seconds': 30, 'status': 'completed'}, format='json')
+        self.assertEqual(response.data['time_spent_seconds'], 60)
+        self.assertEqual(response.data['status'], 'completed')
+        analytics = StudentAnalytics.objects.get(student=self.student, course=self.course)
+        self.assertEqual(analytics.total_time_spent, 60)
+        self.assertEqual(analytics.lessons_completed, 1)
+
+    def test_completing_a_lesson_keeps_buffered_time(self):
+        """Test marking a lesson complete does not write back a stale time_spent_seconds"""
+        lesson = self.lessons[0]
+        LessonProgress.objects.create(student=self.student, lesson=lesson, status='in_progress', time_spent_seconds=10)
+        self.post_samples({'lesson': lesson.id, 'seconds': 15})
+        original_save = LessonProgress.save
+
+        def flush_then_save(instance, *args, **kwargs):
+            # The heartbeat flush lands after the view loaded the row
+            self.buffer.flush()
+            original_save(instance, *args, **kwargs)
+
+        with patch.object(LessonProgress, 'save', autospec=True, side_effect=flush_then_save):
+            response = self.client.post(reverse('progress-list'), {'lesson': lesson.id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        progress = LessonProgress.objects.get(student=self.student, lesson=lesson)
+        self.assertEqual((progress.status, progress.time_spent_seconds), ('completed', 25))
+        analytics = StudentAnalytics.objects.get(student=self.student, course=self.course)
+        self.assertEqual(analytics.total_time_spent, 25)
+
+    def test_patch_does_not_roll_back_tracked_time(self):
+        """Test editing progress through the API never lowers time tracked by heartbeats"""
+        lesson = self.lessons[0]
+        progress = LessonProgress.objects.create(
+            student=self.student, lesson=lesson, status='in_progress', time_spent_seconds=10
+        )
+        self.post_samples({'lesson': lesson.id, 'seconds': 15})
+        self.buffer.flush()
+        self.post_samples({'lesson': lesson.id, 'seconds': 5})
+        original_save = LessonProgress.save
+
+        def flush_then_save(instance, *args, **kwargs):
+            # The heartbeat flush lands after the view loaded the row
+            self.buffer.flush()
+            original_save(instance, *args, **kwargs)
+
+        with patch.object(LessonProgress, 'save', autospec=True, side_effect=flush_then_save):
+            response = self.client.patch(
+                reverse('progress-detail', args=[progress.id]),
+                {'status': 'completed', 'time_spent_seconds': 0}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        progress.refresh_from_db()
+        self.assertEqual((progress.status, progress.time_spent_seconds), ('completed', 30))
+        analytics = StudentAnalytics.objects.get(student=self.student, course=self.course)
+        self.assertEqual(analytics.total_time_spent, 30)
+        self.assertEqual(analytics.lessons_completed, 1)
+
+
+class QuizGradingTest(APITestCase):
+    """Test quiz auto-grading from the cached answer key"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='password123'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.course = Course.objects.create(
+            title='Quiz Course', description='Grading test', instructor=self.instructor, status='published'
+        )
+        module = Module.objects.create(course=self.course, title='Module 1', order=1)
+        self.quiz = Lesson.objects.create(module=module, title='Quiz', order=1, content_type='quiz')
+
+        self.single = QuizQuestion.objects.create(lesson=self.quiz, question_text='2 + 2?', points=2, order=1)
+        self.four = QuizAnswer.objects.create(question=self.single, answer_text='4', is_correct=True, order=1)
+        self.five = QuizAnswer.objects.create(question=self.single, answer_text='5', order=2)
+        self.multi = QuizQuestion.objects.create(lesson=self.quiz, question_text='Primes?', order=2)
+        self.primes = [
+            QuizAnswer.objects.create(question=self.multi, answer_text=text, is_correct=correct, order=order)
+            for order, (text, correct) in enumerate([('2', True), ('3', True), ('4', False)], start=1)
+        ]
+        self.short = QuizQuestion.objects.create(
+            lesson=self.quiz, question_text='Capital of France?', question_type='short_answer', order=3
+        )
+        QuizAnswer.objects.create(question=self.short, answer_text='Paris', is_correct=True, order=1)
+        QuizQuestion.objects.create(lesson=self.quiz, question_text='Discuss.', question_type='essay', order=4)
+
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('quizsubmission-list')
+
+    def answers(self, single=None, multi=None, short=None):
+        return {str(self.single.id): single, str(self.multi.id): multi, str(self.short.id): short}
+
+    def test_grades_choice_multi_select_and_short_answers(self):
+        """Test each question type is scored, with essays left out of the score"""
+        key = QuizGradingService.get_answer_key(self.quiz.id)
+        prime_ids = [str(self.primes[1].id), self.primes[0].id]
+        result = QuizGradingService.grade(key, self.answers(self.four.id, prime_ids, '  paris. '))
+        self.assertEqual(result['score'], 4)
+        self.assertEqual(result['max_score'], 5)
+        self.assertEqual(result['percentage'], Decimal('80.00'))
+        self.assertTrue(result['passed'])
+
+        # Multi-select needs exactly the correct set
+        partial = QuizGradingService.grade(key, self.answers(self.five.id, [self.primes[0].id], 'Lyon'))
+        self.assertEqual(partial['score'], 0)
+        self.assertFalse(partial['passed'])
+        wrong_extra = QuizGradingService.grade(key, self.answers(multi=[p.id for p in self.primes]))
+        self.assertEqual(wrong_extra['score'], 0)
+
+    def test_submissions_grade_without_key_queries_once_cached(self):
+        """Test a submission reads the answer key from cache instead of per-question queries"""
+        response = self.client.post(self.url, {'lesson': self.quiz.id, 'answers': self.answers(self.four.id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(QuizSubmission.objects.get(pk=response.data['id']).score, 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {'lesson': self.quiz.id, 'answers': self.answers(self.four.id)}, format='json')
+        key_queries = [q for q in queries.captured_queries if 'progress_quizanswer' in q['sql']]
+        self.assertEqual(key_queries, [])
+
+    def test_answer_edit_invalidates_key_and_regrade_rescored(self):
+        """Test changing the correct answer reaches new grades and the regrade command"""
+        self.client.post(self.url, {'lesson': self.quiz.id, 'answers': self.answers(self.five.id)}, format='json')
+        submission = QuizSubmission.objects.get(student=self.student)
+        self.assertEqual(submission.score, 0)
+
+        self.four.is_correct = False
+        self.four.save()
+        self.five.is_correct = True
+        self.five.save()
+        result = QuizGradingService.grade(QuizGradingService.get_answer_key(self.quiz.id), self.answers(self.five.id))
+        self.assertEqual(result['score'], 2)
+
+        out = StringIO()
+        call_command('regrade_quiz_submissions', '--course', str(self.course.id), stdout=out)
+        self.assertIn('1 submissions checked, 1 rescored', out.getvalue())
+        submission.refresh_from_db()
+        self.assertEqual(submission.score, 2)
+        self.assertEqual(submission.percentage, Decimal('40.00'))
 
-# Create your tests here.
+        # Already current submissions are left alone
+        self.assertEqual(QuizGradingService.regrade(QuizSubmission.objects.all()), {'checked': 1, 'changed': 0})
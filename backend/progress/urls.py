@@ -15,9 +15,6 @@ router.register(r'quiz-questions', QuizQuestionViewSet)
 router.register(r'', LessonProgressViewSet, basename='progress')
 
 urlpatterns = [
-    # ViewSet endpoints
-    path('', include(router.urls)),
-
     # Dashboard endpoints
     path('dashboard/student/', student_progress_dashboard, name='student-progress-dashboard'),
     path('dashboard/instructor/', instructor_analytics_dashboard, name='instructor-analytics-dashboard'),
@@ -30,4 +27,8 @@ urlpatterns = [
 
     # Utility endpoints
     path('unlock-content/', unlock_content, name='unlock-content'),
+
+    # ViewSet endpoints last: the progress routes sit at the root and would capture
+    # single-segment paths such as unlock-content/ as a detail lookup
+    path('', include(router.urls)),
 ]
@@ -1,12 +1,13 @@
 from django.shortcuts import get_object_or_404
 from django.db.models import Q, Avg, Count, Sum
 from django.utils import timezone
-from rest_framework import viewsets, status, parsers
+from rest_framework import viewsets, status, parsers, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from core.pagination import StandardResultsSetPagination
+from core.pagination import StandardResultsSetPagination, KeysetPagination
+from core.constants import ProgressConstants
 
 from .models import (
     LessonProgress, QuizSubmission, AssignmentSubmission,
@@ -14,18 +15,24 @@ from .models import (
     Cohort, CohortMember, PeerReviewAssignment, PeerReviewRubric
 )
 from courses.models import Course, Module, Lesson, Enrollment
+from courses.access import CourseAccessMixin, ENROLLED_STATUSES
+from courses.services import CourseSequenceService
 from .serializers import (
     LessonProgressSerializer, QuizSubmissionSerializer, AssignmentSubmissionSerializer,
     StudentAnalyticsSerializer, QuizQuestionSerializer, QuizAnswerSerializer,
     AssignmentRequirementSerializer, ProgressSummarySerializer,
-    InstructorAnalyticsSerializer, GradingSerializer
+    InstructorAnalyticsSerializer, GradingSerializer, HeartbeatSerializer
+)
+from .services import (
+    ProgressAnalyticsService, LessonCompletionService, LessonTimeService, heartbeat_buffer, HeartbeatBufferFull
 )
-from .services import ProgressAnalyticsService
 
 
-class LessonProgressViewSet(viewsets.ModelViewSet):
+class LessonProgressViewSet(CourseAccessMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = LessonProgressSerializer
+    pagination_class = KeysetPagination
+    keyset_field = 'first_accessed'  # last_accessed changes on every write
 
     def get_queryset(self):
         user = self.request.user
@@ -37,53 +44,35 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
         else:
             return base_queryset.filter(student=user)
 
-    def _get_next_lesson(self, current_lesson):
-        """Get the next lesson in sequence"""
-        current_module = current_lesson.module
-        current_order = current_lesson.order
-        
-        # Try next lesson in same module
-        next_lesson = Lesson.objects.filter(
-            module=current_module,
-            order__gt=current_order
-        ).order_by('order').first()
-        
-        if next_lesson:
-            return next_lesson
-        
-        # Try first lesson in next module
-        next_module = Module.objects.filter(
-            course=current_module.course,
-            order__gt=current_module.order
-        ).order_by('order').first()
-        
-        if next_module:
-            return next_module.lessons.order_by('order').first()
-        
-        return None
+    def _navigation(self, lesson):
+        """Next-lesson fields for the lesson player, from the cached course sequence"""
+        next_entry = CourseSequenceService.get_sequence(lesson.module.course).next(lesson.id)
+        next_lesson_id, next_module_id = next_entry or (None, None)
+        return {
+            'next_lesson_id': next_lesson_id,
+            'next_module_id': next_module_id if next_module_id != lesson.module_id else None,
+            'is_last_lesson': next_entry is None,
+        }
 
     def create(self, request, *args, **kwargs):
         lesson_id = request.data.get('lesson')
-        lesson = get_object_or_404(Lesson, id=lesson_id)
-        if not self._can_access_lesson(request.user, lesson):
+        lesson = get_object_or_404(Lesson.objects.select_related('module__course'), id=lesson_id)
+        if not self._can_access_lesson(lesson):
             return Response({'detail': 'Cannot access this lesson'}, status=status.HTTP_403_FORBIDDEN)
         
         # Calculate next lesson BEFORE saving
-        next_lesson = self._get_next_lesson(lesson)
-        is_last_lesson = next_lesson is None
-        
+        navigation = self._navigation(lesson)
+
         existing_progress = LessonProgress.objects.filter(student=request.user, lesson=lesson).first()
         if existing_progress:
             existing_progress.status = 'completed'
             existing_progress.completed_at = timezone.now()
             existing_progress.last_accessed = timezone.now()
-            existing_progress.save()
-            self._update_student_analytics(request.user, lesson.module.course)
+            # time_spent_seconds only moves through LessonTimeService increments
+            existing_progress.save(update_fields=['status', 'completed_at', 'last_accessed'])
             serializer = self.get_serializer(existing_progress)
             response_data = serializer.data
-            response_data['next_lesson_id'] = next_lesson.id if next_lesson else None
-            response_data['next_module_id'] = next_lesson.module.id if next_lesson and next_lesson.module.id != lesson.module.id else None
-            response_data['is_last_lesson'] = is_last_lesson
+            response_data.update(navigation)
             return Response(response_data, status=status.HTTP_200_OK)
         
         serializer = self.get_serializer(data=request.data)
@@ -92,61 +81,74 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
         if request.data.get('status') == 'completed':
             progress.status = 'completed'
             progress.completed_at = timezone.now()
-            progress.save()
-            self._update_student_analytics(request.user, lesson.module.course)
+            progress.save(update_fields=['status', 'completed_at'])
         headers = self.get_success_headers(serializer.data)
         response_data = serializer.data
-        response_data['next_lesson_id'] = next_lesson.id if next_lesson else None
-        response_data['next_module_id'] = next_lesson.module.id if next_lesson and next_lesson.module.id != lesson.module.id else None
-        response_data['is_last_lesson'] = is_last_lesson
+        response_data.update(navigation)
         return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
 
     @action(detail=True, methods=['post'])
     def update_progress(self, request, pk=None):
         progress = self.get_object()
         user = request.user
-        if not (progress.student == user or (user.profile.is_instructor and progress.lesson.module.course.instructor == user) or user.profile.is_admin):
+        if not (progress.student_id == user.pk or self._can_manage_course(progress.lesson.module.course)):
             return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         progress_data = request.data.copy()
-        progress_data['last_accessed'] = timezone.now()
-        if 'time_spent_seconds' in progress_data:
-            progress.time_spent_seconds = (progress.time_spent_seconds or 0) + progress_data['time_spent_seconds']
+        seconds = progress_data.get('time_spent_seconds')
+        if seconds is not None:
+            try:
+                seconds = int(seconds)
+            except (TypeError, ValueError):
+                return Response({'detail': 'time_spent_seconds must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            if seconds < 0:
+                return Response({'detail': 'time_spent_seconds cannot be negative'}, status=status.HTTP_400_BAD_REQUEST)
         if 'status' in progress_data:
             progress.status = progress_data['status']
             if progress_data['status'] == 'completed' and not progress.completed_at:
                 progress.completed_at = timezone.now()
         if 'progress_percentage' in progress_data:
             progress.progress_percentage = progress_data['progress_percentage']
-        progress.save()
-        self._update_student_analytics(progress.student, progress.lesson.module.course)
+        # time_spent_seconds is left to the atomic increment below
+        progress.save(update_fields=['status', 'completed_at', 'progress_percentage', 'last_accessed'])
+        if seconds:
+            LessonTimeService.apply({(progress.student_id, progress.lesson_id): {
+                'course_id': progress.lesson.module.course_id, 'seconds': seconds, 'percentage': None
+            }})
+            progress.refresh_from_db(fields=['time_spent_seconds'])
         serializer = self.get_serializer(progress)
         return Response(serializer.data)
 
-    def _can_access_lesson(self, user, lesson):
-        if lesson.module.course.status != 'published' and not self._can_manage_course(user, lesson.module.course):
-            return False
-        if not user.profile.is_instructor and not user.profile.is_admin:
-            enrollment = Enrollment.objects.filter(student=user, course=lesson.module.course, status__in=['active', 'completed']).exists()
-            if not enrollment:
-                return False
-        return True
-
-    def _can_manage_course(self, user, course):
-        return (user.profile.is_instructor and course.instructor == user) or user.profile.is_admin
-
-    def _update_student_analytics(self, student, course):
-        analytics, created = StudentAnalytics.objects.get_or_create(student=student, course=course, defaults={'last_activity': timezone.now()})
-        progress_records = LessonProgress.objects.filter(student=student, lesson__module__course=course)
-        analytics.lessons_completed = progress_records.filter(status='completed').count()
-        analytics.total_time_spent = progress_records.aggregate(total=Sum('time_spent_seconds'))['total'] or 0
-        total_lessons = course.total_lessons
-        if total_lessons > 0:
-            analytics.completion_percentage = (analytics.lessons_completed / total_lessons) * 100
-        scored_progress = progress_records.exclude(score__isnull=True)
-        if scored_progress.exists():
-            analytics.average_score = scored_progress.aggregate(avg=Avg('score'))['avg']
-        analytics.last_activity = timezone.now()
-        analytics.save()
+    @action(detail=False, methods=['post'])
+    def heartbeat(self, request):
+        """
+        Record batched lesson player samples: [{lesson, seconds, percentage}].
+        Samples are buffered and written every few seconds, so the response
+        does not reflect them yet.
+        """
+        serializer = HeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        samples = serializer.validated_data['samples']
+
+        lesson_ids = {sample['lesson'] for sample in samples}
+        lessons = Lesson.objects.select_related('module__course').in_bulk(lesson_ids)
+        unknown = sorted(lesson_ids - set(lessons))
+        if unknown:
+            return Response({'detail': f'Unknown lessons: {unknown}'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(self._can_access_lesson(lesson) for lesson in lessons.values()):
+            return Response({'detail': 'Cannot access this lesson'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            heartbeat_buffer.add(request.user.pk, [
+                (sample['lesson'], lessons[sample['lesson']].module.course_id,
+                 sample['seconds'], sample.get('percentage'))
+                for sample in samples
+            ])
+        except HeartbeatBufferFull:
+            response = Response({'detail': 'Progress tracking is busy, retry later', 'accepted': 0},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(ProgressConstants.HEARTBEAT_RETRY_AFTER_SECONDS)
+            return response
+        return Response({'accepted': len(samples)}, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=False, methods=['get'], url_path='courses/(?P<course_id>[^/.]+)/progress')
     def course_progress(self, request, course_id=None):
@@ -160,7 +162,7 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class QuizSubmissionViewSet(viewsets.ModelViewSet):
+class QuizSubmissionViewSet(CourseAccessMixin, viewsets.ModelViewSet):
     queryset = QuizSubmission.objects.select_related('student', 'lesson__module__course')
     permission_classes = [IsAuthenticated]
     serializer_class = QuizSubmissionSerializer
@@ -176,28 +178,16 @@ class QuizSubmissionViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         lesson_id = self.request.data.get('lesson')
-        lesson = get_object_or_404(Lesson, id=lesson_id)
-        if not self._can_access_lesson(self.request.user, lesson):
+        lesson = get_object_or_404(Lesson.objects.select_related('module__course'), id=lesson_id)
+        if not self._can_access_lesson(lesson):
             raise serializers.ValidationError("Cannot access this lesson")
         if lesson.content_type != 'quiz':
             raise serializers.ValidationError("This lesson is not a quiz")
         existing_submissions = QuizSubmission.objects.filter(student=self.request.user, lesson=lesson).count()
         serializer.save(student=self.request.user, lesson=lesson, attempt_number=existing_submissions + 1)
 
-    def _can_access_lesson(self, user, lesson):
-        if lesson.module.course.status != 'published' and not self._can_manage_course(user, lesson.module.course):
-            return False
-        if not user.profile.is_instructor and not user.profile.is_admin:
-            enrollment = Enrollment.objects.filter(student=user, course=lesson.module.course, status__in=['active', 'completed']).exists()
-            if not enrollment:
-                return False
-        return True
-
-    def _can_manage_course(self, user, course):
-        return (user.profile.is_instructor and course.instructor == user) or user.profile.is_admin
 
-
-class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
+class AssignmentSubmissionViewSet(CourseAccessMixin, viewsets.ModelViewSet):
     queryset = AssignmentSubmission.objects.select_related('student', 'lesson__module__course')
     permission_classes = [IsAuthenticated]
     serializer_class = AssignmentSubmissionSerializer
@@ -213,8 +203,8 @@ class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         lesson_id = self.request.data.get('lesson')
-        lesson = get_object_or_404(Lesson, id=lesson_id)
-        if not self._can_access_lesson(self.request.user, lesson):
+        lesson = get_object_or_404(Lesson.objects.select_related('module__course'), id=lesson_id)
+        if not self._can_access_lesson(lesson):
             raise serializers.ValidationError("Cannot access this lesson")
         if lesson.content_type != 'assignment':
             raise serializers.ValidationError("This lesson is not an assignment")
@@ -226,8 +216,7 @@ class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def grade(self, request, pk=None):
         submission = self.get_object()
-        user = request.user
-        if not ((user.profile.is_instructor and submission.lesson.module.course.instructor == user) or user.profile.is_admin):
+        if not self._can_manage_course(submission.lesson.module.course):
             return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         serializer = GradingSerializer(data=request.data)
         if serializer.is_valid():
@@ -242,20 +231,8 @@ class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Assignment graded successfully'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def _can_access_lesson(self, user, lesson):
-        if lesson.module.course.status != 'published' and not self._can_manage_course(user, lesson.module.course):
-            return False
-        if not user.profile.is_instructor and not user.profile.is_admin:
-            enrollment = Enrollment.objects.filter(student=user, course=lesson.module.course, status__in=['active', 'completed']).exists()
-            if not enrollment:
-                return False
-        return True
-
-    def _can_manage_course(self, user, course):
-        return (user.profile.is_instructor and course.instructor == user) or user.profile.is_admin
 
-
-class QuizQuestionViewSet(viewsets.ModelViewSet):
+class QuizQuestionViewSet(CourseAccessMixin, viewsets.ModelViewSet):
     """ViewSet for quiz questions (instructor only)"""
     queryset = QuizQuestion.objects.all()
     permission_classes = [IsAuthenticated]
@@ -271,8 +248,8 @@ class QuizQuestionViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         lesson_id = self.request.data.get('lesson')
-        lesson = get_object_or_404(Lesson, id=lesson_id)
-        if not self._can_manage_course(self.request.user, lesson.module.course):
+        lesson = get_object_or_404(Lesson.objects.select_related('module__course'), id=lesson_id)
+        if not self._can_manage_course(lesson.module.course):
             raise serializers.ValidationError("Cannot add questions to this lesson")
         serializer.save(lesson=lesson)
 
@@ -289,9 +266,6 @@ class QuizQuestionViewSet(viewsets.ModelViewSet):
         serializer = QuizAnswerSerializer(answers, many=True)
         return Response(serializer.data)
 
-    def _can_manage_course(self, user, course):
-        return (user.profile.is_instructor and course.instructor == user) or user.profile.is_admin
-
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -322,21 +296,18 @@ def unlock_content(request):
     lesson_id = request.data.get('lesson_id')
     if not lesson_id:
         return Response({'detail': 'lesson_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-    lesson = get_object_or_404(Lesson, id=lesson_id)
-    enrollment = Enrollment.objects.filter(student=user, course=lesson.module.course, status__in=['active', 'completed']).first()
+    lesson = get_object_or_404(Lesson.objects.select_related('module__course'), id=lesson_id)
+    enrollment = Enrollment.objects.filter(student=user, course=lesson.module.course, status__in=['active', 'completed']).select_related('course').first()
     if not enrollment:
         return Response({'detail': 'Not enrolled in this course'}, status=status.HTTP_403_FORBIDDEN)
     can_access = True
     unlock_reason = "Content unlocked"
     if lesson.module.is_locked:
-        previous_modules = lesson.module.course.modules.filter(order__lt=lesson.module.order)
-        for prev_module in previous_modules:
-            prev_completion = LessonProgress.objects.filter(student=user, lesson__module=prev_module, status='completed').count()
-            prev_total = prev_module.lessons.count()
-            if prev_completion < prev_total:
-                can_access = False
-                unlock_reason = f"Complete all lessons in {prev_module.title} first"
-                break
+        blocking_module_id = LessonCompletionService.first_incomplete_module(enrollment, lesson.module_id)
+        if blocking_module_id is not None:
+            can_access = False
+            module_titles = CourseSequenceService.get_sequence(enrollment.course).module_titles
+            unlock_reason = f"Complete all lessons in {module_titles[blocking_module_id]} first"
     return Response({'can_access': can_access, 'unlock_reason': unlock_reason, 'lesson_id': lesson_id})
 
 
@@ -424,22 +395,21 @@ def cohort_detail(request, cohort_id):
     # Get cohort members with their progress
     members = cohort.members.all().select_related('student')
     member_data = []
+
+    # Completion comes from each enrollment's bitmap rather than counting progress rows
+    enrollments = {
+        enrollment.student_id: enrollment
+        for enrollment in Enrollment.objects.filter(
+            course=cohort.course, student_id__in=[member.student_id for member in members]
+        ).select_related('course')
+    }
     
     for member in members:
         # Get enrollment
-        enrollment = Enrollment.objects.filter(
-            student=member.student,
-            course=cohort.course,
-            status__in=['active', 'completed']
-        ).first()
-        
-        # Get progress stats
-        progress = LessonProgress.objects.filter(
-            student=member.student,
-            lesson__module__course=cohort.course
-        )
-        
-        completed_lessons = progress.filter(status='completed').count()
+        enrollment = enrollments.get(member.student_id)
+        completed_lessons = LessonCompletionService.completed_count(enrollment) if enrollment else 0
+        if enrollment is not None and enrollment.status not in ENROLLED_STATUSES:
+            enrollment = None
         total_lessons = cohort.course.total_lessons
         
         # Get submissions
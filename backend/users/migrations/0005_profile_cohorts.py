@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-16 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0002_cohorts_and_tiered_deadlines'),
+        ('users', '0004_profile_achievements_profile_profile_visibility_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='assigned_cohorts',
+            field=models.ManyToManyField(blank=True, help_text='Mentors are scoped to these cohorts (admins see all)', related_name='assigned_mentors', to='progress.cohort'),
+        ),
+        migrations.AlterField(
+            model_name='admininvitation',
+            name='role',
+            field=models.CharField(choices=[('mentor', 'Mentor'), ('admin', 'Admin')], default='mentor', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='role',
+            field=models.CharField(choices=[('student', 'Student'), ('mentor', 'Mentor'), ('admin', 'Admin')], default='student', max_length=20),
+        ),
+    ]
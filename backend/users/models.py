@@ -7,6 +7,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.exceptions import ObjectDoesNotExist
 
+from core.mixins import CounterFieldsMixin
+
 def default_expiry():
     """
     Return a timezone‐aware datetime 24 hours from now.
@@ -69,7 +71,7 @@ class AdminInvitation(models.Model):
         ordering = ['-created']
 
 
-class Profile(models.Model):
+class Profile(CounterFieldsMixin, models.Model):
     # Doit roles: student, mentor (facilitator), admin/curriculum_team
     USER_ROLES = [
         ('student', 'Student'),      # Enrolls, learns, submits projects, does peer reviews
@@ -92,6 +94,7 @@ class Profile(models.Model):
     bio = models.TextField(blank=True)
     location = models.CharField(max_length=100, blank=True)
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    profile_image_variants = models.JSONField(default=list, blank=True, editable=False)  # Built by core.images
     phone_number = models.CharField(max_length=20, blank=True)
 
     # LMS-specific fields
@@ -122,6 +125,8 @@ class Profile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    counter_fields = ('profile_image_variants',)
+
     class Meta:
         indexes = [
             models.Index(fields=['role', 'is_active_instructor']),
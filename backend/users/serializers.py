@@ -9,6 +9,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from core import images
 from .models import EmailVerification, Profile, UserSession, LoginHistory, UserBan, UserStatus, UserPreferences
 
 # REGISTRATION & EMAIL VERIFICATION
@@ -141,11 +142,12 @@ class ProfileSerializer(serializers.ModelSerializer):
     role_display = serializers.CharField(source='get_role_display', read_only=True)
     is_account_locked = serializers.BooleanField(read_only=True)
     profile_visibility_display = serializers.CharField(source='get_profile_visibility_display', read_only=True)
+    profile_image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
         fields = (
-            'role', 'role_display', 'bio', 'location', 'profile_image', 'phone_number',
+            'role', 'role_display', 'bio', 'location', 'profile_image', 'profile_image_srcset', 'phone_number',
             'is_profile_complete', 'enrolled_courses_count', 'completed_courses_count',
             # Enhanced LMS fields
             'skills', 'achievements', 'teaching_subjects', 'profile_visibility', 'profile_visibility_display',
@@ -158,6 +160,10 @@ class ProfileSerializer(serializers.ModelSerializer):
             'assigned_courses_count', 'is_account_locked', 'created_at', 'updated_at'
         )
 
+    def get_profile_image_srcset(self, obj):
+        request = self.context.get('request')
+        return images.srcset(obj.profile_image_variants, request.build_absolute_uri if request else None)
+
 class UserSerializer(serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
     full_name = serializers.SerializerMethodField()
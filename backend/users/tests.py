@@ -1,10 +1,18 @@
-from django.test import TestCase
+import tempfile
+from io import BytesIO
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
 from datetime import timedelta
 from rest_framework.test import APITestCase
 from rest_framework import status
+from PIL import Image
+
+from analytics.models import BackgroundJob
+from analytics.services import JobQueueService
 from .models import AdminInvitation, Profile
 
 User = get_user_model()
@@ -270,3 +278,43 @@ class UserRoleRedirectTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('user', response.data)
         self.assertEqual(response.data['user']['profile']['role'], 'admin')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='profile-images-'))
+class ProfileImageVariantTest(APITestCase):
+    """Test profile image uploads use the resized variant pipeline"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='password123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_upload_builds_variants_after_commit(self):
+        """Test the upload defers resizing and exposes the srcset once built"""
+        buffer = BytesIO()
+        Image.new('RGBA', (400, 400), (255, 0, 0, 128)).save(buffer, format='PNG')
+        upload = SimpleUploadedFile('me.png', buffer.getvalue(), content_type='image/png')
+
+        response = self.client.patch('/api/auth/users/me/', {'profile_image': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        job = BackgroundJob.objects.get(job_type='build_image_variants')
+        self.assertEqual(job.status, 'queued')
+
+        # A full save of a profile loaded before the job ran keeps the variants
+        stale = Profile.objects.get(user=self.user)
+        self.assertTrue(JobQueueService.run(JobQueueService.claim('test')[0]))
+        stale.bio = 'Updated'
+        stale.save()
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(
+            [(v['format'], v['width']) for v in profile.profile_image_variants],
+            [('webp', 320), ('webp', 400), ('jpeg', 320), ('jpeg', 400)]
+        )
+
+        self.user.profile.refresh_from_db()
+        response = self.client.get('/api/auth/users/me/')
+        self.assertIn(' 400w', response.data['profile']['profile_image_srcset']['jpeg'])
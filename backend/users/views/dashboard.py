@@ -82,7 +82,8 @@ def admin_stats(request):
     
     from django.db.models import Count
     from courses.models import Course, Enrollment
-    from payments.models import Transaction
+    from payments.services import RevenueService
+    from core.timeseries import bucketed_series, series_label
     
     User = get_user_model()
     
@@ -96,18 +97,18 @@ def admin_stats(request):
     enrollments_by_status = Enrollment.objects.values('status').annotate(count=Count('id'))
     
     # Monthly enrollments (last 6 months)
-    from django.utils import timezone
-    from datetime import timedelta
-    six_months_ago = timezone.now() - timedelta(days=180)
-    monthly_enrollments = Enrollment.objects.filter(
-        enrolled_at__gte=six_months_ago
-    ).extra(
-        select={'month': "TO_CHAR(enrolled_at, 'YYYY-MM')"}
-    ).values('month').annotate(count=Count('id'))
+    monthly_enrollments = [
+        {'month': series_label(start, 'month'), 'count': count or 0}
+        for start, count in bucketed_series(Enrollment.objects.all(), 'enrolled_at', 'month', 6)
+    ]
+    
+    # Monthly revenue (last 6 months)
+    monthly_revenue = RevenueService.revenue_series('month', 6)
     
     return Response({
         'users_by_role': list(users_by_role),
         'courses_by_status': list(courses_by_status),
         'enrollments_by_status': list(enrollments_by_status),
-        'monthly_enrollments': list(monthly_enrollments),
+        'monthly_enrollments': monthly_enrollments,
+        'monthly_revenue': monthly_revenue,
     })
\ No newline at end of file
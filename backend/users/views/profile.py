@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core import images
 from ..serializers import UserSerializer, ProfileSerializer, UserPreferencesSerializer
 
 
@@ -53,6 +54,8 @@ class UserMeView(APIView):
                 if not profile_serializer.is_valid():
                     return Response(profile_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
                 profile_serializer.save()
+                if 'profile_image' in profile_data:
+                    images.process_in_background(request.user.profile, 'profile_image', 'profile_image_variants')
 
             # Update preferences
             if preferences_data: